@@ -2,6 +2,8 @@
 ASGI config for construction_pm project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with a single worker process (e.g. ``gunicorn -k uvicorn.workers.UvicornWorker
+--workers 1``) so the in-process event broker sees every write made by the site.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
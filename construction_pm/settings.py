@@ -48,6 +48,8 @@ INSTALLED_APPS = [
     'drawings',
     'tasks',
     'gantt',
+    'sync',
+    'jobs',
 ]
 
 # 自定义用户模型
@@ -61,6 +63,7 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.querycount.NPlusOneMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,6 +85,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.fragment_cache',
             ],
         },
     },
@@ -158,6 +162,9 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# 增量备份存储目录（python manage.py backup）
+BACKUP_ROOT = config('BACKUP_ROOT', default=str(BASE_DIR / 'backups'))
+
 # CORS settings for development
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -178,6 +185,9 @@ CACHES = {
     }
 }
 
+# 模板片段缓存（{% cache %}）超时时间，键已包含对象更新时间或项目数据版本
+TEMPLATE_FRAGMENT_CACHE_TIMEOUT = config('TEMPLATE_FRAGMENT_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
 # Logging
 import os
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
@@ -226,6 +236,11 @@ LOGGING = {
     },
 }
 
+# N+1 query detection: 'log' in staging, 'raise' is forced by the test runner
+NPLUSONE_MODE = config('NPLUSONE_MODE', default='')
+NPLUSONE_THRESHOLD = config('NPLUSONE_THRESHOLD', default=5, cast=int)
+TEST_RUNNER = 'core.querycount.NPlusOneTestRunner'
+
 # Session settings
 SESSION_COOKIE_AGE = 86400  # 24 hours
 SESSION_SAVE_EVERY_REQUEST = True
@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from drawings.views import service_worker
 
 @login_required
 def home_redirect(request):
@@ -29,10 +30,13 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('', home_redirect, name='home'),
+    path('sw.js', service_worker, name='service_worker'),
     path('projects/', include('projects.urls')),
     path('drawings/', include('drawings.urls')),
     path('tasks/', include('tasks.urls')),
     path('gantt/', include('gantt.urls')),
+    path('sync/', include('sync.urls')),
+    path('jobs/', include('jobs.urls')),
 ]
 
 # Serve media files during development
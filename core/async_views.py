@@ -0,0 +1,77 @@
+"""
+Async counterparts of the view helpers used across the project.
+
+Django 4.2's ``login_required``, ``require_http_methods`` and ``csrf_exempt``
+wrap views in sync functions, which turns an async view back into a sync one;
+these keep the wrapped view a coroutine function so it runs on the event loop
+under ASGI.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponseNotAllowed
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def async_login_required(view_func):
+    @wraps(view_func)
+    async def inner(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return inner
+
+
+def async_require_http_methods(request_method_list):
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                return HttpResponseNotAllowed(request_method_list)
+            return await view_func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+async_require_GET = async_require_http_methods(['GET'])
+async_require_POST = async_require_http_methods(['POST'])
+
+
+def async_csrf_exempt(view_func):
+    @wraps(view_func)
+    async def inner(*args, **kwargs):
+        return await view_func(*args, **kwargs)
+
+    inner.csrf_exempt = True
+    return inner
+
+
+async def aget_object_or_404(queryset, **filters):
+    obj = await queryset.filter(**filters).afirst()
+    if obj is None:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+    return obj
+
+
+async def stream_file(field_file, chunk_size=FILE_CHUNK_SIZE):
+    """
+    Yield a stored file in chunks without blocking the event loop.
+
+    Storage reads go to the default thread pool rather than the thread-sensitive
+    executor shared with the ORM, so slow disks do not queue behind database work.
+    """
+    handle = await sync_to_async(field_file.storage.open, thread_sensitive=False)(field_file.name, 'rb')
+    read = sync_to_async(handle.read, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(handle.close, thread_sensitive=False)()
@@ -0,0 +1,421 @@
+"""
+数据库与 MEDIA_ROOT 的增量备份（按内容寻址）
+
+备份库目录结构::
+
+    <root>/objects/ab/abcdef...          以内容SHA-256命名的数据块
+    <root>/objects/ab/abcdef....gz       同上，gzip压缩（数据库分块）
+    <root>/snapshots/<id>.json.gz        单个快照的清单
+
+清单列出每个媒体文件（路径、大小、修改时间、哈希）和每个数据库分块（模型、分块号、行数、哈希）。
+备份库中已有的数据块不再重复写入，夜间备份只复制新增或修改的图纸。大小与修改时间同上次清单
+一致的媒体文件不会读取，直接沿用其哈希：大量图纸基本不变时，每个文件只需一次 stat()。
+
+数据库分块是同一模型中主键落在同一 DB_CHUNK_SIZE 范围内的行的 Django JSON 序列化，
+修改一行只改变其所在的分块。指向用户、组与权限的外键使用自然键，快照可恢复到任意新迁移的数据库。
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+FORMAT_NAME = 'construction-pm-backup'
+FORMAT_VERSION = 1
+
+DB_CHUNK_SIZE = 1000
+READ_BUFFER_SIZE = 1024 * 1024
+
+# 由 migrate 重建（内容类型、权限）或属临时数据（会话、后台任务队列），无需备份
+EXCLUDED_MODELS = {'contenttypes.contenttype', 'auth.permission', 'sessions.session', 'jobs.job'}
+
+
+class BackupError(Exception):
+    """备份库或快照无法使用（清单缺失/格式不符、数据块缺失、恢复目标不为空等）"""
+
+
+class BlobStore:
+    """以（未压缩）内容的SHA-256命名的文件库"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.tmp = self.root / 'tmp'
+
+    def path(self, digest, compressed=False):
+        return self.objects / digest[:2] / (f'{digest}.gz' if compressed else digest)
+
+    def find(self, digest):
+        for compressed in (False, True):
+            path = self.path(digest, compressed)
+            if path.exists():
+                return path, compressed
+        return None, False
+
+    def has(self, digest):
+        return self.find(digest)[0] is not None
+
+    def _commit(self, tmp_path, digest, compressed):
+        """将写完的临时文件移动到位；数据块已存在时返回False"""
+        if self.has(digest):
+            os.unlink(tmp_path)
+            return False
+        target = self.path(digest, compressed)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, target)
+        return True
+
+    def _tempfile(self):
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp)
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def put_bytes(self, data, compress=True):
+        """存入 data，返回 (哈希, 是否写入)"""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has(digest):
+            return digest, False
+        out, tmp_path = self._tempfile()
+        with out:
+            out.write(gzip.compress(data, mtime=0) if compress else data)
+        return digest, self._commit(tmp_path, digest, compress)
+
+    def put_file(self, source):
+        """一次读取同时计算哈希并复制 source，返回 (哈希, 是否写入)"""
+        sha = hashlib.sha256()
+        out, tmp_path = self._tempfile()
+        try:
+            with out, open(source, 'rb') as f:
+                for block in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+                    sha.update(block)
+                    out.write(block)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        digest = sha.hexdigest()
+        return digest, self._commit(tmp_path, digest, False)
+
+    def open(self, digest):
+        path, compressed = self.find(digest)
+        if path is None:
+            raise BackupError(f'备份库 {self.objects} 中缺少数据块 {digest}')
+        return gzip.open(path, 'rb') if compressed else open(path, 'rb')
+
+    def read(self, digest):
+        with self.open(digest) as f:
+            return f.read()
+
+    def iter_blobs(self):
+        if not self.objects.exists():
+            return
+        for path in self.objects.glob('*/*'):
+            yield path.name.split('.', 1)[0], path
+
+
+def file_digest(path):
+    """文件内容的SHA-256"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BUFFER_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+# 快照 -----------------------------------------------------------------------
+
+def _snapshot_dir(root):
+    return Path(root) / 'snapshots'
+
+
+def list_snapshots(root):
+    """快照ID列表（从旧到新）"""
+    directory = _snapshot_dir(root)
+    if not directory.exists():
+        return []
+    return sorted(path.name[:-len('.json.gz')] for path in directory.glob('*.json.gz'))
+
+
+def load_manifest(root, snapshot_id='latest'):
+    """读取快照清单（默认最新快照）"""
+    if snapshot_id == 'latest':
+        snapshots = list_snapshots(root)
+        if not snapshots:
+            raise BackupError(f'{root} 中没有快照')
+        snapshot_id = snapshots[-1]
+    path = _snapshot_dir(root) / f'{snapshot_id}.json.gz'
+    if not path.exists():
+        raise BackupError(f'{root} 中不存在快照 {snapshot_id}')
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_NAME or manifest.get('version') != FORMAT_VERSION:
+        raise BackupError(f'{path} 不是支持的备份清单')
+    return manifest
+
+
+def _write_manifest(root, manifest):
+    directory = _snapshot_dir(root)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+        f.write(json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+    # 清单最后写入：中断的备份只会留下未被引用的数据块
+    os.replace(tmp_path, directory / f"{manifest['id']}.json.gz")
+
+
+def _new_snapshot_id(root):
+    base = datetime.now().strftime('%Y%m%dT%H%M%S')
+    existing = set(list_snapshots(root))
+    snapshot_id, n = base, 1
+    while snapshot_id in existing:
+        n += 1
+        snapshot_id = f'{base}-{n}'
+    return snapshot_id
+
+
+# 媒体文件 -------------------------------------------------------------------
+
+def scan_media(media_root):
+    """逐个返回 media_root 下的文件：(相对路径, 绝对路径, 大小, 修改时间纳秒)"""
+    media_root = Path(media_root)
+    for dirpath, dirnames, filenames in os.walk(media_root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            stat = path.stat()
+            yield path.relative_to(media_root).as_posix(), path, stat.st_size, stat.st_mtime_ns
+
+
+def backup_media(store, media_root, previous=None, rehash=False, workers=4):
+    """
+    存入新增或修改的媒体文件，返回 (清单条目, 统计)。
+    previous 为上次快照清单，大小与修改时间未变的文件不再读取
+    """
+    known = {}
+    if previous and not rehash:
+        known = {entry['path']: entry for entry in previous['media']}
+
+    entries, pending = [], []
+    for rel_path, path, size, mtime_ns in scan_media(media_root):
+        entry = {'path': rel_path, 'size': size, 'mtime_ns': mtime_ns}
+        old = known.get(rel_path)
+        if old and old['size'] == size and old['mtime_ns'] == mtime_ns and store.has(old['sha256']):
+            entry['sha256'] = old['sha256']
+        else:
+            pending.append((entry, path))
+        entries.append(entry)
+
+    stats = {'files': len(entries), 'files_read': len(pending), 'blobs_written': 0, 'bytes_written': 0}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for (entry, _), (digest, written) in zip(pending, pool.map(lambda item: store.put_file(item[1]), pending)):
+            entry['sha256'] = digest
+            if written:
+                stats['blobs_written'] += 1
+                stats['bytes_written'] += entry['size']
+    return entries, stats
+
+
+def restore_media(store, entries, media_root):
+    """将快照中的文件写入 media_root（已一致的文件不改动）"""
+    media_root = Path(media_root).resolve()
+    stats = {'files': len(entries), 'files_written': 0}
+    for entry in entries:
+        target = (media_root / entry['path']).resolve()
+        if media_root not in target.parents:
+            raise BackupError(f"拒绝恢复到 MEDIA_ROOT 之外: {entry['path']}")
+        if target.exists():
+            stat = target.stat()
+            if stat.st_size == entry['size'] and (
+                stat.st_mtime_ns == entry['mtime_ns'] or file_digest(target) == entry['sha256']
+            ):
+                continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent)
+        with os.fdopen(fd, 'wb') as out, store.open(entry['sha256']) as blob:
+            for block in iter(lambda: blob.read(READ_BUFFER_SIZE), b''):
+                out.write(block)
+        os.replace(tmp_path, target)
+        # 保留清单中的修改时间，下次备份可跳过该文件
+        os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+        stats['files_written'] += 1
+    return stats
+
+
+# 数据库 ---------------------------------------------------------------------
+
+def backed_up_models():
+    """需要备份的模型（含自动创建的多对多中间表），按自然键依赖排序"""
+    models = [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy and model._meta.label_lower not in EXCLUDED_MODELS
+    ]
+    return serializers.sort_dependencies([(None, models)], allow_cycles=True)
+
+
+def _natural_key_relations(model):
+    """序列化自然键外键所需的 select_related() 路径（避免逐行查询）"""
+    paths = []
+    for field in model._meta.concrete_fields:
+        if field.is_relation and hasattr(field.related_model, 'natural_key'):
+            paths.append(field.name)
+            paths.extend(
+                f'{field.name}__{nested.name}' for nested in field.related_model._meta.concrete_fields
+                if nested.is_relation and hasattr(nested.related_model, 'natural_key')
+            )
+    return paths
+
+
+def iter_model_chunks(model, chunk_size=DB_CHUNK_SIZE):
+    """按主键范围分组，逐个返回 model 的 (分块号, 行列表)"""
+    queryset = model._base_manager.order_by('pk')
+    relations = _natural_key_relations(model)
+    if relations:
+        queryset = queryset.select_related(*relations)
+    numeric_pk = model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField')
+
+    chunk, rows = None, []
+    for index, obj in enumerate(queryset.iterator(chunk_size=chunk_size)):
+        number = obj.pk // chunk_size if numeric_pk else index // chunk_size
+        if number != chunk and rows:
+            yield chunk, rows
+            rows = []
+        chunk = number
+        rows.append(obj)
+    if rows:
+        yield chunk, rows
+
+
+def backup_database(store, using=DEFAULT_DB_ALIAS, chunk_size=DB_CHUNK_SIZE):
+    """分块序列化全部备份模型，返回 (清单条目, 统计)"""
+    entries = []
+    stats = {'chunks': 0, 'rows': 0, 'blobs_written': 0, 'bytes_written': 0}
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            # 整个导出过程使用同一个一致性视图
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        for model in backed_up_models():
+            # 多对多关系通过其（自动创建的）中间表模型单独备份
+            fields = [field.name for field in model._meta.local_fields]
+            for number, rows in iter_model_chunks(model, chunk_size):
+                data = serializers.serialize(
+                    'json', rows, fields=fields, use_natural_foreign_keys=True
+                ).encode('utf-8')
+                digest, written = store.put_bytes(data)
+                entries.append({
+                    'model': model._meta.label_lower, 'chunk': number, 'rows': len(rows), 'sha256': digest
+                })
+                stats['chunks'] += 1
+                stats['rows'] += len(rows)
+                if written:
+                    stats['blobs_written'] += 1
+                    stats['bytes_written'] += len(data)
+    return entries, stats
+
+
+def restore_database(store, entries, using=DEFAULT_DB_ALIAS):
+    """
+    将快照中的行载入已迁移且备份表为空的数据库。
+    全部在一个事务中载入，最后统一检查约束
+    """
+    models = backed_up_models()
+    not_empty = [model._meta.label_lower for model in models if model._base_manager.using(using).exists()]
+    if not_empty:
+        raise BackupError(f"数据库不为空（{', '.join(not_empty)}），请先运行 'manage.py flush'")
+
+    connection = connections[using]
+    rows = 0
+    loaded = set()
+    with transaction.atomic(using=using):
+        with connection.constraint_checks_disabled():
+            deferred = []
+            for entry in entries:
+                model = apps.get_model(entry['model'])
+                data = store.read(entry['sha256']).decode('utf-8')
+                objects = list(serializers.deserialize('json', data, using=using, handle_forward_references=True))
+                # 表为空，直接批量插入，不必像 save() 那样先UPDATE再INSERT
+                model._base_manager.using(using).bulk_create([obj.object for obj in objects])
+                deferred.extend(obj for obj in objects if obj.deferred_fields)
+                rows += len(objects)
+                loaded.add(model)
+            for obj in deferred:
+                obj.save_deferred_fields(using=using)
+        connection.check_constraints(table_names=[model._meta.db_table for model in loaded])
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(loaded))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+    return {'chunks': len(entries), 'rows': rows}
+
+
+# 入口 -----------------------------------------------------------------------
+
+def create_snapshot(root, media_root=None, include_media=True, include_database=True, rehash=False, workers=4):
+    """在 root 备份库中创建新快照，返回其清单"""
+    store = BlobStore(root)
+    previous = load_manifest(root) if list_snapshots(root) else None
+    manifest = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'id': _new_snapshot_id(root),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'media': [],
+        'database': [],
+        'stats': {},
+    }
+    if include_database:
+        manifest['database'], manifest['stats']['database'] = backup_database(store)
+    if include_media and media_root and Path(media_root).exists():
+        manifest['media'], manifest['stats']['media'] = backup_media(
+            store, media_root, previous=previous, rehash=rehash, workers=workers
+        )
+    _write_manifest(root, manifest)
+    return manifest
+
+
+def restore_snapshot(root, snapshot_id='latest', media_root=None, include_media=True, include_database=True):
+    """恢复快照的数据库和/或媒体文件，返回各部分统计"""
+    store = BlobStore(root)
+    manifest = load_manifest(root, snapshot_id)
+    missing = {entry['sha256'] for entry in manifest['media'] + manifest['database'] if not store.has(entry['sha256'])}
+    if missing:
+        raise BackupError(f"快照 {manifest['id']} 引用的 {len(missing)} 个数据块缺失")
+    stats = {'id': manifest['id']}
+    if include_database:
+        stats['database'] = restore_database(store, manifest['database'])
+    if include_media:
+        stats['media'] = restore_media(store, manifest['media'], media_root)
+    return stats
+
+
+def prune_snapshots(root, keep):
+    """只保留最新的 keep 个快照，删除其余快照及只被它们引用的数据块"""
+    store = BlobStore(root)
+    snapshots = list_snapshots(root)
+    removed = snapshots[:-keep] if keep > 0 else snapshots
+    for snapshot_id in removed:
+        (_snapshot_dir(root) / f'{snapshot_id}.json.gz').unlink()
+
+    referenced = set()
+    for snapshot_id in list_snapshots(root):
+        manifest = load_manifest(root, snapshot_id)
+        referenced.update(entry['sha256'] for entry in manifest['media'] + manifest['database'])
+    blobs_removed = 0
+    for digest, path in list(store.iter_blobs()):
+        if digest not in referenced:
+            path.unlink()
+            blobs_removed += 1
+    # 中断的备份遗留的临时文件
+    if store.tmp.exists():
+        for path in store.tmp.iterdir():
+            path.unlink()
+    return {'snapshots': len(removed), 'blobs': blobs_removed}
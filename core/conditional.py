@@ -0,0 +1,81 @@
+"""
+Conditional GET (ETag / 304 Not Modified) driven by project data versions
+"""
+import asyncio
+import zlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import condition
+
+
+def version_etag(request, version):
+    """
+    Build the ETag for a response rendered from a project at ``version``.
+
+    Besides the version it covers the user, today's date (progress and overdue
+    values are relative to today) and the CSRF cookie, so a page cached before
+    a re-login is never revalidated with a stale embedded token.
+    """
+    csrf_cookie = request.META.get('CSRF_COOKIE') or ''
+    return '"v{}-u{}-d{}-c{:08x}"'.format(
+        version,
+        request.user.pk or 0,
+        date.today().strftime('%Y%m%d'),
+        zlib.crc32(csrf_cookie.encode()),
+    )
+
+
+def versioned_condition(version_func):
+    """
+    Answer conditional GETs with 304 before the view runs.
+
+    ``version_func(request, *args, **kwargs)`` receives the view arguments and
+    returns the data version of the project behind the resource, or None when
+    it cannot be resolved (the view then runs normally, e.g. to return 404).
+    Responses with pending flash messages are never short-circuited. Tagged
+    responses are marked ``private, no-cache`` so clients always revalidate.
+    Async views stay async; the version lookup runs in the ORM thread.
+    """
+    def etag_func(request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        version = version_func(request, *args, **kwargs)
+        if version is None:
+            return None
+        return version_etag(request, version)
+
+    def tag(request, response, etag):
+        # condition() sets the ETag itself for sync views
+        if request.method in ('GET', 'HEAD') and etag:
+            response.headers.setdefault('ETag', etag)
+        if response.has_header('ETag'):
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def async_decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            return tag(request, response, etag)
+
+        return inner
+
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            return async_decorator(view_func)
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            return tag(request, conditional_view(request, *args, **kwargs), None)
+
+        return inner
+
+    return decorator
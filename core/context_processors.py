@@ -0,0 +1,11 @@
+"""
+Template context processors
+"""
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """Expose the template fragment cache timeout to ``{% cache %}`` blocks"""
+    return {
+        'fragment_cache_timeout': settings.TEMPLATE_FRAGMENT_CACHE_TIMEOUT,
+    }
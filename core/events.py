@@ -0,0 +1,104 @@
+"""
+In-process publish/subscribe broker for server-sent events.
+
+Publishers may run in any thread (model signals fire in the sync views' threads);
+each subscriber owns an asyncio queue bound to the event loop of the ASGI worker
+that serves its stream, and events are handed over with ``call_soon_threadsafe``.
+
+This is a single-process stand-in for an external broker: events only reach
+streams served by the same process, so the site must run as one ASGI worker
+process (sync views are served from its thread pool) for writes to be seen.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Sentinel delivered when a subscriber fell behind and missed events.
+RESYNC = object()
+
+
+class Subscription:
+    """A subscriber's bounded queue on its own event loop."""
+
+    def __init__(self, channel, max_pending):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscriber's loop. On overflow drop the backlog and ask the
+        # client to resynchronise instead of blocking the publisher.
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        if self.overflowed and self.queue.empty():
+            self.overflowed = False
+            return RESYNC
+        return await self.queue.get()
+
+
+class EventBroker:
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Subscribe from within the event loop that will consume the events."""
+        subscription = Subscription(channel, self.max_pending)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def publish(self, channel, event):
+        """Thread-safe; returns the number of subscribers the event was handed to."""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has been closed; its stream is gone.
+                self.unsubscribe(subscription)
+            else:
+                delivered += 1
+        return delivered
+
+
+broker = EventBroker()
+
+
+def format_sse(data=None, event=None, event_id=None, retry=None):
+    """Encode one server-sent event frame."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event is not None:
+        lines.append(f'event: {event}')
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    payload = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    lines.extend(f'data: {line}' for line in payload.splitlines())
+    return '\n'.join(lines) + '\n\n'
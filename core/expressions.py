@@ -0,0 +1,94 @@
+"""
+Portable database expressions for date arithmetic
+"""
+from django.db import models
+from django.db.models import Func
+from django.db.models.lookups import GreaterThan
+
+
+class DaysBetween(Func):
+    """Whole days from ``start`` to ``end`` (``end - start``) as an integer"""
+
+    arity = 2
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = models.IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='DATEDIFF(%(expressions)s)',
+            arg_joiner=', ',
+            **extra_context
+        )
+
+
+class AddDays(Func):
+    """``date`` plus a whole number of ``days`` (may be negative) as a date"""
+
+    arity = 2
+    template = '(%(expressions)s)'
+    arg_joiner = ' + '
+    output_field = models.DateField()
+
+    def __init__(self, date, days, **extra):
+        super().__init__(date, days, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="date(%(expressions)s || ' days')",
+            arg_joiner=', ',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='DATE_ADD(%(expressions)s DAY)',
+            arg_joiner=', INTERVAL ',
+            **extra_context
+        )
+
+
+class IntegerDivide(Func):
+    """Truncating integer division ``dividend / divisor``"""
+
+    arity = 2
+    template = '(%(expressions)s)'
+    arg_joiner = ' / '
+    output_field = models.IntegerField()
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, arg_joiner=' DIV ', **extra_context)
+
+
+def time_progress_expression(today, total_days, status_cases):
+    """
+    Build a CASE expression matching the Python ``progress_percentage`` properties:
+    ``status_cases`` come first, then 0 before ``start_date``, 100 after
+    ``end_date``, otherwise ``elapsed * 100 // total_days`` (0 when total is 0).
+    """
+    today_value = models.Value(today, output_field=models.DateField())
+    elapsed_days = DaysBetween(today_value, models.F('start_date'))
+    return models.Case(
+        *status_cases,
+        models.When(start_date__gt=today, then=models.Value(0)),
+        models.When(end_date__lt=today, then=models.Value(100)),
+        models.When(GreaterThan(total_days, 0), then=IntegerDivide(
+            elapsed_days * models.Value(100), total_days
+        )),
+        default=models.Value(0),
+        output_field=models.IntegerField(),
+    )
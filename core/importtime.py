@@ -0,0 +1,108 @@
+"""
+Startup import profiling.
+
+Runs ``django.setup()`` in a fresh interpreter with ``-X importtime`` and
+parses the per-module timings written to stderr, so cold-start cost can be
+reported and guarded in tests without the current process's module cache
+getting in the way.
+"""
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from django.conf import settings
+
+# Libraries that are only needed by specific features (PDF validation,
+# thumbnails, PDF/Excel export) and must be imported on first use.
+HEAVY_MODULES = ('PyPDF2', 'PIL', 'pdf2image', 'reportlab', 'openpyxl')
+
+# Wall-clock budget for django.setup() in a cold interpreter, in milliseconds.
+SETUP_BUDGET_MS = 1500
+
+ImportRecord = namedtuple('ImportRecord', 'name self_us cumulative_us depth')
+
+_SETUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+django.setup()
+for name in {imports!r}:
+    __import__(name)
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+def parse_importtime(output):
+    """Parse ``-X importtime`` lines (``import time: self | cumulative | name``)."""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Header line ("self [us] | cumulative | imported package").
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip(' ')
+        records.append(ImportRecord(
+            name=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return records
+
+
+def measure_startup(imports=(), settings_module=None):
+    """
+    Time ``django.setup()`` (plus ``imports``) in a subprocess.
+
+    Returns ``(setup_ms, records)``.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module or os.environ.get(
+        'DJANGO_SETTINGS_MODULE', 'construction_pm.settings'
+    ))
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SETUP_SCRIPT.format(imports=tuple(imports))],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def loaded_heavy_modules(records, heavy=HEAVY_MODULES):
+    """Top-level names from ``heavy`` that were imported."""
+    return sorted({
+        record.name.split('.')[0] for record in records if record.name.split('.')[0] in heavy
+    })
+
+
+def build_report(setup_ms, records, top=20):
+    """Summarise one profiled startup; times are in milliseconds."""
+    def entry(record):
+        return {
+            'module': record.name,
+            'self_ms': round(record.self_us / 1000, 2),
+            'cumulative_ms': round(record.cumulative_us / 1000, 2),
+        }
+
+    packages = {}
+    for record in records:
+        if record.depth == 0:
+            package = record.name.split('.')[0]
+            packages[package] = packages.get(package, 0) + record.cumulative_us
+
+    return {
+        'setup_ms': round(setup_ms, 2),
+        'budget_ms': SETUP_BUDGET_MS,
+        'module_count': len(records),
+        'import_ms': round(sum(record.self_us for record in records) / 1000, 2),
+        'heavy_modules_loaded': loaded_heavy_modules(records),
+        'by_package': [
+            {'package': package, 'cumulative_ms': round(us / 1000, 2)}
+            for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+        'top_cumulative': [entry(r) for r in sorted(records, key=lambda r: -r.cumulative_us)[:top]],
+        'top_self': [entry(r) for r in sorted(records, key=lambda r: -r.self_us)[:top]],
+    }
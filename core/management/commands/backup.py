@@ -0,0 +1,64 @@
+"""
+增量备份：数据库按主键范围分块序列化、媒体文件按内容哈希去重存入备份库，每次生成一个快照清单
+
+未变化的媒体文件（大小与修改时间同上次快照一致）不重新读取，已存在的数据块/文件不重复写入，
+夜间备份只复制新增或修改的图纸。恢复见 restore_backup。
+
+示例:
+    python manage.py backup                       # 备份到 settings.BACKUP_ROOT
+    python manage.py backup --keep 14             # 备份后只保留最近14个快照，并清理不再引用的数据
+    python manage.py backup --list
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backup import create_snapshot, list_snapshots, load_manifest, prune_snapshots
+
+
+class Command(BaseCommand):
+    help = '创建数据库与媒体文件的增量快照（内容哈希去重）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', default=settings.BACKUP_ROOT, help='备份库目录')
+        parser.add_argument('--no-media', action='store_true', help='不备份媒体文件')
+        parser.add_argument('--no-database', action='store_true', help='不备份数据库')
+        parser.add_argument('--rehash', action='store_true', help='重新读取所有媒体文件（不信任大小与修改时间）')
+        parser.add_argument('--workers', type=int, default=4, help='并行读取媒体文件的线程数')
+        parser.add_argument('--keep', type=int, help='备份后只保留最近N个快照')
+        parser.add_argument('--list', action='store_true', help='列出已有快照后退出')
+
+    def handle(self, *args, **options):
+        root = options['root']
+        if options['list']:
+            for snapshot_id in list_snapshots(root):
+                manifest = load_manifest(root, snapshot_id)
+                rows = sum(entry['rows'] for entry in manifest['database'])
+                size = sum(entry['size'] for entry in manifest['media']) / (1024 * 1024)
+                self.stdout.write(f"{snapshot_id}  数据库 {rows} 行  媒体文件 {len(manifest['media'])} 个（{size:.1f} MB）")
+            return
+        if options['keep'] is not None and options['keep'] < 1:
+            raise CommandError('--keep 至少为1')
+
+        manifest = create_snapshot(
+            root,
+            media_root=settings.MEDIA_ROOT,
+            include_media=not options['no_media'],
+            include_database=not options['no_database'],
+            rehash=options['rehash'],
+            workers=options['workers'],
+        )
+        stats = manifest['stats']
+        if 'database' in stats:
+            db = stats['database']
+            self.stdout.write(f"数据库: {db['rows']} 行，{db['chunks']} 个数据块，新写入 {db['blobs_written']} 个")
+        if 'media' in stats:
+            media = stats['media']
+            self.stdout.write(
+                f"媒体文件: {media['files']} 个，读取 {media['files_read']} 个，新写入 {media['blobs_written']} 个"
+                f"（{media['bytes_written'] / (1024 * 1024):.1f} MB）"
+            )
+        self.stdout.write(self.style.SUCCESS(f"快照 {manifest['id']} 已写入 {root}"))
+
+        if options['keep']:
+            pruned = prune_snapshots(root, options['keep'])
+            self.stdout.write(f"已删除 {pruned['snapshots']} 个旧快照、{pruned['blobs']} 个不再引用的数据")
@@ -0,0 +1,225 @@
+"""
+生成可扩展规模的合成数据集（用于性能基准测试）
+
+示例:
+    python manage.py generate_dataset --projects 100 --worksites 20 --tasks 500 --depth 4
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from drawings.models import Drawing
+from projects.models import Project, WorkSite
+from tasks.models import Task, TaskAnnotation, TaskDependency
+
+TASK_NAMES = ['基础开挖', '钢筋绑扎', '模板支设', '混凝土浇筑', '砌体施工', '水电预埋', '外墙保温', '门窗安装', '屋面防水', '竣工验收']
+PEOPLE = ['张工', '李工', '王工', '赵工', '刘工', '陈工']
+
+
+class Command(BaseCommand):
+    help = '使用bulk_create批量生成项目/工地/任务/依赖/图纸/标注的合成数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default='benchmark', help='数据所属用户名（不存在则创建）')
+        parser.add_argument('--projects', type=int, default=10, help='项目数')
+        parser.add_argument('--worksites', type=int, default=5, help='每个项目的工地数')
+        parser.add_argument('--tasks', type=int, default=100, help='每个工地的任务数（含子任务）')
+        parser.add_argument('--depth', type=int, default=3, help='任务层级深度')
+        parser.add_argument('--dependencies', type=float, default=0.5, help='每个任务的平均前置依赖数')
+        parser.add_argument('--drawings', type=int, default=3, help='每个工地的图纸数')
+        parser.add_argument('--annotations', type=float, default=1.0, help='每个任务的平均标注数')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError('当前数据库不支持bulk_create返回主键，请使用SQLite或PostgreSQL')
+        if options['depth'] < 1:
+            raise CommandError('--depth 必须大于等于1')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+
+        User = get_user_model()
+        owner, created = User.objects.get_or_create(username=options['owner'])
+        if created:
+            owner.set_password('benchmark')
+            owner.save()
+
+        started = time.perf_counter()
+        totals = {'projects': 0, 'worksites': 0, 'tasks': 0, 'dependencies': 0, 'drawings': 0, 'annotations': 0}
+        for index in range(options['projects']):
+            with transaction.atomic():
+                counts = self.generate_project(owner, index)
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(f"项目 {index + 1}/{options['projects']} 已生成")
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{key}={value}' for key, value in totals.items())
+        self.stdout.write(self.style.SUCCESS(f'数据生成完成（{elapsed:.1f}s）: {summary}'))
+
+    def generate_project(self, owner, index):
+        """生成单个项目及其全部下级数据"""
+        rng = self.rng
+        start = date.today() - timedelta(days=rng.randint(0, 365))
+        project = Project.objects.bulk_create([Project(
+            owner=owner,
+            name=f'基准项目 {index + 1:04d}',
+            description='合成基准测试数据',
+            start_date=start,
+            end_date=start + timedelta(days=rng.randint(360, 720)),
+            status=rng.choice(['planning', 'active', 'active', 'completed']),
+        )])[0]
+
+        worksites = WorkSite.objects.bulk_create([
+            WorkSite(
+                project=project,
+                name=f'工地 {n + 1:02d}',
+                location=f'{n + 1}号地块',
+                site_manager=rng.choice(PEOPLE),
+                start_date=project.start_date,
+                end_date=project.end_date,
+                status=rng.choice(['preparing', 'active', 'completed']),
+            )
+            for n in range(self.options['worksites'])
+        ], batch_size=self.batch_size)
+
+        drawings = Drawing.objects.bulk_create([
+            Drawing(
+                worksite=worksite,
+                name=f'{worksite.name} 图纸 {n + 1}',
+                file=f'drawings/synthetic/p{project.pk}_w{worksite.pk}_{n + 1}.pdf',
+                file_size=rng.randint(200_000, 8_000_000),
+                page_count=rng.randint(1, 12),
+                file_type='pdf',
+            )
+            for worksite in worksites
+            for n in range(self.options['drawings'])
+        ], batch_size=self.batch_size)
+        drawings_by_worksite = {}
+        for drawing in drawings:
+            drawings_by_worksite.setdefault(drawing.worksite_id, []).append(drawing)
+
+        tasks_by_worksite = self.generate_tasks(worksites)
+        all_tasks = [task for tasks in tasks_by_worksite.values() for task in tasks]
+
+        dependency_count = self.generate_dependencies(tasks_by_worksite)
+
+        annotations = []
+        for task in all_tasks:
+            worksite_drawings = drawings_by_worksite.get(task.worksite_id)
+            if not worksite_drawings:
+                continue
+            for _ in range(self._random_count(self.options['annotations'])):
+                drawing = rng.choice(worksite_drawings)
+                annotations.append(TaskAnnotation(
+                    task=task,
+                    drawing=drawing,
+                    annotation_type=rng.choice(['point', 'rectangle', 'text', 'line']),
+                    page_number=rng.randint(1, drawing.page_count),
+                    x_coordinate=rng.uniform(0, 1000),
+                    y_coordinate=rng.uniform(0, 800),
+                    width=rng.uniform(10, 200),
+                    height=rng.uniform(10, 200),
+                    color=rng.choice(['red', 'blue', 'green', 'orange']),
+                    content=f'{task.name} 标注',
+                ))
+        TaskAnnotation.objects.bulk_create(annotations, batch_size=self.batch_size)
+
+        # bulk_create不触发信号，统一重算计数缓存
+        WorkSite.objects.filter(project=project).refresh_counters()
+        Project.objects.filter(pk=project.pk).refresh_counters()
+
+        return {
+            'projects': 1,
+            'worksites': len(worksites),
+            'tasks': len(all_tasks),
+            'dependencies': dependency_count,
+            'drawings': len(drawings),
+            'annotations': len(annotations),
+        }
+
+    def generate_tasks(self, worksites):
+        """按层级生成任务树（每层一次bulk_create，父任务主键由上一层返回）"""
+        rng = self.rng
+        depth = self.options['depth']
+        per_worksite = self.options['tasks']
+
+        # 每层任务数量按1:2:4...递增分配，保证深层存在足够子任务
+        weights = [2 ** level for level in range(depth)]
+        level_sizes = [max(1, per_worksite * w // sum(weights)) for w in weights]
+        level_sizes[-1] = max(1, per_worksite - sum(level_sizes[:-1]))
+
+        tasks_by_worksite = {worksite.pk: [] for worksite in worksites}
+        parents_by_worksite = {worksite.pk: [None] for worksite in worksites}
+
+        for level, size in enumerate(level_sizes):
+            level_tasks = []
+            for worksite in worksites:
+                parents = parents_by_worksite[worksite.pk]
+                for n in range(size):
+                    parent = rng.choice(parents)
+                    lower = parent.start_date if parent else worksite.start_date
+                    upper = parent.end_date if parent else worksite.end_date
+                    span = (upper - lower).days
+                    start = lower + timedelta(days=rng.randint(0, max(0, span - 1)))
+                    end = min(upper, start + timedelta(days=rng.randint(1, max(1, span // (level + 2)))))
+                    level_tasks.append(Task(
+                        worksite=worksite,
+                        parent_task=parent,
+                        name=f'{rng.choice(TASK_NAMES)} L{level}-{n + 1}',
+                        task_type=rng.choice([choice for choice, _ in Task.TASK_TYPE_CHOICES]),
+                        status=rng.choice(['open', 'in_progress', 'pending', 'completed']),
+                        responsible_person=rng.choice(PEOPLE),
+                        start_date=start,
+                        end_date=end,
+                        deadline=end,
+                    ))
+
+            created = Task.objects.bulk_create(level_tasks, batch_size=self.batch_size)
+            next_parents = {worksite.pk: [] for worksite in worksites}
+            for task in created:
+                tasks_by_worksite[task.worksite_id].append(task)
+                next_parents[task.worksite_id].append(task)
+            parents_by_worksite = next_parents
+
+        return tasks_by_worksite
+
+    def generate_dependencies(self, tasks_by_worksite):
+        """生成无环依赖：前置任务总是排在后续任务之前（按开始日期）"""
+        rng = self.rng
+        edges = set()
+        for tasks in tasks_by_worksite.values():
+            ordered = sorted(tasks, key=lambda t: (t.start_date, t.pk))
+            for position, successor in enumerate(ordered[1:], start=1):
+                for _ in range(self._random_count(self.options['dependencies'])):
+                    predecessor = ordered[rng.randrange(position)]
+                    edges.add((predecessor.pk, successor.pk))
+
+        TaskDependency.objects.bulk_create([
+            TaskDependency(
+                predecessor_id=predecessor_id,
+                successor_id=successor_id,
+                dependency_type=rng.choice(['finish_to_start', 'finish_to_start', 'start_to_start']),
+                lag_days=rng.choice([0, 0, 0, 1, 2]),
+            )
+            for predecessor_id, successor_id in edges
+        ], batch_size=self.batch_size)
+
+        Through = Task.dependencies.through
+        Through.objects.bulk_create([
+            Through(from_task_id=successor_id, to_task_id=predecessor_id)
+            for predecessor_id, successor_id in edges
+        ], batch_size=self.batch_size)
+        return len(edges)
+
+    def _random_count(self, mean):
+        """按平均值生成非负整数（整数部分 + 按小数部分概率加一）"""
+        whole = int(mean)
+        return whole + (1 if self.rng.random() < mean - whole else 0)
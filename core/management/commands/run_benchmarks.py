@@ -0,0 +1,148 @@
+"""
+热点视图/API基准测试：测量延迟与查询数，输出JSON报告
+
+示例:
+    python manage.py generate_dataset --projects 2 --worksites 20 --tasks 500 --depth 4
+    python manage.py run_benchmarks --iterations 5 --output bench_output.json
+"""
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from projects.models import Project, WorkSite
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = '对项目详情、工地详情、任务列表、甘特图API及导出接口进行基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default='benchmark', help='以该用户身份发起请求')
+        parser.add_argument('--project', type=int, help='项目ID（默认取任务最多的项目）')
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--only', nargs='*', help='仅运行指定名称的基准')
+        parser.add_argument('--output', help='报告输出文件（默认输出到标准输出）')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations 必须大于等于1')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup 不能为负数')
+
+        User = get_user_model()
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户 {options['owner']} 不存在，请先运行 generate_dataset")
+
+        projects = Project.objects.filter(owner=owner)
+        if options['project']:
+            project = projects.filter(pk=options['project']).first()
+        else:
+            project = projects.annotate(task_total=Count('worksites__tasks')).order_by('-task_total').first()
+        if project is None:
+            raise CommandError('没有可用于基准测试的项目')
+
+        worksite = WorkSite.objects.filter(project=project).annotate(
+            task_total=Count('tasks')
+        ).order_by('-task_total').first()
+
+        targets = [
+            ('project_detail', reverse('projects:project_detail', kwargs={'pk': project.pk})),
+            ('task_list', reverse('tasks:task_list')),
+            ('gantt_data_api', reverse('gantt:gantt_data_api', kwargs={'project_id': project.pk})),
+            ('project_gantt', reverse('gantt:project_gantt', kwargs={'project_id': project.pk})),
+            ('export_gantt_csv', reverse('gantt:export_gantt_csv', kwargs={'project_id': project.pk})),
+            ('export_gantt_pdf', reverse('gantt:export_gantt_pdf', kwargs={'project_id': project.pk})),
+        ]
+        if worksite:
+            targets.insert(1, ('worksite_detail', reverse('projects:worksite_detail', kwargs={'pk': worksite.pk})))
+        if options['only']:
+            targets = [target for target in targets if target[0] in options['only']]
+
+        client = Client()
+        client.force_login(owner)
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=['testserver'], NPLUSONE_MODE=''):
+            for name, url in targets:
+                self.stderr.write(f'基准测试 {name} ...')
+                results.append(self.measure(client, name, url, options['iterations'], options['warmup']))
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'project_id': project.pk,
+                'worksite_id': worksite.pk if worksite else None,
+                'projects': projects.count(),
+                'worksites': WorkSite.objects.filter(project=project).count(),
+                'tasks': Task.objects.filter(worksite__project=project).count(),
+                'owner_tasks': Task.objects.filter(worksite__project__owner=owner).count(),
+            },
+            'iterations': options['iterations'],
+            'results': results,
+        }
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f"报告已写入 {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def measure(self, client, name, url, iterations, warmup):
+        """多次请求同一URL，记录延迟分布、查询数和响应大小"""
+        for _ in range(warmup):
+            self._consume(client.get(url))
+
+        latencies = []
+        query_counts = []
+        status_code = None
+        size = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                size = self._consume(response)
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            status_code = response.status_code
+
+        latencies.sort()
+        p95_index = min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))
+        return {
+            'name': name,
+            'url': url,
+            'status': status_code,
+            'bytes': size,
+            'queries': max(query_counts),
+            'latency_ms': {
+                'min': round(latencies[0], 2),
+                'median': round(statistics.median(latencies), 2),
+                'p95': round(latencies[p95_index], 2),
+                'max': round(latencies[-1], 2),
+            },
+        }
+
+    @staticmethod
+    def _consume(response):
+        """读取完整响应体（兼容流式响应），返回字节数"""
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
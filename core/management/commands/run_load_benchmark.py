@@ -0,0 +1,251 @@
+"""
+并发负载基准：对比同步（gunicorn WSGI）与异步（uvicorn ASGI）部署在大量慢速客户端下的表现
+
+每个部署以相同的并发数请求同一组URL（默认：甘特图数据API、图纸文件），客户端按
+--read-delay 间隔分块读取响应以模拟慢速网络，统计吞吐、延迟分布与失败数。
+
+示例（手动启动两个部署）:
+    gunicorn construction_pm.wsgi:application --workers 4 --bind 127.0.0.1:8001
+    gunicorn construction_pm.asgi:application -k uvicorn.workers.UvicornWorker --workers 1 --bind 127.0.0.1:8002
+    python manage.py run_load_benchmark --target sync=http://127.0.0.1:8001 --target async=http://127.0.0.1:8002 \\
+        --concurrency 300 --requests 1500 --read-delay 0.05 --output load_report.json
+
+或由命令自动启动上述两个部署（需已安装 gunicorn 与 uvicorn）:
+    python manage.py run_load_benchmark --launch --concurrency 300
+"""
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+
+from drawings.models import Drawing
+from projects.models import Project
+
+READ_CHUNK_SIZE = 16 * 1024
+
+# --launch 时启动的部署：(标签, 端口, 命令)
+LAUNCH_DEPLOYMENTS = [
+    ('sync', 8701, ['gunicorn', 'construction_pm.wsgi:application', '--workers', '4']),
+    ('async', 8702, [
+        'gunicorn', 'construction_pm.asgi:application', '-k', 'uvicorn.workers.UvicornWorker', '--workers', '1'
+    ]),
+]
+
+
+class Command(BaseCommand):
+    help = '以大量并发慢速客户端对比同步与异步部署的吞吐与延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default='benchmark', help='以该用户身份发起请求')
+        parser.add_argument('--project', type=int, help='项目ID（默认取任务最多的项目）')
+        parser.add_argument('--target', action='append', default=[], metavar='LABEL=URL',
+                            help='待测部署，如 sync=http://127.0.0.1:8001（可重复）')
+        parser.add_argument('--launch', action='store_true', help='自动启动 gunicorn 同步与 uvicorn 异步部署')
+        parser.add_argument('--path', action='append', default=[], help='请求路径（默认：甘特图数据API与图纸文件）')
+        parser.add_argument('--concurrency', type=int, default=200, help='同时保持的连接数')
+        parser.add_argument('--requests', type=int, default=1000, help='每个部署、每个路径的请求总数')
+        parser.add_argument('--read-delay', type=float, default=0.05, help='客户端每读取16KB后的等待秒数')
+        parser.add_argument('--timeout', type=float, default=60.0, help='单次读写超时秒数')
+        parser.add_argument('--output', help='报告输出文件（默认输出到标准输出）')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户 {options['owner']} 不存在，请先运行 generate_dataset")
+
+        paths = options['path'] or self.default_paths(owner, options['project'])
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.create_session(owner)}'
+
+        targets = []
+        for target in options['target']:
+            label, _, url = target.partition('=')
+            if not url:
+                raise CommandError(f'无效的部署参数: {target}（应为 LABEL=URL）')
+            targets.append((label, url))
+
+        processes = []
+        try:
+            if options['launch']:
+                processes = self.launch_deployments()
+                targets.extend((label, f'http://127.0.0.1:{port}') for label, port, _ in LAUNCH_DEPLOYMENTS)
+            if not targets:
+                raise CommandError('请通过 --target 指定部署，或使用 --launch')
+
+            results = []
+            for label, url in targets:
+                for path in paths:
+                    self.stderr.write(f'{label}: {path} 并发 {options["concurrency"]} ...')
+                    results.append(asyncio.run(self.run_load(label, url, path, cookie, options)))
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait(timeout=10)
+
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+            },
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'read_delay': options['read_delay'],
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f"报告已写入 {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def default_paths(self, owner, project_id):
+        projects = Project.objects.filter(owner=owner)
+        if project_id:
+            project = projects.filter(pk=project_id).first()
+        else:
+            project = projects.annotate(task_total=Count('worksites__tasks')).order_by('-task_total').first()
+        if project is None:
+            raise CommandError('没有可用于基准测试的项目')
+
+        paths = [reverse('gantt:gantt_data_api', kwargs={'project_id': project.pk})]
+        drawing = Drawing.objects.filter(worksite__project=project).order_by('-file_size').first()
+        if drawing:
+            paths.append(reverse('drawings:drawing_file', kwargs={'pk': drawing.pk}))
+        return paths
+
+    @staticmethod
+    def create_session(owner):
+        """为基准用户创建登录会话，返回会话键"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = owner._meta.pk.value_to_string(owner)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = owner.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def launch_deployments(self):
+        if not shutil.which('gunicorn'):
+            raise CommandError('未安装 gunicorn，无法使用 --launch')
+        processes = []
+        for label, port, command in LAUNCH_DEPLOYMENTS:
+            self.stderr.write(f'启动 {label} 部署（端口 {port}）...')
+            processes.append(subprocess.Popen(
+                command + ['--bind', f'127.0.0.1:{port}'],
+                cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ))
+            if not self.wait_for_port(port):
+                for process in processes:
+                    process.terminate()
+                raise CommandError(f'{label} 部署启动失败（端口 {port}）')
+        return processes
+
+    @staticmethod
+    def wait_for_port(port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with socket.socket() as sock:
+                if sock.connect_ex(('127.0.0.1', port)) == 0:
+                    return True
+            time.sleep(0.2)
+        return False
+
+    async def run_load(self, label, base_url, path, cookie, options):
+        parts = urlsplit(base_url)
+        host, port = parts.hostname, parts.port or 80
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def one_request():
+            async with semaphore:
+                try:
+                    return await self.fetch(host, port, path, cookie, options['read_delay'], options['timeout'])
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                    return {'error': type(e).__name__}
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(one_request() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        succeeded = [outcome for outcome in outcomes if outcome.get('status') == 200]
+        errors = {}
+        for outcome in outcomes:
+            if outcome.get('status') != 200:
+                key = outcome.get('error') or f"HTTP {outcome.get('status')}"
+                errors[key] = errors.get(key, 0) + 1
+
+        return {
+            'deployment': label,
+            'url': base_url + path,
+            'succeeded': len(succeeded),
+            'errors': errors,
+            'elapsed_s': round(elapsed, 2),
+            'requests_per_s': round(len(succeeded) / elapsed, 1) if elapsed else None,
+            'bytes': succeeded[0]['bytes'] if succeeded else 0,
+            'first_byte_ms': self.distribution([outcome['first_byte'] for outcome in succeeded]),
+            'latency_ms': self.distribution([outcome['latency'] for outcome in succeeded]),
+        }
+
+    @staticmethod
+    async def fetch(host, port, path, cookie, read_delay, timeout):
+        """一次HTTP/1.1请求，按慢速客户端方式分块读取完整响应"""
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        try:
+            writer.write((
+                f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nCookie: {cookie}\r\n'
+                f'Accept-Encoding: identity\r\nConnection: close\r\n\r\n'
+            ).encode())
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            status = int(status_line.split()[1])
+            first_byte = time.perf_counter() - started
+            received = len(status_line)
+            while True:
+                chunk = await asyncio.wait_for(reader.read(READ_CHUNK_SIZE), timeout)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+        finally:
+            writer.close()
+        return {
+            'status': status,
+            'first_byte': first_byte * 1000,
+            'latency': (time.perf_counter() - started) * 1000,
+            'bytes': received,
+        }
+
+    @staticmethod
+    def distribution(values):
+        if not values:
+            return None
+        values = sorted(values)
+
+        def percentile(p):
+            return round(values[min(len(values) - 1, int(round(p * (len(values) - 1))))], 2)
+
+        return {
+            'min': round(values[0], 2),
+            'median': round(statistics.median(values), 2),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'max': round(values[-1], 2),
+        }
@@ -0,0 +1,207 @@
+"""
+SQL fingerprinting and N+1 query detection
+"""
+import logging
+import os
+import re
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 5
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class NPlusOneError(AssertionError):
+    """Raised when repeated same-shape queries exceed the threshold"""
+
+
+def fingerprint_sql(sql):
+    """Reduce a SQL statement to its shape (literals and IN lists collapsed)"""
+    sql = _WHITESPACE_RE.sub(' ', sql).strip()
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return sql
+
+
+def find_call_site():
+    """Return "path:line in func" of the innermost project frame"""
+    base_dir = os.path.abspath(str(settings.BASE_DIR))
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = os.path.abspath(frame.filename)
+        if filename == _THIS_FILE or not filename.startswith(base_dir):
+            continue
+        if 'site-packages' in filename or f'{os.sep}venv{os.sep}' in filename:
+            continue
+        return f"{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}"
+    return 'unknown'
+
+
+class NPlusOneIssue:
+    """A query shape that was executed too many times"""
+
+    def __init__(self, fingerprint, count, call_sites):
+        self.fingerprint = fingerprint
+        self.count = count
+        self.call_sites = call_sites
+
+    @property
+    def call_site(self):
+        """Most frequent call site for this query shape"""
+        return self.call_sites.most_common(1)[0][0] if self.call_sites else 'unknown'
+
+    def __str__(self):
+        return f"{self.count}x at {self.call_site}: {self.fingerprint[:300]}"
+
+
+class QueryFingerprinter:
+    """
+    Database execute wrapper that groups queries by fingerprint.
+
+    The call site is only resolved (``traceback.extract_stack``) once a shape
+    has reached the threshold, so ordinary queries cost a fingerprint only.
+    """
+
+    def __init__(self, threshold=None, using=None):
+        if threshold is None:
+            threshold = getattr(settings, 'NPLUSONE_THRESHOLD', DEFAULT_THRESHOLD)
+        self.threshold = threshold
+        self.using = using or list(connections)
+        self.counts = Counter()
+        self.call_sites = defaultdict(Counter)
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        fingerprint = fingerprint_sql(sql)
+        self.counts[fingerprint] += 1
+        if self.counts[fingerprint] >= self.threshold:
+            self.call_sites[fingerprint][find_call_site()] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.using:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._stack.close()
+        self._stack = None
+
+    @property
+    def total_queries(self):
+        return sum(self.counts.values())
+
+    def issues(self):
+        """Query shapes executed at least ``threshold`` times"""
+        return [
+            NPlusOneIssue(fingerprint, count, self.call_sites[fingerprint])
+            for fingerprint, count in self.counts.most_common()
+            if count >= self.threshold
+        ]
+
+    def format_report(self, label=''):
+        lines = [f"N+1 queries detected{f' in {label}' if label else ''}:"]
+        lines.extend(f"  - {issue}" for issue in self.issues())
+        return '\n'.join(lines)
+
+
+def report_n_plus_one(fingerprinter, label='', mode='raise'):
+    """Raise or log the fingerprinter's issues"""
+    if fingerprinter.issues():
+        report = fingerprinter.format_report(label)
+        if mode == 'raise':
+            raise NPlusOneError(report)
+        logger.warning(report)
+
+
+@contextmanager
+def detect_n_plus_one(label='', threshold=None, mode='raise'):
+    """Run a block under the fingerprinter and raise or log on repeated queries"""
+    with QueryFingerprinter(threshold=threshold) as fingerprinter:
+        yield fingerprinter
+    report_n_plus_one(fingerprinter, label, mode)
+
+
+class NPlusOneMiddleware:
+    """
+    Per-request N+1 detection.
+
+    Controlled by ``settings.NPLUSONE_MODE``: ``'log'`` (staging) writes a
+    warning per offending request, ``'raise'`` (tests) fails the request,
+    anything else disables the detector.
+
+    Both sync and async capable, so an ASGI middleware chain is not adapted
+    (no thread hop per request) because of this middleware.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        mode = getattr(settings, 'NPLUSONE_MODE', '')
+        if mode not in ('log', 'raise'):
+            return self.get_response(request)
+
+        with detect_n_plus_one(f"{request.method} {request.path}", mode=mode):
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        mode = getattr(settings, 'NPLUSONE_MODE', '')
+        if mode not in ('log', 'raise'):
+            return await self.get_response(request)
+
+        # Connections are per thread: install the wrapper on the thread-sensitive
+        # sync thread where the request's ORM calls (sync_to_async) run.
+        fingerprinter = QueryFingerprinter()
+        await sync_to_async(fingerprinter.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(fingerprinter.__exit__)(None, None, None)
+        report_n_plus_one(fingerprinter, f"{request.method} {request.path}", mode)
+        return response
+
+
+class NPlusOneTestMixin:
+    """TestCase mixin providing ``assertNoNPlusOne``"""
+
+    nplusone_threshold = None
+
+    @contextmanager
+    def assertNoNPlusOne(self, label='', threshold=None):
+        if threshold is None:
+            threshold = self.nplusone_threshold
+        with detect_n_plus_one(label or self.id(), threshold) as fingerprinter:
+            yield fingerprinter
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """Test runner that turns the N+1 middleware into a hard failure"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.NPLUSONE_MODE = 'raise'
@@ -0,0 +1,202 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls that resolve to the same key share one computation:
+
+* within a process, followers wait on the leader's flight (threads) or
+  future (coroutines on the same event loop) and receive a copy of its result;
+* across processes, leaders race for a lock in the shared cache
+  (``cache.add``); the winner computes and publishes the pickled result under
+  the key for ``result_ttl`` seconds, the others poll for it.
+
+Keys must cover everything the result depends on, typically including the
+project ``data_version``, because a published result is reused for up to
+``result_ttl`` seconds. A ``None`` key bypasses coalescing. Results must be
+picklable; views must return non-streaming responses. Followers receive an
+unpickled copy, so callers may mutate what they get back (middleware adds
+cookies and headers to each response independently).
+
+If the lock holder dies, followers stop waiting after ``lock_timeout`` and
+compute the result themselves.
+"""
+import asyncio
+import logging
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30
+RESULT_TTL = 5
+POLL_INTERVAL = 0.05
+
+_flights = {}
+_flights_lock = threading.Lock()
+_async_flights = {}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+        self.error = None
+
+
+def request_key(request, *parts):
+    """
+    Key for a view response shared between identical requests of one user.
+
+    Returns None (no coalescing) for non-GET requests and when flash messages
+    are pending, since rendering would consume them for every follower.
+    """
+    if request.method != 'GET' or len(get_messages(request)):
+        return None
+    query = request.META.get('QUERY_STRING', '')
+    return ':'.join(str(part) for part in (
+        'view', request.user.pk or 0, request.path, '{:08x}'.format(zlib.crc32(query.encode())), *parts
+    ))
+
+
+def _cache_keys(key):
+    return f'singleflight:{key}:lock', f'singleflight:{key}:result'
+
+
+def _compute_shared(key, compute, lock_timeout, result_ttl):
+    """Cross-process part: returns (result, payload)."""
+    lock_key, result_key = _cache_keys(key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        payload = cache.get(result_key)
+        if payload is not None:
+            return pickle.loads(payload), payload
+        if cache.add(lock_key, token, lock_timeout):
+            try:
+                result = compute()
+                payload = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+                cache.set(result_key, payload, result_ttl)
+                return result, payload
+            finally:
+                if cache.get(lock_key) == token:
+                    cache.delete(lock_key)
+        if time.monotonic() >= deadline:
+            logger.warning('single-flight wait for %s timed out; computing locally', key)
+            result = compute()
+            return result, pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        time.sleep(POLL_INTERVAL)
+
+
+async def _acompute_shared(key, compute, lock_timeout, result_ttl):
+    """Async counterpart of _compute_shared; ``compute`` is a coroutine function."""
+    lock_key, result_key = _cache_keys(key)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+    while True:
+        payload = await cache.aget(result_key)
+        if payload is not None:
+            return pickle.loads(payload), payload
+        if await cache.aadd(lock_key, token, lock_timeout):
+            try:
+                result = await compute()
+                payload = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+                await cache.aset(result_key, payload, result_ttl)
+                return result, payload
+            finally:
+                if await cache.aget(lock_key) == token:
+                    await cache.adelete(lock_key)
+        if time.monotonic() >= deadline:
+            logger.warning('single-flight wait for %s timed out; computing locally', key)
+            result = await compute()
+            return result, pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def _run(key, compute, lock_timeout, result_ttl):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(lock_timeout):
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return pickle.loads(flight.payload)
+
+    try:
+        result, flight.payload = _compute_shared(key, compute, lock_timeout, result_ttl)
+        return result
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+async def _arun(key, compute, lock_timeout, result_ttl):
+    # Futures belong to one event loop; under WSGI every request runs its own
+    # loop, so those requests coalesce through the cache lock only.
+    flight_key = (id(asyncio.get_running_loop()), key)
+    future = _async_flights.get(flight_key)
+    if future is not None:
+        try:
+            payload = await asyncio.wait_for(asyncio.shield(future), lock_timeout)
+        except asyncio.TimeoutError:
+            return await compute()
+        return pickle.loads(payload)
+
+    future = _async_flights[flight_key] = asyncio.get_running_loop().create_future()
+    try:
+        result, payload = await _acompute_shared(key, compute, lock_timeout, result_ttl)
+        future.set_result(payload)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        # Retrieve the exception so an unawaited future does not log a warning.
+        future.exception()
+        raise
+    finally:
+        _async_flights.pop(flight_key, None)
+
+
+def single_flight(key_func, lock_timeout=LOCK_TIMEOUT, result_ttl=RESULT_TTL):
+    """
+    Coalesce concurrent calls of a function or view that share a key.
+
+    ``key_func`` receives the decorated callable's arguments and returns the
+    key, or None to call through. For async callables it is run in the ORM
+    thread, so it may query the database.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_inner(*args, **kwargs):
+                key = await sync_to_async(key_func)(*args, **kwargs)
+                if key is None:
+                    return await func(*args, **kwargs)
+                return await _arun(key, lambda: func(*args, **kwargs), lock_timeout, result_ttl)
+
+            return async_inner
+
+        @wraps(func)
+        def inner(*args, **kwargs):
+            key = key_func(*args, **kwargs)
+            if key is None:
+                return func(*args, **kwargs)
+            return _run(key, lambda: func(*args, **kwargs), lock_timeout, result_ttl)
+
+        return inner
+
+    return decorator
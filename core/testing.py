@@ -0,0 +1,31 @@
+"""
+测试公共夹具：各应用测试共用的用户、项目与工地
+"""
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+
+from projects.models import Project, WorkSite
+
+
+def create_owned_project(username='owner', start=None, days=60):
+    """创建用户及其项目“项目”（start 起 days 天，start 默认为今天），返回 (用户, 项目)"""
+    owner = get_user_model().objects.create_user(username, password='pass')
+    start = start or date.today()
+    project = Project.objects.create(
+        owner=owner, name='项目', start_date=start, end_date=start + timedelta(days=days)
+    )
+    return owner, project
+
+
+def create_project_fixture(username='owner', start=None, days=60, worksite_days=30, **worksite_fields):
+    """
+    在 create_owned_project() 的基础上再创建工地“工地”（与项目同日开始，持续 worksite_days 天），
+    worksite_fields 为工地的其他字段。返回 (用户, 项目, 工地)
+    """
+    owner, project = create_owned_project(username, start, days)
+    worksite = WorkSite.objects.create(
+        project=project, name='工地', start_date=project.start_date,
+        end_date=project.start_date + timedelta(days=worksite_days), **worksite_fields
+    )
+    return owner, project, worksite
@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from projects.models import Project, WorkSite
+from tasks.models import Task, TaskDependency
+from .backup import backed_up_models, create_snapshot, prune_snapshots, restore_snapshot
+from .testing import create_project_fixture
+
+
+class BenchmarkCommandTest(TestCase):
+    """合成数据生成与基准测试命令的冒烟测试"""
+
+    def test_generate_dataset_and_run_benchmarks(self):
+        call_command(
+            'generate_dataset', projects=1, worksites=2, tasks=12, depth=2, dependencies=1,
+            drawings=1, annotations=0.5, seed=1, stdout=StringIO(),
+        )
+        project = Project.objects.get(owner__username='benchmark')
+        self.assertEqual(project.worksites.count(), 2)
+        self.assertEqual(Task.objects.filter(worksite__project=project).count(), 24)
+        self.assertTrue(TaskDependency.objects.exists())
+        for worksite in WorkSite.objects.filter(project=project):
+            self.assertEqual(worksite.task_count, worksite.tasks.count())
+
+        stdout = StringIO()
+        call_command(
+            'run_benchmarks', iterations=1, warmup=0, only=['project_detail', 'gantt_data_api'],
+            stdout=stdout, stderr=StringIO(),
+        )
+        report = json.loads(stdout.getvalue())
+        self.assertEqual(report['dataset']['tasks'], 24)
+        self.assertEqual([result['name'] for result in report['results']], ['project_detail', 'gantt_data_api'])
+        for result in report['results']:
+            self.assertEqual(result['status'], 200)
+            self.assertGreater(result['queries'], 0)
+
+    def test_run_benchmarks_rejects_zero_iterations(self):
+        with self.assertRaisesMessage(CommandError, '--iterations'):
+            call_command('run_benchmarks', iterations=0, stdout=StringIO(), stderr=StringIO())
+
+
+class IncrementalBackupTest(TestCase):
+    """增量备份：未变化的文件不重复读取/写入，任意快照可恢复"""
+
+    def setUp(self):
+        self.media = Path(tempfile.mkdtemp())
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        (self.media / 'drawings').mkdir()
+        (self.media / 'drawings' / 'a.pdf').write_bytes(b'%PDF a')
+        (self.media / 'drawings' / 'b.png').write_bytes(b'png b')
+
+        _, self.project, _ = create_project_fixture()
+
+    def test_incremental_snapshots_and_restore(self):
+        first = create_snapshot(self.root, self.media)
+        self.assertEqual(first['stats']['media']['blobs_written'], 2)
+
+        second = create_snapshot(self.root, self.media)
+        self.assertEqual(second['stats']['media']['files_read'], 0)
+        self.assertEqual(second['stats']['media']['blobs_written'], 0)
+        self.assertEqual(second['stats']['database']['blobs_written'], 0)
+
+        changed = self.media / 'drawings' / 'a.pdf'
+        changed.write_bytes(b'%PDF a, rev 2')
+        os.utime(changed, ns=(0, 0))
+        shutil.copy(self.media / 'drawings' / 'b.png', self.media / 'copy.png')
+        third = create_snapshot(self.root, self.media)
+        self.assertEqual(third['stats']['media']['files_read'], 2)
+        # 复制的文件内容相同，只写入修改后的文件
+        self.assertEqual(third['stats']['media']['blobs_written'], 1)
+
+        target = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, target, ignore_errors=True)
+        restore_snapshot(self.root, first['id'], media_root=target, include_database=False)
+        self.assertEqual((target / 'drawings' / 'a.pdf').read_bytes(), b'%PDF a')
+        self.assertFalse((target / 'copy.png').exists())
+
+        for model in reversed(backed_up_models()):
+            model._base_manager.all()._raw_delete('default')
+        stats = restore_snapshot(self.root, first['id'], include_media=False)
+        self.assertEqual(stats['database']['rows'], sum(entry['rows'] for entry in first['database']))
+        restored = Project.all_objects.get(pk=self.project.pk)
+        self.assertEqual(restored.owner.username, 'owner')
+        self.assertEqual(restored.worksites.get().name, '工地')
+
+        pruned = prune_snapshots(self.root, keep=1)
+        self.assertEqual(pruned['snapshots'], 2)
+        self.assertEqual(pruned['blobs'], 1)
@@ -10,7 +10,6 @@ from django.core.exceptions import PermissionDenied
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
-from django.core.cache import cache
 import time
 import logging
 
@@ -315,38 +314,21 @@ class DashboardView(BaseListView, CacheMixin):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Get cached dashboard data or calculate it
-        cache_key = f"dashboard_{self.request.user.id}"
-        dashboard_data = cache.get(cache_key)
-
-        if dashboard_data is None:
-            dashboard_data = self.calculate_dashboard_data()
-            cache.set(cache_key, dashboard_data, 300)  # Cache for 5 minutes
-
-        context.update(dashboard_data)
+        # Statistics are summed from the per-project counter-cache columns
+        context.update(self.calculate_dashboard_data())
         return context
 
     def calculate_dashboard_data(self):
         """Calculate dashboard statistics"""
-        from projects.models import Project
+        from projects.services import get_user_stats
         from tasks.models import Task
-        from drawings.models import Drawing
 
         user_projects = self.get_user_projects()
 
         return {
-            'total_projects': user_projects.count(),
-            'active_projects': user_projects.filter(status='active').count(),
-            'total_tasks': Task.objects.filter(worksite__project__owner=self.request.user).count(),
-            'completed_tasks': Task.objects.filter(
-                worksite__project__owner=self.request.user,
-                status='completed'
-            ).count(),
-            'total_drawings': Drawing.objects.filter(
-                worksite__project__owner=self.request.user
-            ).count(),
+            **get_user_stats(self.request.user),
             'recent_projects': user_projects.order_by('-created_at')[:5],
-            'recent_tasks': Task.objects.filter(
+            'recent_tasks': Task.objects.live().filter(
                 worksite__project__owner=self.request.user
             ).order_by('-created_at')[:10]
         }
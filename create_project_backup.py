@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 """
-创建项目备份ZIP文件
+创建项目备份ZIP文件（源代码与配置）
+
+数据库与媒体文件（图纸）不再打包进ZIP：每次重新压缩全部图纸耗时过长。
+请使用增量备份命令 python manage.py backup（按内容哈希去重，只复制新增或修改的文件），
+恢复使用 python manage.py restore_backup。
 """
 import os
 import zipfile
@@ -44,10 +48,6 @@ def create_project_backup():
         # 模板和静态文件
         'templates/',
         'static/',
-        'media/',
-
-        # 数据库文件（如果使用SQLite）
-        'db.sqlite3',
 
         # 测试文件
         'test_*.py',
@@ -86,6 +86,11 @@ def create_project_backup():
         '*.temp',
         'backup_*.zip',
         '*_backup_*.zip',
+
+        # 数据库与媒体文件由增量备份（manage.py backup）负责
+        'media/',
+        'backups/',
+        'db.sqlite3',
     ]
 
     def should_include_file(file_path):
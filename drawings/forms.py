@@ -1,6 +1,7 @@
 from django import forms
 from .models import Drawing
 from projects.models import Project
+from jobs.services import enqueue
 
 
 class DrawingUploadForm(forms.ModelForm):
@@ -87,9 +88,10 @@ class DrawingUploadForm(forms.ModelForm):
                     instance.delete()  # 删除无效文件
                     raise forms.ValidationError(message)
 
-                # 生成缩略图
-                instance.generate_thumbnail()
-                instance.save()  # 保存验证结果和缩略图
+                instance.save()  # 保存验证结果
+
+                # 缩略图渲染较慢，由后台任务生成
+                enqueue('drawings.generate_thumbnail', {'drawing_id': instance.pk})
         elif commit:
             instance.save()
         return instance
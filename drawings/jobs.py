@@ -0,0 +1,14 @@
+from jobs.services import register
+from .models import Drawing
+
+
+@register('drawings.generate_thumbnail')
+def generate_thumbnail(drawing_id):
+    """上传后生成图纸缩略图"""
+    drawing = Drawing.objects.filter(pk=drawing_id).first()
+    if drawing is None or not drawing.file:
+        return {'generated': False, 'message': '图纸不存在'}
+    generated, message = drawing.generate_thumbnail()
+    if generated:
+        drawing.save(update_fields=['thumbnail'])
+    return {'generated': generated, 'message': message}
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:41
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def file_sha256(field_file):
+    """文件内容的SHA-256（在迁移中内联，不依赖 drawings.models 的当前代码）"""
+    digest = hashlib.sha256()
+    with field_file.open('rb') as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def populate_hashes(apps, schema_editor):
+    Drawing = apps.get_model('drawings', 'Drawing')
+    for drawing in Drawing.objects.only('file', 'thumbnail').iterator():
+        hashes = {}
+        for field, hash_field in (('file', 'file_hash'), ('thumbnail', 'thumbnail_hash')):
+            field_file = getattr(drawing, field)
+            try:
+                hashes[hash_field] = file_sha256(field_file) if field_file else ''
+            except (OSError, ValueError):
+                hashes[hash_field] = ''
+        Drawing.objects.filter(pk=drawing.pk).update(**hashes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drawings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drawing',
+            name='file_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='文件哈希'),
+        ),
+        migrations.AddField(
+            model_name='drawing',
+            name='thumbnail_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='缩略图哈希'),
+        ),
+        migrations.RunPython(populate_hashes, migrations.RunPython.noop),
+    ]
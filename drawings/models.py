@@ -1,12 +1,15 @@
 from django.db import models
 from django.core.validators import FileExtensionValidator
 from django.core.files.base import ContentFile
+from django.urls import reverse
+import hashlib
 import os
-import PyPDF2
-from PIL import Image
 import tempfile
 import logging
 
+# PyPDF2 / Pillow / pdf2image 在首次使用时才导入：
+# 只读取图纸元数据的进程（gunicorn worker、管理命令、测试）无需承担其导入开销
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,6 +23,18 @@ def thumbnail_upload_path(instance, filename):
     return f'thumbnails/{filename}'
 
 
+def content_hash(field_file):
+    """文件内容的SHA-256（分块读取；未提交的上传文件同样适用）"""
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.seek(0)
+    return digest.hexdigest()
+
+
 class Drawing(models.Model):
     """PDF图纸模型"""
 
@@ -66,6 +81,10 @@ class Drawing(models.Model):
         verbose_name='缩略图'
     )
 
+    # 内容哈希（离线缓存按哈希失效）
+    file_hash = models.CharField(max_length=64, blank=True, verbose_name='文件哈希')
+    thumbnail_hash = models.CharField(max_length=64, blank=True, verbose_name='缩略图哈希')
+
     # 文件完整性状态
     is_valid = models.BooleanField(default=True, verbose_name='文件完整性')
 
@@ -83,6 +102,55 @@ class Drawing(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._hashed_names = (instance.__dict__.get('file'), instance.__dict__.get('thumbnail'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """文件或缩略图被替换（或尚无哈希）时重新计算内容哈希"""
+        self.update_content_hashes()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'file_hash', 'thumbnail_hash'}
+        super().save(*args, **kwargs)
+        self._hashed_names = (self.file.name, self.thumbnail.name)
+
+    def update_content_hashes(self):
+        file_name, thumbnail_name = getattr(self, '_hashed_names', (None, None))
+        if not self.file:
+            self.file_hash = ''
+        elif not self.file_hash or self.file.name != file_name:
+            self.file_hash = self._safe_hash(self.file)
+        if not self.thumbnail:
+            self.thumbnail_hash = ''
+        elif not self.thumbnail_hash or self.thumbnail.name != thumbnail_name:
+            self.thumbnail_hash = self._safe_hash(self.thumbnail)
+
+    @staticmethod
+    def _safe_hash(field_file):
+        try:
+            return content_hash(field_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"计算文件哈希失败: {field_file.name}: {str(e)}")
+            return ''
+
+    def _versioned_url(self, field_file, url_name, digest):
+        """带内容哈希参数的文件URL（经所属用户校验的文件视图）：内容变化即换URL，可长期缓存"""
+        if not field_file:
+            return ''
+        url = reverse(url_name, kwargs={'pk': self.pk})
+        return f'{url}?v={digest[:16]}' if digest else url
+
+    @property
+    def versioned_file_url(self):
+        return self._versioned_url(self.file, 'drawings:drawing_file', self.file_hash)
+
+    @property
+    def versioned_thumbnail_url(self):
+        return self._versioned_url(self.thumbnail, 'drawings:drawing_thumbnail', self.thumbnail_hash)
+
     @property
     def file_size_mb(self):
         """返回文件大小（MB）"""
@@ -110,6 +178,8 @@ class Drawing(models.Model):
     def validate_pdf(self):
         """验证PDF文件完整性和版本"""
         try:
+            import PyPDF2
+
             with open(self.file.path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
 
@@ -178,6 +248,7 @@ class Drawing(models.Model):
         try:
             # 使用pdf2image生成第一页的图片
             from pdf2image import convert_from_path
+            from PIL import Image
 
             # 转换第一页为图片
             images = convert_from_path(
@@ -236,11 +307,23 @@ class Drawing(models.Model):
             return False, f"缩略图生成失败: {str(e)}"
 
     def delete(self, *args, **kwargs):
-        """删除模型时同时删除文件"""
-        if self.file:
+        """删除模型时同时删除文件（仍被其他图纸引用的文件保留）"""
+        unreferenced = unreferenced_file_names([self.file.name, self.thumbnail.name], exclude_ids=[self.pk])
+        if self.file and self.file.name in unreferenced:
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
-        if self.thumbnail:
+        if self.thumbnail and self.thumbnail.name in unreferenced:
             if os.path.isfile(self.thumbnail.path):
                 os.remove(self.thumbnail.path)
         super().delete(*args, **kwargs)
+
+
+def unreferenced_file_names(names, exclude_ids=()):
+    """names 中不再被其他图纸引用的文件名（以模板创建的项目可能与模板共用图纸文件）"""
+    names = {name for name in names if name}
+    if not names:
+        return set()
+    others = Drawing.objects.exclude(pk__in=exclude_ids)
+    shared = set(others.filter(file__in=names).values_list('file', flat=True))
+    shared.update(others.filter(thumbnail__in=names).values_list('thumbnail', flat=True))
+    return names - shared
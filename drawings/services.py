@@ -0,0 +1,39 @@
+"""
+图纸离线缓存清单：按工地列出图纸文件、缩略图的URL与内容哈希
+"""
+from .models import Drawing
+
+
+def serialize_manifest_drawing(drawing):
+    thumbnail = None
+    if drawing.thumbnail:
+        thumbnail = {'url': drawing.versioned_thumbnail_url, 'hash': drawing.thumbnail_hash}
+    return {
+        'id': drawing.id,
+        'name': drawing.name,
+        'page_count': drawing.page_count,
+        'file': {'url': drawing.versioned_file_url, 'hash': drawing.file_hash, 'size': drawing.file_size},
+        'thumbnail': thumbnail,
+    }
+
+
+def build_drawing_manifest(worksite):
+    """
+    工地图纸清单。URL带内容哈希参数，内容变化即换URL；
+    客户端缓存清单中新增的URL、删除不再出现的URL（worksite.project 应已 select_related）
+    """
+    drawings = Drawing.objects.filter(worksite=worksite).only(
+        'id', 'name', 'page_count', 'file', 'file_size', 'file_hash', 'thumbnail', 'thumbnail_hash'
+    ).order_by('pk')
+    entries = [serialize_manifest_drawing(drawing) for drawing in drawings]
+    urls = []
+    for entry in entries:
+        urls.append(entry['file']['url'])
+        if entry['thumbnail']:
+            urls.append(entry['thumbnail']['url'])
+    return {
+        'worksite_id': worksite.pk,
+        'version': worksite.project.data_version,
+        'drawings': entries,
+        'urls': urls,
+    }
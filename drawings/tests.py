@@ -1,3 +1,121 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.importtime import SETUP_BUDGET_MS, loaded_heavy_modules, measure_startup, parse_importtime
+from core.testing import create_project_fixture
+from .models import Drawing
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DrawingManifestTest(TestCase):
+    """图纸离线缓存清单：内容哈希与按哈希变化的URL"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, _, cls.worksite = create_project_fixture()
+
+    def setUp(self):
+        self.drawing = Drawing(worksite=self.worksite, name='平面图', file_size=5)
+        self.drawing.file.save('plan.png', ContentFile(b'plan1'), save=False)
+        self.drawing.save()
+        self.url = reverse('drawings:worksite_drawing_manifest', kwargs={'worksite_id': self.worksite.pk})
+
+    def test_manifest_lists_hashed_urls(self):
+        self.client.force_login(self.owner)
+        manifest = self.client.get(self.url).json()
+
+        entry = manifest['drawings'][0]
+        self.assertEqual(len(entry['file']['hash']), 64)
+        self.assertEqual(manifest['urls'], [entry['file']['url']])
+        self.assertIn(f"?v={entry['file']['hash'][:16]}", entry['file']['url'])
+        self.assertIsNone(entry['thumbnail'])
+
+    def test_replaced_file_changes_url(self):
+        self.client.force_login(self.owner)
+        old_url = self.client.get(self.url).json()['urls'][0]
+
+        drawing = Drawing.objects.get(pk=self.drawing.pk)
+        drawing.name = '平面图（改）'
+        drawing.save()
+        self.assertEqual(self.client.get(self.url).json()['urls'][0], old_url)
+
+        drawing.file.save('plan.png', ContentFile(b'plan2'), save=False)
+        drawing.save()
+        self.assertNotEqual(self.client.get(self.url).json()['urls'][0], old_url)
+
+    def test_manifest_requires_owner(self):
+        other = get_user_model().objects.create_user('other', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_file_served_with_hash_etag(self):
+        self.client.force_login(self.owner)
+        url = Drawing.objects.get(pk=self.drawing.pk).versioned_file_url
+        response = self.client.get(url)
+        self.assertEqual(b''.join(response.streaming_content), b'plan1')
+        self.assertEqual(response['ETag'], f'"{self.drawing.file_hash}"')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_file_streamed_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.owner)
+        response = await self.async_client.get(
+            reverse('drawings:drawing_file', kwargs={'pk': self.drawing.pk})
+        )
+        self.assertEqual(response['Content-Length'], '5')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'plan1')
+
+        other = await sync_to_async(get_user_model().objects.create_user)('other', password='pass')
+        await sync_to_async(self.async_client.force_login)(other)
+        response = await self.async_client.get(
+            reverse('drawings:drawing_file', kwargs={'pk': self.drawing.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_service_worker_scope(self):
+        response = self.client.get(reverse('service_worker'))
+        self.assertEqual(response['Service-Worker-Allowed'], '/')
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+
+
+class StartupImportTest(SimpleTestCase):
+    """
+    启动阶段不加载重型依赖。冷启动耗时受机器负载影响，预算检查需设置环境变量
+    CHECK_STARTUP_BUDGET=1 才运行（如在固定配置的基准机器上）
+    """
+
+    def test_parse_importtime(self):
+        records = parse_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   PyPDF2._utils\n'
+            'import time:       300 |        420 | PyPDF2\n'
+        )
+        self.assertEqual([(r.name, r.self_us, r.cumulative_us, r.depth) for r in records],
+                         [('PyPDF2._utils', 120, 120, 1), ('PyPDF2', 300, 420, 0)])
+        self.assertEqual(loaded_heavy_modules(records), ['PyPDF2'])
+
+    def test_setup_skips_heavy_modules(self):
+        _, records = measure_startup(['construction_pm.urls'])
+        self.assertEqual(loaded_heavy_modules(records), [])
+
+    @skipUnless(os.environ.get('CHECK_STARTUP_BUDGET'), '设置 CHECK_STARTUP_BUDGET=1 时检查启动耗时预算')
+    def test_setup_stays_within_budget(self):
+        setup_ms, _ = measure_startup(['construction_pm.urls'])
+        self.assertLess(setup_ms, SETUP_BUDGET_MS)
@@ -9,6 +9,9 @@ urlpatterns = [
     path('upload/ajax/', views.drawing_upload_ajax, name='drawing_upload_ajax'),
     path('project/<int:project_id>/upload/', views.project_drawing_upload, name='project_drawing_upload'),
     path('worksite/<int:worksite_id>/upload/', views.worksite_drawing_upload, name='worksite_drawing_upload'),
+    path('worksite/<int:worksite_id>/manifest/', views.worksite_drawing_manifest, name='worksite_drawing_manifest'),
     path('<int:pk>/', views.drawing_detail, name='drawing_detail'),
+    path('<int:pk>/file/', views.drawing_file, name='drawing_file'),
+    path('<int:pk>/thumbnail/', views.drawing_thumbnail, name='drawing_thumbnail'),
     path('<int:pk>/delete/', views.drawing_delete, name='drawing_delete'),
 ]
@@ -1,12 +1,26 @@
+import mimetypes
+import os
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_GET, require_http_methods
 import json
+from core.async_views import aget_object_or_404, async_login_required, async_require_GET, stream_file
+from core.conditional import versioned_condition
 from .models import Drawing
 from .forms import DrawingUploadForm
+from .services import build_drawing_manifest
 from projects.models import Project, WorkSite
+from projects.services import get_project_version
 from tasks.models import Task
 
 
@@ -15,7 +29,8 @@ def drawing_list(request):
     # 只显示用户拥有的项目下的图纸
     if request.user.is_authenticated:
         drawings = Drawing.objects.filter(
-            worksite__project__owner=request.user
+            worksite__project__owner=request.user,
+            worksite__deleted_at__isnull=True
         ).select_related(
             'worksite',
             'worksite__project'
@@ -148,3 +163,86 @@ def drawing_delete(request, pk):
     return render(request, 'drawings/drawing_delete.html', {
         'drawing': drawing
     })
+
+
+def owned_worksite_version(request, worksite_id, **kwargs):
+    """当前用户工地所属项目的数据版本（条件请求）"""
+    return get_project_version(worksites=worksite_id, owner=request.user)
+
+
+@login_required
+@require_GET
+@versioned_condition(owned_worksite_version)
+def worksite_drawing_manifest(request, worksite_id):
+    """工地图纸离线缓存清单（Service Worker 按哈希增删缓存）"""
+    worksite = get_object_or_404(
+        WorkSite.objects.select_related('project'), pk=worksite_id, project__owner=request.user
+    )
+    return JsonResponse(build_drawing_manifest(worksite))
+
+
+# 带内容哈希参数（?v=）的文件URL内容不变，可长期缓存
+VERSIONED_FILE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+async def serve_drawing_file(request, pk, field, hash_field):
+    """
+    以流式响应返回图纸文件或缩略图（校验所属用户；ETag为内容哈希）。
+    ASGI下异步分块读取，慢速客户端只占用协程而不占用工作线程；WSGI下使用FileResponse。
+    """
+    drawing = await aget_object_or_404(
+        Drawing.objects.only('id', 'name', field, hash_field),
+        pk=pk, worksite__project__owner_id=request.user.pk, worksite__deleted_at__isnull=True
+    )
+    field_file = getattr(drawing, field)
+    if not field_file:
+        raise Http404('文件不存在')
+    digest = getattr(drawing, hash_field)
+    etag = f'"{digest}"' if digest else None
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            size = await sync_to_async(field_file.storage.size, thread_sensitive=False)(field_file.name)
+        except OSError:
+            raise Http404('文件不存在')
+        content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+        if isinstance(request, ASGIRequest):
+            response = StreamingHttpResponse(stream_file(field_file), content_type=content_type)
+        else:
+            response = FileResponse(field_file.open('rb'), content_type=content_type)
+        response['Content-Length'] = str(size)
+        response['Content-Disposition'] = content_disposition_header(False, os.path.basename(field_file.name))
+    if etag:
+        response['ETag'] = etag
+
+    if digest and request.GET.get('v') == digest[:16]:
+        patch_cache_control(response, private=True, max_age=VERSIONED_FILE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@async_login_required
+@async_require_GET
+async def drawing_file(request, pk):
+    """图纸文件（异步流式）"""
+    return await serve_drawing_file(request, pk, 'file', 'file_hash')
+
+
+@async_login_required
+@async_require_GET
+async def drawing_thumbnail(request, pk):
+    """图纸缩略图（异步流式）"""
+    return await serve_drawing_file(request, pk, 'thumbnail', 'thumbnail_hash')
+
+
+@require_GET
+@cache_control(no_cache=True)
+def service_worker(request):
+    """Service Worker 脚本（从站点根路径提供，作用域覆盖全站页面）"""
+    response = render(request, 'drawings/service_worker.js', {
+        'drawings_url': reverse('drawings:drawing_list'),
+    }, content_type='application/javascript')
+    response['Service-Worker-Allowed'] = '/'
+    return response
@@ -0,0 +1,201 @@
+"""
+甘特图导出文件的生成（供同步导出视图与后台任务共用）
+"""
+from datetime import date
+
+from tasks.models import Task
+
+
+def gantt_pdf_filename(project):
+    return f"{project.name}_施工进度表_{date.today().strftime('%Y%m%d')}.pdf"
+
+
+def build_gantt_pdf(project):
+    """生成项目施工进度表PDF，返回文件内容（未安装reportlab时抛出ImportError）"""
+    # 修复hashlib兼容性问题
+    import hashlib
+    import sys
+
+    # 保存原始函数
+    original_md5 = hashlib.md5
+    original_sha1 = hashlib.sha1
+    original_sha256 = hashlib.sha256
+
+    # 创建兼容的包装函数
+    def patched_md5(*args, **kwargs):
+        kwargs.pop('usedforsecurity', None)
+        return original_md5(*args, **kwargs)
+
+    def patched_sha1(*args, **kwargs):
+        kwargs.pop('usedforsecurity', None)
+        return original_sha1(*args, **kwargs)
+
+    def patched_sha256(*args, **kwargs):
+        kwargs.pop('usedforsecurity', None)
+        return original_sha256(*args, **kwargs)
+
+    # 应用补丁
+    hashlib.md5 = patched_md5
+    hashlib.sha1 = patched_sha1
+    hashlib.sha256 = patched_sha256
+
+    # 导入PDF生成库
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from io import BytesIO
+
+    # 创建PDF缓冲区
+    buffer = BytesIO()
+
+    # 创建PDF文档（横向）
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=landscape(A4),
+        rightMargin=0.5*inch,
+        leftMargin=0.5*inch,
+        topMargin=0.5*inch,
+        bottomMargin=0.5*inch
+    )
+
+    # 获取样式
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    # 构建PDF内容
+    story = []
+
+    # 标题
+    title = f"{project.name} - 施工进度表"
+    story.append(Paragraph(title, title_style))
+    story.append(Spacer(1, 20))
+
+    # 项目信息表
+    project_info = [
+        ['项目名称', project.name],
+        ['项目状态', project.get_status_display()],
+        ['开始日期', project.start_date.strftime('%Y年%m月%d日')],
+        ['结束日期', project.end_date.strftime('%Y年%m月%d日')],
+        ['报告日期', date.today().strftime('%Y年%m月%d日')],
+    ]
+
+    project_table = Table(project_info, colWidths=[2*inch, 4*inch])
+    project_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (1, 0), (1, -1), colors.white),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    story.append(project_table)
+    story.append(Spacer(1, 30))
+
+    # 任务进度表
+    # 表头
+    headers = ['工作地点', '任务名称', '任务类型', '负责人', '开始日期', '结束日期', '状态', '进度']
+
+    # 获取任务数据
+    tasks_data = [headers]
+
+    for worksite in project.worksites.all().order_by('name'):
+        worksite_tasks = Task.objects.filter(worksite=worksite).order_by('parent_task', 'created_at')
+
+        for task in worksite_tasks:
+            task_name = task.name
+            if task.parent_task:
+                task_name = f"  └ {task_name}"  # 子任务缩进
+
+            progress_text = f"{task.get_progress_percentage()}%"
+            if task.get_subtasks_count() > 0:
+                progress_text += f" ({task.get_completed_subtasks_count()}/{task.get_subtasks_count()})"
+
+            row = [
+                worksite.name,
+                task_name,
+                task.get_task_type_display(),
+                task.responsible_person,
+                task.start_date.strftime('%m/%d'),
+                task.end_date.strftime('%m/%d'),
+                task.get_status_display(),
+                progress_text
+            ]
+            tasks_data.append(row)
+
+    # 创建任务表格
+    tasks_table = Table(tasks_data, colWidths=[
+        1.2*inch,  # 工作地点
+        2.0*inch,  # 任务名称
+        0.8*inch,  # 任务类型
+        0.8*inch,  # 负责人
+        0.6*inch,  # 开始日期
+        0.6*inch,  # 结束日期
+        0.6*inch,  # 状态
+        0.8*inch,  # 进度
+    ])
+
+    # 设置表格样式
+    table_style = [
+        # 表头样式
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+
+        # 数据行样式
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+
+    # 为不同状态的任务设置不同颜色
+    for i, row in enumerate(tasks_data[1:], 1):  # 跳过表头
+        status = row[6]  # 状态列
+        if '已完成' in status:
+            table_style.append(('BACKGROUND', (0, i), (-1, i), colors.lightgreen))
+        elif '进行中' in status:
+            table_style.append(('BACKGROUND', (0, i), (-1, i), colors.lightyellow))
+        elif '待处理' in status:
+            table_style.append(('BACKGROUND', (0, i), (-1, i), colors.lightblue))
+
+    tasks_table.setStyle(TableStyle(table_style))
+    story.append(tasks_table)
+
+    # 页脚信息
+    story.append(Spacer(1, 30))
+    footer_info = [
+        "任务状态说明：",
+        "• 开放：任务已创建，等待开始",
+        "• 进行中：任务正在执行中",
+        "• 待处理：任务等待前置条件完成",
+        "• 已完成：任务已完成",
+        "",
+        f"报告生成时间：{date.today().strftime('%Y年%m月%d日')}",
+        f"数据来源：{project.name} 项目管理系统"
+    ]
+
+    for info in footer_info:
+        story.append(Paragraph(info, styles['Normal']))
+
+    # 生成PDF
+    doc.build(story)
+
+    return buffer.getvalue()
@@ -0,0 +1,22 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from jobs.services import PermanentJobError, register
+from projects.models import Project
+from .exports import build_gantt_pdf, gantt_pdf_filename
+
+
+@register('gantt.export_pdf')
+def export_pdf(project_id):
+    """生成施工进度表PDF并保存到存储，结果中的 file 供任务下载接口使用"""
+    project = Project.objects.filter(pk=project_id).first()
+    if project is None:
+        raise PermanentJobError(f'项目 {project_id} 不存在')
+    try:
+        content = build_gantt_pdf(project)
+    except ImportError as e:
+        raise PermanentJobError(f'请安装reportlab库以支持PDF导出功能: {e}')
+
+    filename = gantt_pdf_filename(project)
+    name = default_storage.save(f'exports/gantt/{project.pk}/{filename}', ContentFile(content))
+    return {'file': name, 'filename': filename, 'size': len(content)}
@@ -0,0 +1,159 @@
+"""
+甘特图数据序列化：全量数据与按变更日志游标的增量数据
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max, Q
+
+from core.singleflight import single_flight
+from projects.changelog import changes_since, current_cursor, split_changes
+from projects.models import ChangeLog
+from tasks.models import Task, TaskDependency
+
+
+def task_queryset(project):
+    """甘特图任务查询（子任务数用聚合注解，避免逐行查询）"""
+    return Task.objects.filter(worksite__project=project).live().select_related('worksite').annotate(
+        subtask_total=Count('subtasks'),
+        completed_subtask_total=Count('subtasks', filter=Q(subtasks__status='completed')),
+    )
+
+
+def dependency_queryset(project):
+    """项目内的任务依赖"""
+    return TaskDependency.objects.filter(
+        predecessor__worksite__project=project,
+        successor__worksite__project=project,
+        predecessor__worksite__deleted_at__isnull=True,
+        successor__worksite__deleted_at__isnull=True,
+    )
+
+
+def task_progress(task):
+    """与 Task.get_progress_percentage 一致的进度（使用 task_queryset 的注解）"""
+    if not task.subtask_total:
+        if task.status == 'completed':
+            return 100
+        elif task.status == 'in_progress':
+            return 50
+        return 0
+    return round((task.completed_subtask_total / task.subtask_total) * 100)
+
+
+def serialize_project(project):
+    return {
+        'id': project.id,
+        'name': project.name,
+        'start_date': project.start_date.isoformat(),
+        'end_date': project.end_date.isoformat(),
+        'status': project.status,
+    }
+
+
+def serialize_worksite(worksite):
+    return {
+        'id': worksite.id,
+        'name': worksite.name,
+        'start_date': worksite.start_date.isoformat(),
+        'end_date': worksite.end_date.isoformat(),
+        'status': worksite.status,
+    }
+
+
+def serialize_task(task):
+    return {
+        'id': task.id,
+        'name': task.name,
+        'worksite_id': task.worksite_id,
+        'worksite_name': task.worksite.name,
+        'parent_task_id': task.parent_task_id,
+        'start_date': task.start_date.isoformat(),
+        'end_date': task.end_date.isoformat(),
+        'deadline': task.deadline.isoformat(),
+        'status': task.status,
+        'task_type': task.task_type,
+        'responsible_person': task.responsible_person,
+        'progress': task_progress(task),
+        'duration_days': task.duration_days,
+        'subtasks_count': task.subtask_total,
+        'completed_subtasks': task.completed_subtask_total,
+    }
+
+
+def serialize_dependency(dependency):
+    return {
+        'id': dependency.id,
+        'predecessor_id': dependency.predecessor_id,
+        'successor_id': dependency.successor_id,
+        'dependency_type': dependency.dependency_type,
+        'lag_days': dependency.lag_days,
+    }
+
+
+def gantt_data_key(project):
+    """全量甘特图数据只取决于项目及其数据版本，与请求用户无关"""
+    return f'gantt:data:{project.pk}:v{project.data_version}'
+
+
+@single_flight(gantt_data_key)
+def build_gantt_data(project):
+    """全量甘特图数据；游标在读取数据之前获取，之后的变更会出现在下一次增量中"""
+    cursor = current_cursor()
+    return {
+        'project': serialize_project(project),
+        'cursor': cursor,
+        'full': True,
+        'worksites': [serialize_worksite(worksite) for worksite in project.worksites.all()],
+        'tasks': [serialize_task(task) for task in task_queryset(project)],
+        'dependencies': [serialize_dependency(dep) for dep in dependency_queryset(project)],
+    }
+
+
+@single_flight(gantt_data_key)
+async def abuild_gantt_data(project):
+    """build_gantt_data 的异步版本（异步ORM逐行读取，不占用事件循环）"""
+    cursor = (await ChangeLog.objects.aaggregate(latest=Max('id')))['latest'] or 0
+    return {
+        'project': serialize_project(project),
+        'cursor': cursor,
+        'full': True,
+        'worksites': [serialize_worksite(worksite) async for worksite in project.worksites.all()],
+        'tasks': [serialize_task(task) async for task in task_queryset(project)],
+        'dependencies': [serialize_dependency(dep) async for dep in dependency_queryset(project)],
+    }
+
+
+def changed_tasks(project, since, limit=None):
+    """游标之后变更的任务及被删除的任务ID：(新游标, 是否还有更多, 任务列表, 删除ID列表)"""
+    cursor, has_more, changes = changes_since(since, project_id=project.pk, models=['task'], limit=limit)
+    tasks, deleted = split_changes(changes, 'task', task_queryset(project), serialize_task)
+    return cursor, has_more, tasks, deleted
+
+
+def build_gantt_delta(project, since):
+    """游标之后的增量甘特图数据：变更（新增/更新）的工地、任务、依赖，以及删除墓碑"""
+    cursor, _, changes = changes_since(
+        since, project_id=project.pk, models=['worksite', 'task', 'dependency']
+    )
+    worksites, deleted_worksites = split_changes(changes, 'worksite', project.worksites.all(), serialize_worksite)
+    tasks, deleted_tasks = split_changes(changes, 'task', task_queryset(project), serialize_task)
+    dependencies, deleted_dependencies = split_changes(
+        changes, 'dependency', dependency_queryset(project), serialize_dependency
+    )
+    return {
+        'project': serialize_project(project),
+        'cursor': cursor,
+        'full': False,
+        'worksites': worksites,
+        'tasks': tasks,
+        'dependencies': dependencies,
+        'deleted': {
+            'worksites': deleted_worksites,
+            'tasks': deleted_tasks,
+            'dependencies': deleted_dependencies,
+        },
+    }
+
+
+async def abuild_gantt_delta(project, since):
+    """build_gantt_delta 的异步版本（游标校验与日志合并为多步查询，整体在ORM线程中执行）"""
+    return await sync_to_async(build_gantt_delta)(project, since)
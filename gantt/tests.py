@@ -1,3 +1,162 @@
-from django.test import TestCase
+import asyncio
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.singleflight import single_flight
+from core.testing import create_project_fixture
+from projects.changelog import CHANGELOG_SETTLE_SECONDS
+from projects.models import ChangeLog
+from tasks.models import Task
+
+
+class ConditionalGetTest(TestCase):
+    """甘特图数据API条件请求测试"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, worksite = create_project_fixture()
+        today = date.today()
+        cls.task = Task.objects.create(
+            worksite=worksite, name='任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        self.url = reverse('gantt:gantt_data_api', kwargs={'project_id': self.project.pk})
+
+    def test_unchanged_project_answers_304_without_task_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if 'tasks_task' in query['sql']])
+
+    def test_task_change_invalidates_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.task.status = 'completed'
+        self.task.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class DeltaSyncTest(TestCase):
+    """甘特图增量同步测试"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, cls.worksite = create_project_fixture()
+        today = date.today()
+        cls.parent = Task.objects.create(
+            worksite=cls.worksite, name='主任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+        cls.subtask = Task.objects.create(
+            worksite=cls.worksite, parent_task=cls.parent, name='子任务', responsible_person='李四',
+            start_date=today, end_date=today + timedelta(days=5)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        self.url = reverse('gantt:gantt_data_api', kwargs={'project_id': self.project.pk})
+
+    def test_delta_returns_changes_and_tombstones(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        self.subtask.status = 'completed'
+        self.subtask.save()
+        other = Task.objects.create(
+            worksite=self.worksite, name='临时任务', responsible_person='王五',
+            start_date=self.project.start_date, end_date=self.project.start_date
+        )
+        other_id = other.pk
+        other.delete()
+
+        delta = self.client.get(self.url, {'since': cursor}).json()
+        self.assertFalse(delta['full'])
+        changed = {task['id']: task for task in delta['tasks']}
+        self.assertEqual(set(changed), {self.parent.pk, self.subtask.pk})
+        self.assertEqual(changed[self.parent.pk]['completed_subtasks'], 1)
+        self.assertEqual(delta['deleted']['tasks'], [other_id])
+
+        # 尚未确定提交的日志下次拉取时再次返回，确定提交后游标越过它们
+        again = self.client.get(self.url, {'since': delta['cursor']}).json()
+        self.assertEqual({task['id'] for task in again['tasks']}, set(changed))
+        self.assertEqual(again['deleted']['tasks'], [other_id])
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(seconds=CHANGELOG_SETTLE_SECONDS + 1))
+        settled = self.client.get(self.url, {'since': again['cursor']}).json()
+        again = self.client.get(self.url, {'since': settled['cursor']}).json()
+        self.assertEqual((again['tasks'], again['deleted']['tasks']), ([], []))
+
+    def test_worksite_delete_cascades_tombstones(self):
+        cursor = self.client.get(self.url).json()['cursor']
+        worksite_id = self.worksite.pk
+        self.worksite.delete()
+        delta = self.client.get(self.url, {'since': cursor}).json()
+        self.assertEqual(delta['deleted']['worksites'], [worksite_id])
+        self.assertEqual(delta['deleted']['tasks'], sorted([self.parent.pk, self.subtask.pk]))
+
+
+class SingleFlightTest(SimpleTestCase):
+    """并发相同请求合并为一次计算"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def slow_payload(self, key):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return {'key': key, 'rows': list(range(3))}
+
+    def test_concurrent_threads_share_one_computation(self):
+        compute = single_flight(lambda key: f'test:{key}')(self.slow_payload)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(compute, ['a'] * 8))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'key': 'a', 'rows': [0, 1, 2]}] * 8)
+        # 每个等待者拿到独立副本
+        self.assertEqual(len({id(result) for result in results}), 8)
+
+    def test_concurrent_coroutines_share_one_computation(self):
+        @single_flight(lambda key: f'test:async:{key}')
+        async def compute(key):
+            self.calls += 1
+            await asyncio.sleep(0.1)
+            return key.upper()
+
+        async def run():
+            return await asyncio.gather(*(compute('b') for _ in range(5)))
+
+        self.assertEqual(asyncio.run(run()), ['B'] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_waits_for_result_published_by_another_process(self):
+        compute = single_flight(lambda key: f'test:{key}')(self.slow_payload)
+        cache.add('singleflight:test:c:lock', 'other-process', 30)
+
+        def publish():
+            time.sleep(0.1)
+            cache.set('singleflight:test:c:result', pickle.dumps({'key': 'c', 'rows': []}), 5)
+
+        threading.Thread(target=publish).start()
+        self.assertEqual(compute('c'), {'key': 'c', 'rows': []})
+        self.assertEqual(self.calls, 0)
+
+    def test_none_key_bypasses(self):
+        compute = single_flight(lambda key: None)(self.slow_payload)
+        compute('d')
+        compute('d')
+        self.assertEqual(self.calls, 2)
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+    verbose_name = '后台任务'
+
+    def ready(self):
+        # 各应用在 jobs.py 中用 @register 注册后台任务处理函数
+        autodiscover_modules('jobs')
@@ -0,0 +1,113 @@
+"""
+启动后台任务工作进程池
+
+主进程派生 --workers 个工作进程，每个进程循环领取并执行任务；意外退出的工作进程会被重启，
+超过 --stale-timeout 秒没有心跳的任务重新排队。收到 SIGTERM/SIGINT 后各进程执行完当前任务再退出。
+
+示例:
+    python manage.py runworkers --workers 4
+    python manage.py runworkers --burst          # 在当前进程执行完到期任务后退出（适合cron/测试）
+    python manage.py runworkers --stats          # 输出各类任务的数量与耗时统计（JSON）
+"""
+import json
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs.services import HEARTBEAT_INTERVAL, job_metrics, requeue_stale_jobs, work, worker_name
+
+# 主进程巡检间隔（秒）
+SUPERVISE_INTERVAL = 1.0
+STALE_CHECK_INTERVAL = 60
+
+
+class _StopFlag:
+    """信号处理函数只设置标志：在处理函数中操作 multiprocessing.Event 可能与等待中的主流程死锁"""
+
+    def __init__(self, *signums):
+        self.stopping = False
+        for signum in signums:
+            signal.signal(signum, self.set)
+
+    def set(self, signum=None, frame=None):
+        self.stopping = True
+
+
+def _worker_main(stop_event, options):
+    # 停止通常由主进程通过 stop_event 统一通知；Ctrl+C 的 SIGINT 交给主进程处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    flag = _StopFlag(signal.SIGTERM)
+    try:
+        work(
+            stop=lambda: flag.stopping or stop_event.is_set(),
+            poll_interval=options['poll_interval'],
+            max_jobs=options['max_jobs'],
+        )
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = '启动后台任务工作进程池（数据库队列，无需外部消息代理）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='工作进程数')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--max-jobs', type=int, help='每个工作进程执行该数量任务后重启（防止内存增长）')
+        parser.add_argument('--stale-timeout', type=int, default=600, help='超过该秒数没有心跳的任务视为中断并重新排队')
+        parser.add_argument('--burst', action='store_true', help='在当前进程中执行完所有到期任务后退出')
+        parser.add_argument('--stats', action='store_true', help='输出任务统计后退出')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(job_metrics(), ensure_ascii=False, indent=2))
+            return
+
+        if options['burst']:
+            processed = work(burst=True)
+            self.stdout.write(self.style.SUCCESS(f'已执行 {processed} 个后台任务'))
+            return
+
+        if options['workers'] < 1:
+            raise CommandError('--workers 至少为1')
+        if options['stale_timeout'] <= 2 * HEARTBEAT_INTERVAL:
+            raise CommandError(f'--stale-timeout 应大于心跳间隔（{HEARTBEAT_INTERVAL} 秒）的两倍')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('当前平台不支持fork，请使用 --burst 或在Linux上运行')
+
+        context = multiprocessing.get_context('fork')
+        stop_event = context.Event()
+
+        def spawn():
+            # 派生前关闭数据库连接，避免子进程共用父进程的连接
+            connections.close_all()
+            process = context.Process(target=_worker_main, args=(stop_event, options), daemon=False)
+            process.start()
+            return process
+
+        self.stdout.write(f"启动 {options['workers']} 个工作进程（主进程 {worker_name()}）")
+        processes = [spawn() for _ in range(options['workers'])]
+        flag = _StopFlag(signal.SIGTERM, signal.SIGINT)
+        last_stale_check = 0.0
+        try:
+            while not flag.stopping:
+                for i, process in enumerate(processes):
+                    if not process.is_alive():
+                        if process.exitcode:
+                            self.stderr.write(f'工作进程 {process.pid} 异常退出（{process.exitcode}），重新启动')
+                        processes[i] = spawn()
+                if time.monotonic() - last_stale_check >= STALE_CHECK_INTERVAL:
+                    requeued = requeue_stale_jobs(options['stale_timeout'])
+                    if requeued:
+                        self.stderr.write(f'{requeued} 个超时任务已重新排队或标记失败')
+                    last_stale_check = time.monotonic()
+                time.sleep(SUPERVISE_INTERVAL)
+        finally:
+            stop_event.set()
+            for process in processes:
+                process.join()
+            connections.close_all()
+        self.stdout.write('工作进程已全部退出')
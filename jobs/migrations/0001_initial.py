@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='任务名称')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='参数')),
+                ('priority', models.IntegerField(default=0, verbose_name='优先级')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '执行中'), ('succeeded', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='已执行次数')),
+                ('max_attempts', models.PositiveIntegerField(default=3, verbose_name='最大执行次数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='可执行时间')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='工作进程')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='结果')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近错误')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+                ('wait_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='等待时长(ms)')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='执行时长(ms)')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='提交人')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'), models.Index(fields=['name', 'status'], name='job_name_status_idx')],
+            },
+        ),
+    ]
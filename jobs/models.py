@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    数据库队列中的后台任务。
+    由 runworkers 启动的工作进程按优先级（高优先）与可执行时间领取，失败后按指数退避重试。
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '等待中'),
+        (STATUS_RUNNING, '执行中'),
+        (STATUS_SUCCEEDED, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    PRIORITY_LOW = -10
+    PRIORITY_NORMAL = 0
+    PRIORITY_HIGH = 10
+
+    name = models.CharField(max_length=100, verbose_name='任务名称')
+    payload = models.JSONField(default=dict, blank=True, verbose_name='参数')
+    priority = models.IntegerField(default=PRIORITY_NORMAL, verbose_name='优先级')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='已执行次数')
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name='最大执行次数')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='可执行时间')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs',
+        verbose_name='提交人'
+    )
+    worker = models.CharField(max_length=100, blank=True, verbose_name='工作进程')
+    result = models.JSONField(null=True, blank=True, verbose_name='结果')
+    last_error = models.TextField(blank=True, verbose_name='最近错误')
+
+    # 计时：wait_ms 为到期后等待领取的时间，duration_ms 为最近一次执行耗时
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    # 执行期间工作进程定期刷新，超时未刷新的任务才视为工作进程已退出
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='最近心跳')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='结束时间')
+    wait_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='等待时长(ms)')
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name='执行时长(ms)')
+
+    class Meta:
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='job_claim_idx'),
+            models.Index(fields=['name', 'status'], name='job_name_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
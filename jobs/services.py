@@ -0,0 +1,289 @@
+"""
+后台任务：注册、入队、领取与执行
+
+处理函数在各应用的 jobs.py 中注册:
+
+    @register('drawings.generate_thumbnail')
+    def generate_thumbnail(drawing_id):
+        ...
+
+视图中入队（参数需可JSON序列化，返回值作为结果保存）:
+
+    enqueue('drawings.generate_thumbnail', {'drawing_id': drawing.pk})
+
+领取：支持 SKIP LOCKED 的数据库（PostgreSQL、MySQL 8）在事务内以
+SELECT ... FOR UPDATE SKIP LOCKED 锁定一行，多个工作进程互不阻塞；SQLite 没有行锁，
+改为对候选行执行带状态条件的 UPDATE，更新成功（影响1行）者获得该任务。
+
+执行期间由心跳线程定期刷新 heartbeat_at，超过超时时间没有心跳的任务才重新排队。结果以带条件的
+UPDATE 写回（仍为本进程的本次执行），任务已被重新排队或由其他进程接手时丢弃本次结果。
+"""
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# 重试退避：第n次失败后等待 RETRY_BASE_DELAY * 2**(n-1) 秒，最长 RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 3600
+
+# SQLite 回退时每次尝试抢占的候选数
+CLAIM_CANDIDATES = 10
+# 执行期间刷新心跳的间隔（秒），超时时间应为其数倍
+HEARTBEAT_INTERVAL = 30
+
+_handlers = {}
+
+
+class PermanentJobError(Exception):
+    """处理函数抛出此异常时任务直接失败，不再重试（如缺少依赖、对象已删除）"""
+
+
+def register(name):
+    """注册后台任务处理函数"""
+    def decorator(func):
+        if name in _handlers and _handlers[name] is not func:
+            raise ValueError(f'后台任务 {name} 已注册')
+        _handlers[name] = func
+        return func
+
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, payload=None, *, priority=Job.PRIORITY_NORMAL, delay=0, max_attempts=3, user=None):
+    """
+    提交后台任务，返回 Job。
+    在事务中调用时任务随事务提交才对工作进程可见，回滚则一并撤销。
+    """
+    if name not in _handlers:
+        raise ValueError(f'未注册的后台任务: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _ready_jobs(now):
+    return Job.objects.filter(status=Job.STATUS_PENDING, run_after__lte=now).order_by('-priority', 'run_after', 'id')
+
+
+def claim_job(worker=None):
+    """领取一个到期的任务并标记为执行中；没有可执行任务时返回None"""
+    worker = worker or worker_name()
+    now = timezone.now()
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _ready_jobs(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status = Job.STATUS_RUNNING
+            job.attempts += 1
+            job.worker = worker
+            job.started_at = job.heartbeat_at = now
+            job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'heartbeat_at'])
+            return job
+
+    for job_id in _ready_jobs(now).values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        claimed = Job.objects.filter(pk=job_id, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING, attempts=F('attempts') + 1, worker=worker, started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _owned(job):
+    """仍由领取时的工作进程执行的本次任务（重新排队或再次领取后不再匹配）"""
+    return Job.objects.filter(pk=job.pk, status=Job.STATUS_RUNNING, worker=job.worker, attempts=job.attempts)
+
+
+class Heartbeat(threading.Thread):
+    """执行期间每隔 interval 秒刷新任务的 heartbeat_at（独立线程，使用线程自己的数据库连接）"""
+
+    def __init__(self, job, interval=HEARTBEAT_INTERVAL):
+        super().__init__(name=f'job-heartbeat-{job.pk}', daemon=True)
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def beat(self):
+        return _owned(self.job).update(heartbeat_at=timezone.now())
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                if not self.beat():
+                    break
+        except Exception:
+            logger.exception('后台任务 %s 心跳更新失败', self.job)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """
+    执行已领取的任务并记录结果、耗时；失败时按退避重新排队或标记失败。
+    任务在执行期间已被重新排队（或由其他进程接手）时不写回结果
+    """
+    job.wait_ms = max(0, int((job.started_at - job.run_after).total_seconds() * 1000))
+    handler = get_handler(job.name)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise PermanentJobError(f'未注册的后台任务: {job.name}')
+        job.result = handler(**job.payload)
+    except Exception as e:
+        job.duration_ms = int((time.perf_counter() - started) * 1000)
+        job.last_error = traceback.format_exc()
+        job.finished_at = timezone.now()
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = Job.STATUS_FAILED
+            logger.error('后台任务 %s 失败: %s', job, e)
+        else:
+            job.status = Job.STATUS_PENDING
+            delay = min(RETRY_BASE_DELAY * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+            job.run_after = job.finished_at + timedelta(seconds=delay)
+            logger.warning('后台任务 %s 执行出错，%s 秒后重试: %s', job, delay, e)
+    else:
+        job.duration_ms = int((time.perf_counter() - started) * 1000)
+        job.finished_at = timezone.now()
+        job.status = Job.STATUS_SUCCEEDED
+        job.last_error = ''
+    finally:
+        heartbeat.stop()
+
+    fields = ('status', 'result', 'last_error', 'run_after', 'finished_at', 'wait_ms', 'duration_ms')
+    if not _owned(job).update(**{field: getattr(job, field) for field in fields}):
+        job.refresh_from_db()
+        logger.warning('后台任务 %s 在执行期间已被重新排队或由其他进程接手，丢弃本次结果', job)
+    return job
+
+
+def requeue_stale_jobs(timeout):
+    """
+    超过 timeout 秒没有心跳的执行中任务视为工作进程已退出：未用完次数的重新排队，否则标记失败。
+    返回处理的任务数。
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    # 没有心跳记录的（新增心跳前领取的）任务按开始时间判断
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=Job.STATUS_RUNNING,
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, finished_at=timezone.now(), last_error='工作进程超时或退出'
+    )
+    requeued = stale.update(status=Job.STATUS_PENDING, worker='')
+    return failed + requeued
+
+
+def work(stop=None, poll_interval=1.0, max_jobs=None, burst=False, worker=None):
+    """
+    工作循环：反复领取并执行任务。
+    stop() 返回真时在当前任务结束后退出；burst 为真时队列中没有到期任务即退出。
+    返回执行的任务数。
+    """
+    worker = worker or worker_name()
+    processed = 0
+    while not (stop and stop()) and (max_jobs is None or processed < max_jobs):
+        close_old_connections()
+        job = claim_job(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def job_status_data(job):
+    """任务状态（状态查询接口与入队接口的响应）"""
+    data = {
+        'id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'status_url': reverse('jobs:job_status', kwargs={'pk': job.pk}),
+        'wait_ms': job.wait_ms,
+        'duration_ms': job.duration_ms,
+    }
+    if job.status == Job.STATUS_SUCCEEDED:
+        data['result'] = job.result
+        if isinstance(job.result, dict) and job.result.get('file'):
+            data['download_url'] = reverse('jobs:job_download', kwargs={'pk': job.pk})
+    elif job.status == Job.STATUS_FAILED:
+        data['error'] = job.last_error.strip().splitlines()[-1] if job.last_error else ''
+    return data
+
+
+def job_metrics(queryset=None):
+    """按任务名称汇总数量、重试、等待与执行耗时（毫秒）"""
+    queryset = Job.objects.all() if queryset is None else queryset
+
+    def distribution(values):
+        if not values:
+            return None
+        values = sorted(values)
+        return {
+            'avg': round(statistics.mean(values), 1),
+            'median': statistics.median(values),
+            'p95': values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))],
+            'max': values[-1],
+        }
+
+    rows = {}
+    for name, status, attempts, wait_ms, duration_ms in queryset.values_list(
+        'name', 'status', 'attempts', 'wait_ms', 'duration_ms'
+    ).iterator():
+        row = rows.setdefault(name, {'statuses': {}, 'retries': 0, 'wait': [], 'duration': []})
+        row['statuses'][status] = row['statuses'].get(status, 0) + 1
+        row['retries'] += max(0, attempts - 1)
+        if wait_ms is not None:
+            row['wait'].append(wait_ms)
+        if duration_ms is not None and status == Job.STATUS_SUCCEEDED:
+            row['duration'].append(duration_ms)
+
+    return {
+        name: {
+            'total': sum(row['statuses'].values()),
+            'statuses': row['statuses'],
+            'retries': row['retries'],
+            'wait_ms': distribution(row['wait']),
+            'duration_ms': distribution(row['duration']),
+        }
+        for name, row in sorted(rows.items())
+    }
@@ -0,0 +1,173 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import create_owned_project
+from projects.models import Project
+from .models import Job
+from .services import (
+    Heartbeat, PermanentJobError, claim_job, enqueue, job_metrics, register, requeue_stale_jobs, run_job, work,
+)
+
+calls = []
+
+
+@register('tests.record')
+def record(value, fail_times=0):
+    calls.append(value)
+    if calls.count(value) <= fail_times:
+        raise RuntimeError(f'第{calls.count(value)}次失败')
+    return {'value': value}
+
+
+@register('tests.permanent')
+def permanent():
+    raise PermanentJobError('缺少依赖')
+
+
+@register('tests.during')
+def during():
+    """执行测试设置的回调（模拟执行期间发生的事）"""
+    return hooks.pop()()
+
+
+hooks = []
+
+
+class JobQueueTest(TestCase):
+    """后台任务：优先级领取、重试退避与统计"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_claims_by_priority_and_runs(self):
+        low = enqueue('tests.record', {'value': 'low'}, priority=Job.PRIORITY_LOW)
+        high = enqueue('tests.record', {'value': 'high'}, priority=Job.PRIORITY_HIGH)
+        delayed = enqueue('tests.record', {'value': 'later'}, priority=Job.PRIORITY_HIGH, delay=3600)
+
+        self.assertEqual(work(burst=True), 2)
+        self.assertEqual(calls, ['high', 'low'])
+        for job in (low, high):
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+            self.assertEqual(job.attempts, 1)
+            self.assertIsNotNone(job.duration_ms)
+        self.assertEqual(high.result, {'value': 'high'})
+        delayed.refresh_from_db()
+        self.assertEqual(delayed.status, Job.STATUS_PENDING)
+
+    def test_claimed_job_is_not_claimed_again(self):
+        enqueue('tests.record', {'value': 'once'})
+        self.assertIsNotNone(claim_job('w1'))
+        self.assertIsNone(claim_job('w2'))
+
+    def test_retries_with_backoff_then_fails(self):
+        job = enqueue('tests.record', {'value': 'flaky', 'fail_times': 5}, max_attempts=2)
+
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('RuntimeError', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+        metrics = job_metrics()['tests.record']
+        self.assertEqual(metrics['statuses'], {Job.STATUS_FAILED: 1})
+        self.assertEqual(metrics['retries'], 1)
+
+    def age(self, job, **fields):
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(**{field: long_ago for field in fields})
+
+    def test_long_job_with_heartbeat_is_not_requeued(self):
+        job = enqueue('tests.during')
+        claimed = claim_job('w1')
+
+        def run():
+            # 已执行超过超时时间，但心跳仍在刷新
+            self.age(job, started_at=True, heartbeat_at=True)
+            self.assertEqual(Heartbeat(claimed).beat(), 1)
+            return requeue_stale_jobs(600)
+
+        hooks.append(run)
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.STATUS_SUCCEEDED, 1, 0))
+
+    def test_requeued_job_result_is_dropped(self):
+        job = enqueue('tests.during')
+        claimed = claim_job('w1')
+
+        def run():
+            # 心跳超时（如进程卡死）后被重新排队并由另一个工作进程领取
+            self.age(job, started_at=True, heartbeat_at=True)
+            self.assertEqual(requeue_stale_jobs(600), 1)
+            self.assertEqual(claim_job('w2').attempts, 2)
+            self.assertEqual(Heartbeat(claimed).beat(), 0)
+            return 'stale'
+
+        hooks.append(run)
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.result), (Job.STATUS_RUNNING, 'w2', None))
+
+    def test_permanent_error_is_not_retried(self):
+        job = enqueue('tests.permanent')
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+
+
+class JobTargetsTest(TestCase):
+    """项目删除与PDF导出转为后台任务"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project = create_owned_project()
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def test_project_delete_purges_in_background(self):
+        url = reverse('projects:project_delete', kwargs={'pk': self.project.pk})
+        self.client.post(url)
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(Job.objects.filter(name='projects.purge_project').count(), 1)
+
+        call_command('runworkers', burst=True, stdout=StringIO())
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+
+    def test_background_pdf_export(self):
+        url = reverse('gantt:export_gantt_pdf', kwargs={'project_id': self.project.pk})
+        response = self.client.get(url, {'background': '1'})
+        self.assertEqual(response.status_code, 202)
+        status_url = response.json()['status_url']
+
+        with override_settings(MEDIA_ROOT=self.media_root), \
+                mock.patch('gantt.jobs.build_gantt_pdf', return_value=b'%PDF-1.4'):
+            work(burst=True)
+            data = self.client.get(status_url).json()
+            self.assertEqual(data['status'], Job.STATUS_SUCCEEDED)
+            download = self.client.get(data['download_url'])
+            self.assertEqual(b''.join(download.streaming_content), b'%PDF-1.4')
+
+        other = get_user_model().objects.create_user('other', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
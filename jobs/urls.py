@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+
+urlpatterns = [
+    # 后台任务状态
+    path('<int:pk>/', views.job_status, name='job_status'),
+
+    # 下载任务生成的文件
+    path('<int:pk>/download/', views.job_download, name='job_download'),
+]
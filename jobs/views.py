@@ -0,0 +1,31 @@
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .models import Job
+from .services import job_status_data
+
+
+@login_required
+@require_GET
+def job_status(request, pk):
+    """后台任务状态（客户端轮询至 status 为 succeeded/failed）"""
+    job = get_object_or_404(Job, pk=pk, created_by=request.user)
+    return JsonResponse(job_status_data(job))
+
+
+@login_required
+@require_GET
+def job_download(request, pk):
+    """下载后台任务生成的文件"""
+    job = get_object_or_404(Job, pk=pk, created_by=request.user, status=Job.STATUS_SUCCEEDED)
+    result = job.result if isinstance(job.result, dict) else {}
+    if not result.get('file') or not default_storage.exists(result['file']):
+        raise Http404('文件不存在或已过期')
+    return FileResponse(
+        default_storage.open(result['file'], 'rb'),
+        as_attachment=True,
+        filename=result.get('filename') or result['file'].rsplit('/', 1)[-1],
+    )
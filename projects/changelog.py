@@ -0,0 +1,184 @@
+"""
+变更日志：记录工地、任务、依赖、图纸、标注的新增/更新/删除，供增量同步按游标拉取；
+事务提交后同时推送到项目的实时事件流
+"""
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import DateTimeField, F, Max, Min, Value
+from django.utils import timezone
+
+from core.events import broker
+from .models import ChangeLog, WorkSite
+
+
+# 事务最长持续时间的估计（秒）：写入早于此时长的日志必定已提交，游标可以越过
+CHANGELOG_SETTLE_SECONDS = 10 * 60
+
+
+class CursorExpired(Exception):
+    """游标早于已保留的日志（日志已被清理），客户端需要重新全量同步"""
+
+
+def worksite_project_id(worksite_id):
+    """工地所属项目ID"""
+    return WorkSite.objects.filter(pk=worksite_id).values_list('project_id', flat=True).first()
+
+
+def project_channel(project_id):
+    """项目实时事件流的频道名"""
+    return f'project:{project_id}'
+
+
+def publish_change(entry, data=None):
+    """事务提交后把变更推送给订阅该项目的事件流（data 为变更后的字段，可为空）"""
+    event = {
+        'cursor': entry.id,
+        'model': entry.model,
+        'id': entry.object_id,
+        'action': entry.action,
+        'worksite_id': entry.worksite_id,
+        'data': data,
+    }
+    transaction.on_commit(lambda: broker.publish(project_channel(entry.project_id), event))
+
+
+def record_change(model, object_id, action, worksite_id=None, project_id=None, data=None):
+    """记录一条变更并推送事件（未给出项目ID时按工地查找；找不到项目则不记录）"""
+    if project_id is None and worksite_id is not None:
+        project_id = worksite_project_id(worksite_id)
+    if project_id is None:
+        return None
+    entry = ChangeLog.objects.create(
+        project_id=project_id, worksite_id=worksite_id, model=model, object_id=object_id, action=action
+    )
+    publish_change(entry, data)
+    return entry
+
+
+def record_changes(model, rows, action, project_id):
+    """批量记录同一项目的变更，rows 为 (对象ID, 工地ID) 序列（供绕过信号的批量写入使用）"""
+    entries = ChangeLog.objects.bulk_create([
+        ChangeLog(project_id=project_id, worksite_id=worksite_id, model=model, object_id=object_id, action=action)
+        for object_id, worksite_id in rows
+    ])
+    for entry in entries:
+        if entry.id is not None:
+            publish_change(entry)
+    return entries
+
+
+def record_queryset_changes(model, queryset, action, worksite_field='worksite'):
+    """
+    集合式记录 queryset 中全部对象的变更（INSERT ... SELECT，不在Python中逐条构造日志），
+    每个项目只推送最后一条日志：客户端收到事件后按游标补齐。返回记录条数
+    """
+    before = current_cursor()
+    select = queryset.order_by().values(
+        log_project_id=F(f'{worksite_field}__project_id'),
+        log_worksite_id=F(f'{worksite_field}_id'),
+        log_model=Value(model),
+        log_object_id=F('pk'),
+        log_action=Value(action),
+        log_created_at=Value(timezone.now(), output_field=DateTimeField()),
+    )
+    sql, params = select.query.sql_with_params()
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(ChangeLog._meta.get_field(name).column)
+        for name in ('project_id', 'worksite_id', 'model', 'object_id', 'action', 'created_at')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(ChangeLog._meta.db_table)} ({columns}) {sql}', params)
+        count = cursor.rowcount
+
+    latest = (
+        ChangeLog.objects.filter(id__gt=before, model=model)
+        .values('project_id').annotate(latest=Max('id')).values_list('latest', flat=True)
+    )
+    for entry in ChangeLog.objects.filter(id__in=list(latest)):
+        publish_change(entry)
+    return count
+
+
+def current_cursor():
+    """当前最新游标（全量数据读取之前获取，避免遗漏读取期间的变更）"""
+    return ChangeLog.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def settled_cursor():
+    """
+    确定已提交的最新游标：写入时间早于 CHANGELOG_SETTLE_SECONDS 的最后一条日志。
+    自增ID在写入时分配、提交后才可见，更新的ID之前可能还有进行中事务的较小ID
+    """
+    cutoff = timezone.now() - timedelta(seconds=CHANGELOG_SETTLE_SECONDS)
+    return ChangeLog.objects.filter(created_at__lte=cutoff).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def check_cursor(since):
+    """游标早于最早保留的日志时抛出 CursorExpired"""
+    oldest = ChangeLog.objects.aggregate(oldest=Min('id'))['oldest']
+    if since < 0 or (since and oldest is not None and since < oldest - 1):
+        raise CursorExpired(since)
+
+
+def changes_since(since, project_id=None, worksite_id=None, models=None, limit=None):
+    """
+    拉取游标之后的变更，同一对象只保留最后一次操作。
+
+    返回 (新游标, 是否还有更多, {数据类型: {'upsert': set(ID), 'delete': set(ID)}})。
+    新游标为实际读到的最后一条日志（指定 limit 时按日志条数分批），但不超过 settled_cursor()：
+    之后才提交的事务可能持有更小的ID，尚未确定提交的日志在下次拉取时会再次返回（新增/删除可重复执行）。
+    一批读到的日志都未确定提交时游标无法前进，此时不报告还有更多（避免客户端原地反复拉取），
+    超出 limit 的部分在确定提交后再拉取到。
+    """
+    check_cursor(since)
+    settled = settled_cursor()
+    entries = ChangeLog.objects.filter(id__gt=since)
+    if project_id is not None:
+        entries = entries.filter(project_id=project_id)
+    if worksite_id is not None:
+        entries = entries.filter(worksite_id=worksite_id)
+    if models:
+        entries = entries.filter(model__in=models)
+    entries = entries.order_by('id').values_list('id', 'model', 'object_id', 'action')
+
+    if limit:
+        rows = list(entries[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = list(entries)
+        has_more = False
+
+    last_actions = {}
+    for entry_id, model, object_id, action in rows:
+        last_actions[(model, object_id)] = action
+
+    changes = {}
+    for (model, object_id), action in last_actions.items():
+        changes.setdefault(model, {ChangeLog.ACTION_UPSERT: set(), ChangeLog.ACTION_DELETE: set()})
+        changes[model][action].add(object_id)
+
+    if has_more:
+        cursor = max(since, min(rows[-1][0], settled))
+        has_more = cursor > since
+    else:
+        # 已取完：没有新变更的客户端也推进到读取前已确定提交的位置（避免游标长期不动而过期），
+        # 但不推进到全局最新游标——其中较小的ID可能属于尚未提交的事务
+        cursor = max(since, settled)
+    return cursor, has_more, changes
+
+
+def split_changes(changes, model, queryset, serializer):
+    """
+    取出某类数据的变更行与墓碑：已记录更新但已不存在的对象同样视为删除
+    （例如先删除后补记了更新的级联场景）
+    """
+    model_changes = changes.get(model, {ChangeLog.ACTION_UPSERT: set(), ChangeLog.ACTION_DELETE: set()})
+    rows = list(queryset.filter(pk__in=model_changes[ChangeLog.ACTION_UPSERT]).order_by('pk'))
+    deleted = model_changes[ChangeLog.ACTION_DELETE] | (
+        model_changes[ChangeLog.ACTION_UPSERT] - {row.pk for row in rows}
+    )
+    return [serializer(row) for row in rows], sorted(deleted)
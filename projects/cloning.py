@@ -0,0 +1,142 @@
+"""
+以现有项目为模板创建新项目
+
+复制工地、任务树、任务依赖（类型与滞后天数）和任务前置关系，可选复制图纸记录及任务与图纸的关联
+（只复制记录，与模板共用同一文件；删除图纸时仍被其他记录引用的文件会保留）。所有日期按新项目与
+模板开始日期之差平移，工地和任务状态恢复为默认值，标注不复制。
+
+模板数据已通过校验，整体平移也不改变日期之间的关系，因此不逐条 save()/full_clean()：每种记录
+一次 bulk_create（任务按层级，父任务先插入），旧ID→新ID映射保存在内存中。
+"""
+from datetime import timedelta
+
+from django.db import transaction
+
+from drawings.models import Drawing
+from tasks.models import Task, TaskDependency
+from .models import Project, WorkSite
+from .transfer import bulk_insert, export_fields, export_querysets
+
+CLONE_BATCH_SIZE = 2000
+
+# 需要平移的日期字段
+DATE_FIELDS = {
+    WorkSite: ('start_date', 'end_date'),
+    Task: ('start_date', 'end_date', 'deadline'),
+}
+# 恢复为默认值的字段（新项目从头开始）
+RESET_FIELDS = {
+    WorkSite: ('status',),
+    Task: ('status',),
+}
+
+
+def _source_rows(queryset, model):
+    """模板记录的 (旧主键, 字段字典) 列表"""
+    fields = export_fields(model)
+    return [
+        (pk, dict(zip(fields, values)))
+        for pk, *values in queryset.order_by('pk').values_list('pk', *fields).iterator(chunk_size=CLONE_BATCH_SIZE)
+    ]
+
+
+def _build(model, fields, offset):
+    for name in DATE_FIELDS.get(model, ()):
+        if fields.get(name) is not None:
+            fields[name] += offset
+    for name in RESET_FIELDS.get(model, ()):
+        fields[name] = model._meta.get_field(name).get_default()
+    return model(**fields)
+
+
+def _clone_rows(model, rows, offset, references):
+    """复制一组记录：references 为 {外键属性: 映射}，引用未复制的记录时跳过该行。返回旧→新ID映射"""
+    objects, old_ids = [], []
+    for old_id, fields in rows:
+        for attname, id_map in references.items():
+            fields[attname] = id_map.get(fields[attname])
+        if any(fields[attname] is None for attname in references):
+            continue
+        objects.append(_build(model, fields, offset))
+        old_ids.append(old_id)
+    bulk_insert(model, objects, CLONE_BATCH_SIZE)
+    return {old_id: obj.pk for old_id, obj in zip(old_ids, objects)}
+
+
+def task_levels(rows):
+    """按层级分组任务行（根任务为第0层），父任务不在模板中的任务视为根任务"""
+    parents = {pk: fields['parent_task_id'] for pk, fields in rows}
+    depths = {}
+    for pk in parents:
+        chain = []
+        node = pk
+        while node not in depths and node in parents:
+            chain.append(node)
+            node = parents[node]
+        depth = depths.get(node, -1)
+        for node in reversed(chain):
+            depth += 1
+            depths[node] = depth
+
+    levels = {}
+    for pk, fields in rows:
+        if fields['parent_task_id'] not in parents:
+            fields['parent_task_id'] = None
+        levels.setdefault(depths[pk], []).append((pk, fields))
+    return [levels[depth] for depth in sorted(levels)]
+
+
+def clone_project(template, project, include_drawings=False):
+    """
+    以 template 为模板创建 project（未保存的项目实例，已设置所有者、名称和日期）。
+    返回 (project, 各类记录复制数)。
+    """
+    offset = timedelta(days=(project.start_date - template.start_date).days)
+    sources = export_querysets(template)
+    counts = {}
+
+    with transaction.atomic():
+        project.save()
+
+        worksite_rows = _source_rows(sources['worksite'], WorkSite)
+        for _, fields in worksite_rows:
+            fields['project_id'] = project.pk
+        worksite_ids = _clone_rows(WorkSite, worksite_rows, offset, {})
+        counts['worksite'] = len(worksite_ids)
+
+        drawing_ids = {}
+        if include_drawings:
+            drawing_ids = _clone_rows(
+                Drawing, _source_rows(sources['drawing'], Drawing), offset, {'worksite_id': worksite_ids}
+            )
+            counts['drawing'] = len(drawing_ids)
+
+        task_ids = {}
+        for level in task_levels(_source_rows(sources['task'], Task)):
+            for _, fields in level:
+                if fields['parent_task_id'] is not None:
+                    fields['parent_task_id'] = task_ids.get(fields['parent_task_id'])
+            task_ids.update(_clone_rows(Task, level, offset, {'worksite_id': worksite_ids}))
+        counts['task'] = len(task_ids)
+
+        counts['dependency'] = len(_clone_rows(
+            TaskDependency, _source_rows(sources['dependency'], TaskDependency), offset,
+            {'predecessor_id': task_ids, 'successor_id': task_ids},
+        ))
+        through = Task.dependencies.through
+        counts['task_prerequisite'] = len(_clone_rows(
+            through, _source_rows(sources['task_prerequisite'], through), offset,
+            {'from_task_id': task_ids, 'to_task_id': task_ids},
+        ))
+        if include_drawings:
+            through = Task.drawings.through
+            counts['task_drawing'] = len(_clone_rows(
+                through, _source_rows(sources['task_drawing'], through), offset,
+                {'task_id': task_ids, 'drawing_id': drawing_ids},
+            ))
+
+        # bulk_create 不触发计数缓存信号，统一重算
+        WorkSite.objects.filter(project=project).refresh_counters()
+        Project.objects.filter(pk=project.pk).refresh_counters()
+    project.refresh_from_db()
+    return project, counts
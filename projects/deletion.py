@@ -0,0 +1,163 @@
+"""
+项目/工地删除：请求中只做软删除（一两条UPDATE，立即从界面隐藏），数据由后台任务分批清除
+
+清除按 标注 → 依赖 → 任务关联 → 图纸 → 任务（由叶子到根） → 工地 的顺序，每批按主键删除
+PURGE_BATCH_SIZE 行并单独提交，不会长时间持有锁。批量删除直接执行DELETE，不逐行触发
+计数缓存/变更日志信号：上级对象随后同样被删除，逐行维护没有意义。
+例外是另一端为其他未删除工地中任务的依赖、前置任务/图纸关联与标注：这些行成批补记
+变更日志（依赖与标注为删除墓碑，关联为对方任务的更新），并递增对方项目的数据版本。
+图纸文件在每批提交后成批从存储中删除（级联删除不会调用 Drawing.delete()，文件原本会遗留），
+仍被其他图纸引用的文件（以模板创建的项目共用）保留。
+"""
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from drawings.models import Drawing, unreferenced_file_names
+from jobs.models import Job
+from jobs.services import enqueue
+from tasks.models import Task, TaskAnnotation, TaskDependency
+from .changelog import record_change, record_queryset_changes
+from .models import ChangeLog, Project, WorkSite
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 500
+
+
+def soft_delete_project(project, user=None):
+    """隐藏项目及其工地，并提交后台清除任务"""
+    now = timezone.now()
+    with transaction.atomic():
+        Project.all_objects.filter(pk=project.pk).update(deleted_at=now, data_version=F('data_version') + 1)
+        WorkSite.all_objects.filter(project_id=project.pk, deleted_at__isnull=True).update(deleted_at=now)
+        return enqueue('projects.purge_project', {'project_id': project.pk}, priority=Job.PRIORITY_LOW, user=user)
+
+
+def soft_delete_worksite(worksite, user=None):
+    """隐藏工地（刷新项目计数并记录删除墓碑），并提交后台清除任务"""
+    with transaction.atomic():
+        WorkSite.all_objects.filter(pk=worksite.pk).update(deleted_at=timezone.now())
+        Project.objects.filter(pk=worksite.project_id).refresh_counters()
+        record_change('worksite', worksite.pk, ChangeLog.ACTION_DELETE, worksite_id=worksite.pk,
+                      project_id=worksite.project_id)
+        return enqueue('projects.purge_worksite', {'worksite_id': worksite.pk}, priority=Job.PRIORITY_LOW, user=user)
+
+
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, on_batch=None):
+    """
+    按主键分批删除 queryset 的行（不触发信号与级联收集），返回删除行数。
+    on_batch(ids) 在每批删除前于同一事务内调用。
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            if on_batch is not None:
+                on_batch(ids)
+            deleted += model._base_manager.filter(pk__in=ids)._raw_delete(DEFAULT_DB_ALIAS)
+
+
+def delete_files(names):
+    """从存储中删除文件（失败只记录日志，数据已删除，不影响清除结果）"""
+    removed = 0
+    for name in names:
+        try:
+            default_storage.delete(name)
+            removed += 1
+        except OSError as e:
+            logger.warning(f"删除文件失败: {name}: {e}")
+    return removed
+
+
+def log_cross_worksite(worksite_id, queryset, task_field, model=None):
+    """
+    on_batch 回调：批内另一端（task_field）是其他未删除工地中任务的行补记变更日志，
+    并递增那些项目的数据版本。给出 model 时记录这些行本身的删除墓碑，
+    否则（多对多关联行）记录对方任务的更新
+    """
+    def on_batch(ids):
+        rows = queryset.filter(pk__in=ids, **{f'{task_field}__worksite__deleted_at__isnull': True}).exclude(
+            **{f'{task_field}__worksite_id': worksite_id}
+        )
+        if model is None:
+            logged = record_queryset_changes(
+                'task', Task.objects.filter(pk__in=rows.values(task_field)), ChangeLog.ACTION_UPSERT
+            )
+        else:
+            logged = record_queryset_changes(
+                model, rows, ChangeLog.ACTION_DELETE, worksite_field=f'{task_field}__worksite'
+            )
+        if logged:
+            Project.objects.filter(pk__in=rows.values(f'{task_field}__worksite__project_id')).touch()
+
+    return on_batch
+
+
+def purge_worksite_data(worksite_id, batch_size=PURGE_BATCH_SIZE):
+    """分批删除工地下的全部数据及图纸文件（不含工地本身），返回各类删除行数"""
+    tasks = Task.objects.filter(worksite_id=worksite_id)
+    file_count = 0
+
+    def collect_files(ids):
+        # 该批提交后再删除文件：事务回滚时文件仍在
+        nonlocal file_count
+        names = sorted(unreferenced_file_names(
+            [name for pair in Drawing.objects.filter(pk__in=ids).values_list('file', 'thumbnail') for name in pair],
+            exclude_ids=ids,
+        ))
+        file_count += len(names)
+        transaction.on_commit(lambda: delete_files(names))
+
+    def delete_edges(queryset, task_field, model=None):
+        return delete_in_batches(
+            queryset, batch_size, on_batch=log_cross_worksite(worksite_id, queryset, task_field, model)
+        )
+
+    counts = {
+        'annotations': delete_in_batches(
+            TaskAnnotation.objects.filter(task__worksite_id=worksite_id), batch_size
+        ) + delete_edges(TaskAnnotation.objects.filter(drawing__worksite_id=worksite_id), 'task', 'annotation'),
+        'dependencies': delete_edges(
+            TaskDependency.objects.filter(predecessor__worksite_id=worksite_id), 'successor', 'dependency'
+        ) + delete_edges(
+            TaskDependency.objects.filter(successor__worksite_id=worksite_id), 'predecessor', 'dependency'
+        ),
+    }
+    prerequisites = Task.dependencies.through.objects
+    delete_edges(prerequisites.filter(from_task__worksite_id=worksite_id), 'to_task')
+    delete_edges(prerequisites.filter(to_task__worksite_id=worksite_id), 'from_task')
+    delete_in_batches(Task.drawings.through.objects.filter(task__worksite_id=worksite_id), batch_size)
+    delete_edges(Task.drawings.through.objects.filter(drawing__worksite_id=worksite_id), 'task')
+
+    counts['drawings'] = delete_in_batches(
+        Drawing.objects.filter(worksite_id=worksite_id), batch_size, on_batch=collect_files
+    )
+    # 每批只删除没有子任务的任务（叶子），逐层向上，任意层级的子任务都不会违反外键
+    counts['tasks'] = delete_in_batches(tasks.filter(subtasks__isnull=True), batch_size)
+    counts['files'] = file_count
+    return counts
+
+
+def purge_worksite(worksite_id, batch_size=PURGE_BATCH_SIZE):
+    """清除已软删除的工地"""
+    counts = purge_worksite_data(worksite_id, batch_size)
+    counts['worksites'] = WorkSite.all_objects.filter(pk=worksite_id)._raw_delete(DEFAULT_DB_ALIAS)
+    return counts
+
+
+def purge_project(project_id, batch_size=PURGE_BATCH_SIZE):
+    """清除已软删除的项目：逐个工地分批清除，最后删除变更日志与项目本身"""
+    totals = {}
+    for worksite_id in list(WorkSite.all_objects.filter(project_id=project_id).values_list('pk', flat=True)):
+        for key, value in purge_worksite(worksite_id, batch_size).items():
+            totals[key] = totals.get(key, 0) + value
+    delete_in_batches(ChangeLog.objects.filter(project_id=project_id), batch_size * 10)
+    totals['projects'] = Project.all_objects.filter(pk=project_id)._raw_delete(DEFAULT_DB_ALIAS)
+    return totals
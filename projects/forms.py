@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Max, Min
 from django.utils import timezone
 from datetime import date, timedelta
 from .models import Project, WorkSite
@@ -97,6 +98,46 @@ class ProjectForm(forms.ModelForm):
         return cleaned_data
 
 
+class ProjectTemplateForm(forms.Form):
+    """创建项目时可选的模板（复制模板的工地、任务和依赖）"""
+
+    template = forms.ModelChoiceField(
+        queryset=Project.objects.none(),
+        required=False,
+        empty_label='不使用模板（空白项目）',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='项目模板'
+    )
+    include_drawings = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='同时复制图纸'
+    )
+
+    def __init__(self, *args, owner=None, project_form=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['template'].queryset = Project.objects.filter(owner=owner).order_by('name')
+        self.project_form = project_form
+
+    def clean(self):
+        cleaned_data = super().clean()
+        template = cleaned_data.get('template')
+        if template is None or self.project_form is None or not self.project_form.is_valid():
+            return cleaned_data
+
+        # 模板工地按开始日期之差整体平移，平移后须落在新项目的日期范围内
+        span = template.worksites.aggregate(start=Min('start_date'), end=Max('end_date'))
+        if span['start'] is None:
+            return cleaned_data
+        start_date = self.project_form.cleaned_data['start_date']
+        end_date = self.project_form.cleaned_data['end_date']
+        offset = start_date - template.start_date
+        first, last = span['start'] + offset, span['end'] + offset
+        if first < start_date or last > end_date:
+            self.add_error('template', f'按模板平移后工地日期为 {first} 至 {last}，超出了新项目的日期范围')
+        return cleaned_data
+
+
 class WorkSiteForm(forms.ModelForm):
     """工地创建/编辑表单"""
 
@@ -0,0 +1,19 @@
+from jobs.services import register
+from .deletion import purge_project, purge_worksite
+from .models import Project, WorkSite
+
+
+@register('projects.purge_project')
+def purge_deleted_project(project_id):
+    """分批清除已软删除的项目及其全部关联数据、图纸文件"""
+    if not Project.all_objects.filter(pk=project_id, deleted_at__isnull=False).exists():
+        return {'purged': False}
+    return {'purged': True, **purge_project(project_id)}
+
+
+@register('projects.purge_worksite')
+def purge_deleted_worksite(worksite_id):
+    """分批清除已软删除的工地及其全部关联数据、图纸文件"""
+    if not WorkSite.all_objects.filter(pk=worksite_id, deleted_at__isnull=False).exists():
+        return {'purged': False}
+    return {'purged': True, **purge_worksite(worksite_id)}
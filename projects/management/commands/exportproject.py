@@ -0,0 +1,35 @@
+"""
+导出单个项目为NDJSON（.gz 结尾时gzip压缩），流式写出，内存占用与项目规模无关
+
+示例:
+    python manage.py exportproject 12 --output project-12.ndjson.gz
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project
+from projects.transfer import export_project, open_export_file
+
+
+class Command(BaseCommand):
+    help = '导出项目（工地、任务、依赖、图纸引用、标注）为NDJSON文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', type=int, help='项目ID')
+        parser.add_argument('--output', help='输出文件（默认 project-<ID>.ndjson.gz）')
+
+    def handle(self, *args, **options):
+        project = Project.objects.select_related('owner').filter(pk=options['project']).first()
+        if project is None:
+            raise CommandError(f"项目 {options['project']} 不存在")
+
+        output = options['output'] or f'project-{project.pk}.ndjson.gz'
+        started = time.perf_counter()
+        with open_export_file(output, 'w') as stream:
+            counts = export_project(project, stream)
+
+        summary = '，'.join(f'{record_type} {count}' for record_type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'已导出项目"{project.name}"到 {output}（{summary}），耗时 {time.perf_counter() - started:.2f} 秒'
+        ))
@@ -0,0 +1,45 @@
+"""
+从 exportproject 生成的NDJSON文件导入项目（自动识别gzip），按依赖顺序批量插入并重新分配ID
+
+示例:
+    python manage.py importproject project-12.ndjson.gz --owner admin --name "项目副本"
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.transfer import IMPORT_BATCH_SIZE, ProjectImportError, import_project, open_export_file
+
+
+class Command(BaseCommand):
+    help = '从NDJSON导出文件导入项目'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='导出文件路径')
+        parser.add_argument('--owner', required=True, help='导入后项目所有者的用户名')
+        parser.add_argument('--name', help='导入后的项目名称（默认沿用原名称）')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='每批插入的行数')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户 {options['owner']} 不存在")
+
+        started = time.perf_counter()
+        try:
+            with open_export_file(options['path'], 'r') as stream:
+                project, counts, skipped = import_project(
+                    stream, owner, name=options['name'], batch_size=options['batch_size']
+                )
+        except (OSError, ProjectImportError) as e:
+            raise CommandError(f'导入失败: {e}')
+
+        summary = '，'.join(f'{record_type} {count}' for record_type, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'已导入项目"{project.name}"（ID {project.pk}）: {summary}，耗时 {time.perf_counter() - started:.2f} 秒'
+        ))
+        if skipped:
+            self.stderr.write(f'引用缺失而跳过的记录: {skipped}')
@@ -0,0 +1,36 @@
+"""
+清理过期的变更日志（增量同步游标早于保留范围的客户端会收到全量数据）
+
+示例:
+    python manage.py prune_changelog --days 30
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from projects.changelog import current_cursor
+from projects.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = '删除早于保留天数的变更日志'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='保留最近多少天的日志')
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批删除的条数')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # 始终保留最新一条日志，以便判断客户端游标是否早于保留范围
+        latest = current_cursor()
+        expired = ChangeLog.objects.filter(created_at__lt=cutoff, id__lt=latest).order_by('id')
+
+        total = 0
+        while True:
+            batch = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            total += ChangeLog.objects.filter(id__in=batch).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'已删除 {total} 条变更日志'))
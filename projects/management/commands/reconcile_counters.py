@@ -0,0 +1,66 @@
+"""
+重算工地/项目计数缓存字段（修复bulk操作、原生SQL等绕过信号造成的偏差）
+
+示例:
+    python manage.py reconcile_counters --check
+    python manage.py reconcile_counters --project 12 --project 13
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from projects.models import Project, WorkSite, project_counter_expressions, worksite_counter_expressions
+
+
+class Command(BaseCommand):
+    help = '重算工地与项目的任务/图纸/标注计数缓存'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='仅处理指定项目（可重复）')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的项目数')
+        parser.add_argument('--check', action='store_true', help='只报告偏差，不写入')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.order_by('pk')
+        if options['project']:
+            projects = projects.filter(pk__in=options['project'])
+        project_ids = list(projects.values_list('pk', flat=True))
+
+        worksite_drift, project_drift = self.count_drift(project_ids)
+        self.stdout.write(
+            f'检查 {len(project_ids)} 个项目，计数不一致的工地: {worksite_drift}，项目: {project_drift}'
+        )
+        if options['check']:
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(project_ids), batch_size):
+            batch = project_ids[start:start + batch_size]
+            with transaction.atomic():
+                WorkSite.objects.filter(project_id__in=batch).refresh_counters()
+                Project.objects.filter(pk__in=batch).refresh_counters()
+            self.stdout.write(f'已重算 {min(start + batch_size, len(project_ids))}/{len(project_ids)}')
+
+        self.stdout.write(self.style.SUCCESS('计数缓存重算完成'))
+
+    def count_drift(self, project_ids):
+        """统计存储值与实际值不一致的工地数量、与工地汇总不一致的项目数量"""
+        worksite_expected = worksite_counter_expressions(
+            apps.get_model('tasks', 'Task'),
+            apps.get_model('tasks', 'TaskAnnotation'),
+            apps.get_model('drawings', 'Drawing'),
+        )
+        project_expected = project_counter_expressions(WorkSite)
+        return (
+            self._mismatched(WorkSite.objects.filter(project_id__in=project_ids), worksite_expected),
+            self._mismatched(Project.objects.filter(pk__in=project_ids), project_expected),
+        )
+
+    @staticmethod
+    def _mismatched(queryset, expected):
+        queryset = queryset.annotate(**{f'expected_{field}': expression for field, expression in expected.items()})
+        mismatch = Q()
+        for field in expected:
+            mismatch |= ~Q(**{field: F(f'expected_{field}')})
+        return queryset.filter(mismatch).count()
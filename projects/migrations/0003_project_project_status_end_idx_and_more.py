@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_worksite_end_date_worksite_start_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', 'end_date'], name='project_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worksite',
+            index=models.Index(fields=['status', 'end_date'], name='worksite_status_end_idx'),
+        ),
+    ]
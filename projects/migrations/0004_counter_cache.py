@@ -0,0 +1,123 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:25
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    from projects.models import project_counter_expressions, worksite_counter_expressions
+
+    WorkSite = apps.get_model('projects', 'WorkSite')
+    WorkSite.objects.update(**worksite_counter_expressions(
+        apps.get_model('tasks', 'Task'),
+        apps.get_model('tasks', 'TaskAnnotation'),
+        apps.get_model('drawings', 'Drawing'),
+    ))
+    apps.get_model('projects', 'Project').objects.update(**project_counter_expressions(WorkSite))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_project_project_status_end_idx_and_more'),
+        ('tasks', '0004_task_task_status_end_idx'),
+        ('drawings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='annotation_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='标注数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='completed_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已完成任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='drawing_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='图纸数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='in_progress_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='进行中任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='main_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='主任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='open_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='开放任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='pending_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='待处理任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='subtask_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='子任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='任务数'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='worksite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='工地数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='annotation_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='标注数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='completed_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已完成任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='drawing_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='图纸数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='in_progress_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='进行中任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='main_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='主任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='open_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='开放任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='pending_task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='待处理任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='subtask_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='子任务数'),
+        ),
+        migrations.AddField(
+            model_name='worksite',
+            name='task_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='任务数'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_counter_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='data_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='数据版本'),
+        ),
+    ]
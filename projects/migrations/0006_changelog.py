@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_project_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_id', models.PositiveBigIntegerField(verbose_name='项目ID')),
+                ('worksite_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='工地ID')),
+                ('model', models.CharField(choices=[('worksite', '工地'), ('task', '任务'), ('dependency', '任务依赖'), ('drawing', '图纸'), ('annotation', '标注')], max_length=20, verbose_name='数据类型')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='对象ID')),
+                ('action', models.CharField(choices=[('upsert', '新增/更新'), ('delete', '删除')], max_length=10, verbose_name='操作')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='记录时间')),
+            ],
+            options={
+                'verbose_name': '变更日志',
+                'verbose_name_plural': '变更日志',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['project_id', 'id'], name='changelog_project_cursor_idx'), models.Index(fields=['worksite_id', 'id'], name='changelog_worksite_cursor_idx')],
+            },
+        ),
+    ]
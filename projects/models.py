@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -6,8 +7,176 @@ User = get_user_model()
 from django.utils import timezone
 from datetime import date
 
+from core.expressions import DaysBetween, time_progress_expression
+
+
+def _count_subquery(queryset, outer_field):
+    """按 outer_field 关联外层主键统计行数的子查询（无行时为0）"""
+    counts = queryset.filter(**{outer_field: models.OuterRef('pk')}).order_by().values(outer_field).annotate(
+        total=models.Count('pk')
+    ).values('total')
+    return Coalesce(models.Subquery(counts), 0)
+
+
+def _sum_subquery(queryset, outer_field, field):
+    """按 outer_field 关联外层主键求和的子查询（无行时为0）"""
+    sums = queryset.filter(**{outer_field: models.OuterRef('pk')}).order_by().values(outer_field).annotate(
+        total=models.Sum(field)
+    ).values('total')
+    return Coalesce(models.Subquery(sums), 0)
+
+
+# 计数缓存字段（工地与项目共用）
+TASK_COUNTER_FIELDS = {
+    'task_count': {},
+    'open_task_count': {'status': 'open'},
+    'in_progress_task_count': {'status': 'in_progress'},
+    'pending_task_count': {'status': 'pending'},
+    'completed_task_count': {'status': 'completed'},
+    'main_task_count': {'parent_task__isnull': True},
+    'subtask_count': {'parent_task__isnull': False},
+}
+COUNTER_FIELDS = [*TASK_COUNTER_FIELDS, 'drawing_count', 'annotation_count']
+
+
+def worksite_counter_expressions(task_model, annotation_model, drawing_model):
+    """工地计数缓存的UPDATE表达式（模型作为参数传入，迁移中可使用历史模型）"""
+    counters = {
+        field: _count_subquery(task_model.objects.filter(**filters), 'worksite')
+        for field, filters in TASK_COUNTER_FIELDS.items()
+    }
+    counters['drawing_count'] = _count_subquery(drawing_model.objects.all(), 'worksite')
+    counters['annotation_count'] = _count_subquery(annotation_model.objects.all(), 'task__worksite')
+    return counters
+
+
+def project_counter_expressions(worksite_model):
+    """项目计数缓存的UPDATE表达式（汇总工地计数）"""
+    worksites = worksite_model.objects.all()
+    return {
+        'worksite_count': _count_subquery(worksites, 'project'),
+        **{field: _sum_subquery(worksites, 'project', field) for field in COUNTER_FIELDS},
+    }
+
+
+class ProjectQuerySet(models.QuerySet):
+    """项目查询集 - 进度/逾期计算下推到数据库"""
+
+    def with_progress(self, today=None):
+        """注解 progress（与 Project.progress_percentage 相同规则）"""
+        today = today or date.today()
+        return self.annotate(progress=time_progress_expression(
+            today,
+            DaysBetween(models.F('end_date'), models.F('start_date')),
+            [
+                models.When(status='completed', then=models.Value(100)),
+                models.When(status__in=['cancelled', 'suspended'], then=models.Value(0)),
+            ],
+        ))
+
+    def overdue(self, today=None):
+        """已过期项目（与 Project.is_overdue 相同规则）"""
+        today = today or date.today()
+        return self.filter(end_date__lt=today).exclude(status__in=['completed', 'cancelled'])
+
+    def with_lateness(self, today=None):
+        """注解 days_overdue：超过结束日期的天数（未过期为负数）"""
+        today = today or date.today()
+        return self.annotate(days_overdue=DaysBetween(
+            models.Value(today, output_field=models.DateField()), models.F('end_date')
+        ))
+
+    def refresh_counters(self):
+        """用一条UPDATE从工地计数汇总重算项目计数缓存（需先刷新工地计数），同时递增数据版本"""
+        return self.update(data_version=models.F('data_version') + 1, **project_counter_expressions(WorkSite))
+
+    def touch(self):
+        """递增数据版本，使按版本缓存的统计/页面片段失效"""
+        return self.update(data_version=models.F('data_version') + 1)
+
+
+class ProjectManager(models.Manager.from_queryset(ProjectQuerySet)):
+    """默认管理器：排除已软删除（等待后台清除）的项目"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class WorkSiteQuerySet(models.QuerySet):
+    """工地查询集"""
+
+    def with_progress(self, today=None):
+        """注解 progress（与 WorkSite.progress_percentage 相同规则）"""
+        today = today or date.today()
+        return self.annotate(progress=time_progress_expression(
+            today,
+            DaysBetween(models.F('end_date'), models.F('start_date')) + models.Value(1),
+            [
+                models.When(status='completed', then=models.Value(100)),
+                models.When(status='suspended', then=models.Value(0)),
+            ],
+        ))
+
+    def refresh_counters(self):
+        """用一条UPDATE（相关子查询）重算工地计数缓存"""
+        from django.apps import apps
+        return self.update(**worksite_counter_expressions(
+            apps.get_model('tasks', 'Task'),
+            apps.get_model('tasks', 'TaskAnnotation'),
+            apps.get_model('drawings', 'Drawing'),
+        ))
+
+
+class WorkSiteManager(models.Manager.from_queryset(WorkSiteQuerySet)):
+    """默认管理器：排除已软删除的工地（项目软删除时其工地一并标记）"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class CounterCacheMixin(models.Model):
+    """任务/图纸/标注计数缓存字段，由 projects.signals 在写入时维护"""
+
+    task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='任务数')
+    open_task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='开放任务数')
+    in_progress_task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='进行中任务数')
+    pending_task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='待处理任务数')
+    completed_task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='已完成任务数')
+    main_task_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='主任务数')
+    subtask_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='子任务数')
+    drawing_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='图纸数')
+    annotation_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='标注数')
+
+    # 由信号以UPDATE维护的字段，常规save()不写回，避免用过期的内存值覆盖
+    counter_cache_fields = COUNTER_FIELDS
 
-class Project(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_cache_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def counter_stats(self):
+        """以视图 stats 字典的键名返回计数缓存"""
+        return {
+            'total_drawings': self.drawing_count,
+            'total_tasks': self.task_count,
+            'main_tasks': self.main_task_count,
+            'subtasks': self.subtask_count,
+            'open_tasks': self.open_task_count,
+            'completed_tasks': self.completed_task_count,
+            'pending_tasks': self.pending_task_count,
+            'in_progress_tasks': self.in_progress_task_count,
+            'total_annotations': self.annotation_count,
+        }
+
+
+class Project(CounterCacheMixin, models.Model):
     """项目模型 - 顶级容器"""
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='项目所有者', related_name='owned_projects')
@@ -31,14 +200,31 @@ class Project(models.Model):
         verbose_name='项目状态'
     )
 
+    # 工地数量（计数缓存）
+    worksite_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='工地数')
+
+    # 数据版本：项目及其工地/任务/图纸/标注/依赖任一变更时递增，用作缓存键
+    data_version = models.PositiveBigIntegerField(default=0, editable=False, verbose_name='数据版本')
+
+    # 软删除时间：非空时项目已从界面隐藏，由后台任务分批清除
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='删除时间')
+
     # 时间戳
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
+    objects = ProjectManager()
+    all_objects = ProjectQuerySet.as_manager()
+
+    counter_cache_fields = [*COUNTER_FIELDS, 'worksite_count', 'data_version']
+
     class Meta:
         verbose_name = '项目'
         verbose_name_plural = '项目'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'end_date'], name='project_status_end_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -46,6 +232,11 @@ class Project(models.Model):
     def get_absolute_url(self):
         return reverse('projects:project_detail', kwargs={'pk': self.pk})
 
+    def counter_stats(self):
+        stats = super().counter_stats()
+        stats['total_worksites'] = self.worksite_count
+        return stats
+
     @property
     def is_active(self):
         """项目是否进行中"""
@@ -77,7 +268,8 @@ class Project(models.Model):
         else:
             total_days = self.duration_days
             elapsed_days = (today - self.start_date).days
-            return min(100, int((elapsed_days / total_days) * 100)) if total_days > 0 else 0
+            # 整数除法，与 with_progress() 的数据库计算结果一致
+            return min(100, elapsed_days * 100 // total_days) if total_days > 0 else 0
 
     def clean(self):
         """数据验证"""
@@ -92,7 +284,7 @@ class Project(models.Model):
         super().save(*args, **kwargs)
 
 
-class WorkSite(models.Model):
+class WorkSite(CounterCacheMixin, models.Model):
     """工地模型 - 项目下的具体工地"""
 
     project = models.ForeignKey(Project, on_delete=models.CASCADE, verbose_name='所属项目', related_name='worksites')
@@ -120,14 +312,23 @@ class WorkSite(models.Model):
         verbose_name='工地状态'
     )
 
+    # 软删除时间：非空时工地已从界面隐藏，由后台任务分批清除
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='删除时间')
+
     # 时间戳
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
+    objects = WorkSiteManager()
+    all_objects = WorkSiteQuerySet.as_manager()
+
     class Meta:
         verbose_name = '工地'
         verbose_name_plural = '工地'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'end_date'], name='worksite_status_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.project.name} - {self.name}"
@@ -158,7 +359,8 @@ class WorkSite(models.Model):
         else:
             total_days = self.duration_days
             elapsed_days = (today - self.start_date).days
-            return min(100, int((elapsed_days / total_days) * 100)) if total_days > 0 else 0
+            # 整数除法，与 with_progress() 的数据库计算结果一致
+            return min(100, elapsed_days * 100 // total_days) if total_days > 0 else 0
 
     def clean(self):
         """数据验证"""
@@ -178,3 +380,43 @@ class WorkSite(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+
+
+class ChangeLog(models.Model):
+    """
+    数据变更日志：自增主键即增量同步游标，删除记录即墓碑。
+    项目删除时其日志一并清除，因此项目/工地只保存ID，不使用外键。
+    """
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+    ACTION_CHOICES = [
+        (ACTION_UPSERT, '新增/更新'),
+        (ACTION_DELETE, '删除'),
+    ]
+
+    MODEL_CHOICES = [
+        ('worksite', '工地'),
+        ('task', '任务'),
+        ('dependency', '任务依赖'),
+        ('drawing', '图纸'),
+        ('annotation', '标注'),
+    ]
+
+    project_id = models.PositiveBigIntegerField(verbose_name='项目ID')
+    worksite_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='工地ID')
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='数据类型')
+    object_id = models.PositiveBigIntegerField(verbose_name='对象ID')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name='操作')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='记录时间')
+
+    class Meta:
+        verbose_name = '变更日志'
+        verbose_name_plural = '变更日志'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['project_id', 'id'], name='changelog_project_cursor_idx'),
+            models.Index(fields=['worksite_id', 'id'], name='changelog_worksite_cursor_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model}:{self.object_id} {self.action}"
@@ -0,0 +1,34 @@
+"""
+统计服务：用户汇总统计由其项目行上的计数缓存求和得到（一条聚合查询）。
+项目/工地页面直接读取各自行上的计数缓存（Project.counter_stats / WorkSite.counter_stats）
+"""
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Project
+
+# 用户汇总统计的键名 -> 项目计数缓存字段
+USER_STAT_FIELDS = {
+    'total_tasks': 'task_count',
+    'main_tasks': 'main_task_count',
+    'subtasks': 'subtask_count',
+    'open_tasks': 'open_task_count',
+    'in_progress_tasks': 'in_progress_task_count',
+    'pending_tasks': 'pending_task_count',
+    'completed_tasks': 'completed_task_count',
+    'total_drawings': 'drawing_count',
+}
+
+
+def get_project_version(**filters):
+    """按条件查找项目数据版本（单列查询，供条件请求校验），不存在时返回None"""
+    return Project.objects.filter(**filters).values_list('data_version', flat=True).first()
+
+
+def get_user_stats(user):
+    """用户所有（未删除）项目的汇总统计：对项目计数缓存求和（一条查询，无需缓存）"""
+    return Project.objects.filter(owner=user).aggregate(
+        total_projects=Count('pk'),
+        active_projects=Count('pk', filter=Q(status='active')),
+        **{key: Coalesce(Sum(field), 0) for key, field in USER_STAT_FIELDS.items()},
+    )
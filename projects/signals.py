@@ -0,0 +1,267 @@
+"""
+计数缓存、数据版本与变更日志维护：
+任务、图纸、标注、依赖、工地、项目写入后刷新所属工地/项目的计数字段、递增项目数据版本，
+并记录变更日志（删除记录为增量同步的墓碑，同时推送实时事件）
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from drawings.models import Drawing
+from tasks.models import Task, TaskAnnotation, TaskDependency
+from .changelog import record_change
+from .models import ChangeLog, Project, WorkSite
+
+UPSERT = ChangeLog.ACTION_UPSERT
+DELETE = ChangeLog.ACTION_DELETE
+
+
+def refresh_worksite_counters(*worksite_ids):
+    """刷新工地计数，并由工地汇总刷新项目计数和数据版本（两条UPDATE）"""
+    WorkSite.objects.filter(pk__in=worksite_ids).refresh_counters()
+    Project.objects.filter(
+        pk__in=WorkSite.objects.filter(pk__in=worksite_ids).values('project_id')
+    ).refresh_counters()
+
+
+def touch_worksite_project(worksite_id):
+    """仅递增工地所属项目的数据版本（计数不变的写入）"""
+    Project.objects.filter(
+        pk__in=WorkSite.objects.filter(pk=worksite_id).values('project_id')
+    ).touch()
+
+
+def touch_task_project(task_id):
+    """递增任务所属项目的数据版本"""
+    Project.objects.filter(
+        pk__in=Task.objects.filter(pk=task_id).values('worksite__project_id')
+    ).touch()
+
+
+def _is_cascade(instance, origin):
+    """
+    级联删除时由发起删除的对象统一刷新，避免逐行刷新。
+    查询集删除（QuerySet.delete()）时其他模型的行属于级联，同模型的行由 _first_refresh 去重
+    """
+    if origin is None or origin is instance:
+        return False
+    if isinstance(origin, QuerySet):
+        return not isinstance(instance, origin.model)
+    return hasattr(origin, '_meta')
+
+
+def _first_refresh(origin, key):
+    """
+    查询集删除时每个工地/项目只刷新一次：该模型的行全部删除后才逐行发送 post_delete，
+    第一次刷新已是最终结果。单个对象删除总是刷新
+    """
+    if not isinstance(origin, QuerySet):
+        return True
+    refreshed = origin.__dict__.setdefault('_refreshed_counters', set())
+    if key in refreshed:
+        return False
+    refreshed.add(key)
+    return True
+
+
+@receiver(pre_delete, sender=Task)
+@receiver(pre_delete, sender=Drawing)
+@receiver(pre_delete, sender=TaskAnnotation)
+@receiver(pre_delete, sender=WorkSite)
+def reset_refreshed_counters(sender, instance, origin=None, **kwargs):
+    """同一查询集再次 delete() 时重新刷新（pre_delete 全部在删除前发送）"""
+    if isinstance(origin, QuerySet):
+        origin.__dict__.pop('_refreshed_counters', None)
+
+
+def _remember_worksite(sender, instance, field, lookup, raw, update_fields):
+    """更新前记下库中的所属工地，保存后据此判断对象是否移到了其他工地"""
+    instance._previous_worksite_id = None
+    if raw or instance._state.adding or (update_fields is not None and field not in update_fields):
+        return
+    instance._previous_worksite_id = sender._base_manager.filter(pk=instance.pk).values_list(
+        lookup, flat=True
+    ).first()
+
+
+def _affected_worksites(instance, worksite_id):
+    """保存后需要刷新的工地：当前工地，对象移动时再加上原工地"""
+    previous = getattr(instance, '_previous_worksite_id', None)
+    return [worksite_id, previous] if previous and previous != worksite_id else [worksite_id]
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Drawing)
+def remember_worksite(sender, instance, raw=False, update_fields=None, **kwargs):
+    _remember_worksite(sender, instance, 'worksite', 'worksite_id', raw, update_fields)
+
+
+@receiver(pre_save, sender=TaskAnnotation)
+def remember_annotation_worksite(sender, instance, raw=False, update_fields=None, **kwargs):
+    _remember_worksite(sender, instance, 'task', 'task__worksite_id', raw, update_fields)
+
+
+def _deleting_project(origin):
+    """删除由项目发起（项目实例或项目查询集）时，子对象不再记录墓碑"""
+    return isinstance(origin, Project) or getattr(origin, 'model', None) is Project
+
+
+def _origin_project_id(origin):
+    """工地级联删除时直接取工地所属项目，避免逐行查找"""
+    return origin.project_id if isinstance(origin, WorkSite) else None
+
+
+def task_event_data(task):
+    """实时事件中携带的任务字段（状态与日期）"""
+    return {
+        'name': task.name,
+        'status': task.status,
+        'start_date': task.start_date,
+        'end_date': task.end_date,
+        'deadline': task.deadline,
+        'parent_task_id': task.parent_task_id,
+    }
+
+
+def annotation_event_data(annotation):
+    """实时事件中携带的标注字段"""
+    return {
+        'task_id': annotation.task_id,
+        'drawing_id': annotation.drawing_id,
+        'annotation_type': annotation.annotation_type,
+        'content': annotation.content,
+    }
+
+
+def record_task_change(model, object_id, action, task_id, data=None):
+    """按任务所属工地记录依赖/标注的变更"""
+    worksite_id = Task.objects.filter(pk=task_id).values_list('worksite_id', flat=True).first()
+    if worksite_id:
+        record_change(model, object_id, action, worksite_id=worksite_id, data=data)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_worksite_counters(*_affected_worksites(instance, instance.worksite_id))
+        record_change('task', instance.pk, UPSERT, worksite_id=instance.worksite_id, data=task_event_data(instance))
+        if instance.parent_task_id:
+            # 父任务的子任务统计随之变化
+            record_change('task', instance.parent_task_id, UPSERT, worksite_id=instance.worksite_id)
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_cascade(instance, origin):
+        if _first_refresh(origin, instance.worksite_id):
+            refresh_worksite_counters(instance.worksite_id)
+        if instance.parent_task_id:
+            record_change('task', instance.parent_task_id, UPSERT, worksite_id=instance.worksite_id)
+    if not _deleting_project(origin):
+        record_change(
+            'task', instance.pk, DELETE, worksite_id=instance.worksite_id, project_id=_origin_project_id(origin)
+        )
+
+
+@receiver(post_save, sender=Drawing)
+def drawing_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    worksite_ids = _affected_worksites(instance, instance.worksite_id)
+    if created or len(worksite_ids) > 1:
+        refresh_worksite_counters(*worksite_ids)
+    else:
+        touch_worksite_project(instance.worksite_id)
+    record_change('drawing', instance.pk, UPSERT, worksite_id=instance.worksite_id)
+
+
+@receiver(post_delete, sender=Drawing)
+def drawing_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_cascade(instance, origin) and _first_refresh(origin, instance.worksite_id):
+        refresh_worksite_counters(instance.worksite_id)
+    if not _deleting_project(origin):
+        record_change(
+            'drawing', instance.pk, DELETE, worksite_id=instance.worksite_id, project_id=_origin_project_id(origin)
+        )
+
+
+@receiver(post_save, sender=TaskAnnotation)
+def annotation_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    worksite_ids = _affected_worksites(instance, instance.task.worksite_id)
+    if created or len(worksite_ids) > 1:
+        refresh_worksite_counters(*worksite_ids)
+    else:
+        touch_task_project(instance.task_id)
+    record_change(
+        'annotation', instance.pk, UPSERT, worksite_id=instance.task.worksite_id,
+        data=annotation_event_data(instance)
+    )
+
+
+@receiver(post_delete, sender=TaskAnnotation)
+def annotation_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_cascade(instance, origin) and _first_refresh(origin, ('task', instance.task_id)):
+        worksite_id = Task.objects.filter(pk=instance.task_id).values_list('worksite_id', flat=True).first()
+        if worksite_id and _first_refresh(origin, worksite_id):
+            refresh_worksite_counters(worksite_id)
+    if not _deleting_project(origin):
+        record_task_change('annotation', instance.pk, DELETE, instance.task_id, data={'task_id': instance.task_id})
+
+
+@receiver(post_save, sender=TaskDependency)
+@receiver(post_delete, sender=TaskDependency)
+def dependency_changed(sender, instance, raw=False, origin=None, signal=None, **kwargs):
+    if raw:
+        return
+    if not _is_cascade(instance, origin):
+        touch_task_project(instance.successor_id)
+    if signal is post_save:
+        record_task_change('dependency', instance.pk, UPSERT, instance.successor_id)
+    elif not _deleting_project(origin):
+        record_task_change('dependency', instance.pk, DELETE, instance.successor_id)
+
+
+@receiver(m2m_changed, sender=Task.dependencies.through)
+@receiver(m2m_changed, sender=Task.drawings.through)
+def task_relations_changed(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Task):
+        touch_task_project(instance.pk)
+        record_change('task', instance.pk, UPSERT, worksite_id=instance.worksite_id)
+    elif isinstance(instance, Drawing):
+        touch_worksite_project(instance.worksite_id)
+        for task_id, worksite_id in Task.objects.filter(pk__in=kwargs.get('pk_set') or []).values_list('pk', 'worksite_id'):
+            record_change('task', task_id, UPSERT, worksite_id=worksite_id)
+
+
+@receiver(post_save, sender=WorkSite)
+def worksite_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        Project.objects.filter(pk=instance.project_id).refresh_counters()
+    else:
+        Project.objects.filter(pk=instance.project_id).touch()
+    record_change('worksite', instance.pk, UPSERT, worksite_id=instance.pk, project_id=instance.project_id)
+
+
+@receiver(post_delete, sender=WorkSite)
+def worksite_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_cascade(instance, origin) and _first_refresh(origin, ('project', instance.project_id)):
+        Project.objects.filter(pk=instance.project_id).refresh_counters()
+    if not _deleting_project(origin):
+        record_change('worksite', instance.pk, DELETE, worksite_id=instance.pk, project_id=instance.project_id)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        Project.objects.filter(pk=instance.pk).touch()
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    ChangeLog.objects.filter(project_id=instance.pk).delete()
@@ -0,0 +1,545 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import create_owned_project, create_project_fixture
+from drawings.models import Drawing
+from tasks.models import Task, TaskAnnotation, TaskDependency
+from .changelog import CHANGELOG_SETTLE_SECONDS, changes_since
+from .deletion import purge_project, purge_worksite
+from .models import ChangeLog, Project, WorkSite
+from .services import get_user_stats
+from .transfer import ProjectImportError, export_project, import_project
+
+
+class ProjectEventStreamTest(TestCase):
+    """项目实时事件流：提交后的任务变更推送到订阅者"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, worksite = create_project_fixture()
+        today = date.today()
+        cls.task = Task.objects.create(
+            worksite=worksite, name='任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+
+    def setUp(self):
+        self.url = reverse('projects:project_events', kwargs={'pk': self.project.pk})
+
+    def complete_task(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = 'completed'
+            self.task.save()
+
+    async def test_task_change_is_pushed(self):
+        await sync_to_async(self.async_client.force_login)(self.owner)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            ready = await anext(stream)
+            self.assertIn(b'event: ready', ready)
+
+            await sync_to_async(self.complete_task)()
+            frame = await asyncio.wait_for(anext(stream), 1)
+            self.assertIn(b'event: change', frame)
+            self.assertIn(f'"id":{self.task.pk}'.encode(), frame)
+            self.assertIn(b'"status":"completed"', frame)
+        finally:
+            await stream.aclose()
+
+    async def test_other_users_project_is_hidden(self):
+        other = await sync_to_async(get_user_model().objects.create_user)('other', password='pass')
+        await sync_to_async(self.async_client.force_login)(other)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_asgi(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+
+class SoftDeleteTest(TestCase):
+    """删除项目/工地：立即隐藏，后台分批清除数据与图纸文件"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project = create_owned_project()
+        today = date.today()
+        cls.worksites = [
+            WorkSite.objects.create(
+                project=cls.project, name=f'工地{i}', start_date=today, end_date=today + timedelta(days=30)
+            )
+            for i in range(2)
+        ]
+        cls.tasks = []
+        for worksite in cls.worksites:
+            parent = None
+            # 三层任务：purge 需按叶子到根的顺序删除
+            for depth in range(3):
+                parent = Task.objects.create(
+                    worksite=worksite, parent_task=parent, name=f'{worksite.name}任务{depth}',
+                    responsible_person='张三', start_date=today, end_date=today + timedelta(days=5)
+                )
+                cls.tasks.append(parent)
+        # 跨工地依赖
+        TaskDependency.objects.create(predecessor=cls.tasks[0], successor=cls.tasks[3])
+        cls.tasks[3].dependencies.add(cls.tasks[0])
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.drawing = Drawing(worksite=self.worksites[0], name='平面图', file_size=4)
+        self.drawing.file.save('plan.pdf', ContentFile(b'%PDF'), save=False)
+        self.drawing.save()
+        self.drawing.tasks.add(self.tasks[0])
+        TaskAnnotation.objects.create(
+            task=self.tasks[0], drawing=self.drawing, annotation_type='point', x_coordinate=1, y_coordinate=1
+        )
+        self.file_path = self.drawing.file.path
+
+    def test_project_delete_hides_then_purges(self):
+        self.client.post(reverse('projects:project_delete', kwargs={'pk': self.project.pk}))
+
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(WorkSite.objects.filter(project_id=self.project.pk).exists())
+        self.assertFalse(Task.objects.live().exists())
+        self.assertEqual(get_user_stats(self.owner)['total_projects'], 0)
+        self.assertEqual(get_user_stats(self.owner)['total_tasks'], 0)
+        self.assertEqual(self.client.get(reverse('tasks:task_list')).context['tasks'].count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = purge_project(self.project.pk, batch_size=2)
+
+        self.assertEqual(counts['tasks'], 6)
+        self.assertEqual(counts['files'], 1)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(ChangeLog.objects.filter(project_id=self.project.pk).exists())
+        for model in (Task, TaskAnnotation, TaskDependency, Drawing, Task.dependencies.through):
+            self.assertFalse(model.objects.exists(), model)
+
+    def test_worksite_delete_hides_then_purges(self):
+        deleted, kept = self.worksites
+        self.client.post(reverse('projects:worksite_delete', kwargs={'pk': deleted.pk}))
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.worksite_count, 1)
+        self.assertEqual(self.project.task_count, 3)
+        self.assertTrue(ChangeLog.objects.filter(model='worksite', object_id=deleted.pk, action='delete').exists())
+        gantt = self.client.get(reverse('gantt:gantt_data_api', kwargs={'project_id': self.project.pk})).json()
+        self.assertEqual(len(gantt['tasks']), 3)
+        self.assertEqual(gantt['dependencies'], [])
+
+        dependency_id = TaskDependency.objects.get().pk
+        logged = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first()
+        self.project.refresh_from_db()
+        version = self.project.data_version
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_worksite(deleted.pk, batch_size=2)
+
+        # 另一端在保留工地中的依赖与前置任务关联：补记墓碑/任务更新并递增项目版本
+        purge_log = ChangeLog.objects.filter(id__gt=logged)
+        self.assertEqual(
+            list(purge_log.filter(model='dependency').values_list('object_id', 'action', 'worksite_id')),
+            [(dependency_id, ChangeLog.ACTION_DELETE, kept.pk)],
+        )
+        self.assertEqual(
+            list(purge_log.filter(model='task').values_list('object_id', 'action', 'worksite_id')),
+            [(self.tasks[3].pk, ChangeLog.ACTION_UPSERT, kept.pk)],
+        )
+        self.project.refresh_from_db()
+        self.assertGreater(self.project.data_version, version)
+        self.assertFalse(WorkSite.all_objects.filter(pk=deleted.pk).exists())
+        self.assertEqual(Task.objects.filter(worksite=kept).count(), 3)
+        self.assertFalse(TaskDependency.objects.exists())
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+class ProjectTabTest(TestCase):
+    """项目主页标签页片段：按规范化后的页码缓存"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, worksite = create_project_fixture()
+        today = date.today()
+        for i in range(3):
+            Task.objects.create(
+                worksite=worksite, name=f'任务{i}', responsible_person='张三',
+                start_date=today, end_date=today + timedelta(days=5)
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        self.project.refresh_from_db()
+        self.url = reverse('projects:project_tab', kwargs={'pk': self.project.pk, 'tab': 'tasks'})
+
+    @mock.patch.dict('projects.views.PROJECT_TAB_PAGE_SIZES', {'tasks': 2})
+    def test_cache_key_uses_page_number(self):
+        prefix = f'fragment:project:{self.project.pk}:v{self.project.data_version}:tasks'
+        last_page = self.client.get(self.url, {'page': 99}).content
+        self.assertIsNotNone(cache.get(f'{prefix}:2'))
+        self.assertIsNone(cache.get(f'{prefix}:99'))
+        self.assertEqual(self.client.get(self.url, {'page': 2}).content, last_page)
+
+        first_page = self.client.get(self.url, {'page': 'abc'}).content
+        self.assertIsNotNone(cache.get(f'{prefix}:1'))
+        self.assertEqual(self.client.get(self.url).content, first_page)
+        self.assertNotEqual(first_page, last_page)
+
+
+class ChangeLogCursorTest(TestCase):
+    """增量拉取的游标不越过未读到的（可能尚未提交的）日志"""
+
+    def log(self, project_id, object_id, age_seconds=0, **fields):
+        entry = ChangeLog.objects.create(
+            project_id=project_id, model='task', object_id=object_id, action=ChangeLog.ACTION_UPSERT, **fields
+        )
+        if age_seconds:
+            ChangeLog.objects.filter(pk=entry.pk).update(created_at=timezone.now() - timedelta(seconds=age_seconds))
+        return entry.pk
+
+    def test_cursor_stops_at_settled_entries(self):
+        old = CHANGELOG_SETTLE_SECONDS + 60
+        settled = self.log(1, 10, age_seconds=old)
+        self.log(2, 20, age_seconds=old)
+        fresh = self.log(1, 11)
+        cursor, has_more, changes = changes_since(0, project_id=1)
+        self.assertEqual(cursor, settled + 1)
+        self.assertFalse(has_more)
+        self.assertEqual(changes['task'][ChangeLog.ACTION_UPSERT], {10, 11})
+
+        # 未确定提交的日志下次拉取时再次返回
+        cursor, _, changes = changes_since(cursor, project_id=1)
+        self.assertEqual(cursor, settled + 1)
+        self.assertEqual(changes['task'][ChangeLog.ACTION_UPSERT], {11})
+
+        ChangeLog.objects.filter(pk=fresh).update(created_at=timezone.now() - timedelta(seconds=old))
+        self.assertEqual(changes_since(cursor, project_id=1)[0], fresh)
+
+    def test_entry_committed_later_with_lower_id_is_not_skipped(self):
+        self.log(1, 10, id=100)
+        cursor, _, changes = changes_since(0, project_id=1)
+        self.assertEqual(cursor, 0)
+        # 更早分配ID的事务在读取之后才提交
+        self.log(1, 11, id=50)
+        cursor, _, changes = changes_since(cursor, project_id=1)
+        self.assertEqual(changes['task'][ChangeLog.ACTION_UPSERT], {10, 11})
+
+    def test_paging_through_unsettled_entries_does_not_spin(self):
+        settled = self.log(1, 10, age_seconds=CHANGELOG_SETTLE_SECONDS + 60)
+        self.log(1, 11)
+        self.log(1, 12)
+        self.assertEqual(changes_since(0, project_id=1, limit=2)[:2], (settled, True))
+        cursor, has_more, changes = changes_since(settled, project_id=1, limit=1)
+        self.assertEqual((cursor, has_more), (settled, False))
+        self.assertEqual(changes['task'][ChangeLog.ACTION_UPSERT], {11})
+
+    def test_quiet_pull_advances_to_settled_entries_only(self):
+        settled = self.log(2, 20, age_seconds=CHANGELOG_SETTLE_SECONDS + 60)
+        self.log(2, 21)
+        cursor, _, changes = changes_since(0, project_id=1)
+        self.assertEqual(cursor, settled)
+        self.assertEqual(changes, {})
+
+
+class ProjectTransferTest(TestCase):
+    """项目NDJSON导出/导入往返"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, worksite = create_project_fixture()
+        cls.other = get_user_model().objects.create_user('other', password='pass')
+        today = date.today()
+
+        def task(name, parent=None):
+            return Task.objects.create(
+                worksite=worksite, parent_task=parent, name=name, responsible_person='张三',
+                start_date=today, end_date=today + timedelta(days=5)
+            )
+
+        # 子任务先于父任务创建（主键更小），导入时需等父任务插入后补插
+        child = task('子任务')
+        parent = task('主任务')
+        Task.objects.filter(pk=child.pk).update(parent_task=parent)
+        grandchild = task('孙任务', child)
+        drawing = Drawing.objects.create(
+            worksite=worksite, name='平面图', file='drawings/plan.pdf', file_size=4
+        )
+        Drawing.objects.filter(pk=drawing.pk).update(file_hash='a' * 64)
+        parent.drawings.add(drawing)
+        grandchild.dependencies.add(parent)
+        TaskDependency.objects.create(predecessor=parent, successor=grandchild, dependency_type='start_to_start', lag_days=2)
+        TaskAnnotation.objects.create(
+            task=parent, drawing=drawing, annotation_type='point', x_coordinate=1, y_coordinate=2, content='裂缝'
+        )
+
+    def export(self):
+        stream = io.StringIO()
+        export_project(self.project, stream)
+        stream.seek(0)
+        return stream
+
+    def test_round_trip(self):
+        project, counts, skipped = import_project(self.export(), self.other, name='副本', batch_size=2)
+
+        self.assertEqual(skipped, {})
+        self.assertEqual((project.owner, project.name, project.task_count, project.annotation_count),
+                         (self.other, '副本', 3, 1))
+        tasks = Task.objects.filter(worksite__project=project)
+        self.assertEqual(
+            set(tasks.values_list('name', 'parent_task__name')),
+            {('主任务', None), ('子任务', '主任务'), ('孙任务', '子任务')},
+        )
+        dependency = TaskDependency.objects.get(successor__in=tasks)
+        self.assertEqual((dependency.predecessor.name, dependency.dependency_type, dependency.lag_days),
+                         ('主任务', 'start_to_start', 2))
+        self.assertEqual(list(tasks.get(name='孙任务').dependencies.values_list('name', flat=True)), ['主任务'])
+        drawing = Drawing.objects.get(worksite__project=project)
+        self.assertEqual((drawing.file.name, drawing.file_hash), ('drawings/plan.pdf', 'a' * 64))
+        self.assertEqual(list(tasks.get(name='主任务').drawings.all()), [drawing])
+        self.assertEqual(TaskAnnotation.objects.get(task__in=tasks).drawing, drawing)
+
+    def test_truncated_file_is_rolled_back(self):
+        lines = self.export().getvalue().splitlines(keepends=True)
+        with self.assertRaises(ProjectImportError):
+            import_project(io.StringIO(''.join(lines[:-1])), self.other)
+        self.assertFalse(Project.objects.filter(owner=self.other).exists())
+
+
+class ProjectTemplateTest(TestCase):
+    """以现有项目为模板创建项目：批量复制并平移日期"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user('owner', password='pass')
+        cls.start = date(2025, 3, 1)
+        cls.template = Project.objects.create(
+            owner=cls.owner, name='模板', start_date=cls.start, end_date=cls.start + timedelta(days=60)
+        )
+        worksite = WorkSite.objects.create(
+            project=cls.template, name='工地', start_date=cls.start, end_date=cls.start + timedelta(days=30),
+            status='active'
+        )
+
+        def task(name, parent=None, offset=0):
+            return Task.objects.create(
+                worksite=worksite, parent_task=parent, name=name, responsible_person='张三', status='completed',
+                start_date=cls.start + timedelta(days=offset), end_date=cls.start + timedelta(days=10)
+            )
+
+        parent = task('主任务')
+        child = task('子任务', parent, offset=2)
+        task('孙任务', child, offset=3)
+        TaskDependency.objects.create(predecessor=parent, successor=child, dependency_type='start_to_start', lag_days=2)
+        child.dependencies.add(parent)
+        cls.drawing = Drawing.objects.create(worksite=worksite, name='平面图', file='drawings/plan.pdf', file_size=4)
+        parent.drawings.add(cls.drawing)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def create(self, **data):
+        return self.client.post(reverse('projects:project_create'), {
+            'name': '新项目', 'description': '', 'status': 'planning', 'template': self.template.pk,
+            'start_date': '2025-04-01', 'end_date': '2025-06-30', **data,
+        })
+
+    def test_clone_shifts_dates_and_remaps_tree(self):
+        self.create()
+        project = Project.objects.get(name='新项目')
+        tasks = Task.objects.filter(worksite__project=project)
+
+        self.assertEqual((project.worksite_count, project.task_count, project.open_task_count), (1, 3, 3))
+        self.assertEqual(project.worksites.get().start_date, date(2025, 4, 1))
+        self.assertEqual(project.worksites.get().status, 'preparing')
+        self.assertEqual(
+            set(tasks.values_list('name', 'parent_task__name', 'start_date')),
+            {('主任务', None, date(2025, 4, 1)), ('子任务', '主任务', date(2025, 4, 3)),
+             ('孙任务', '子任务', date(2025, 4, 4))},
+        )
+        dependency = TaskDependency.objects.get(successor__in=tasks)
+        self.assertEqual((dependency.predecessor.name, dependency.dependency_type, dependency.lag_days),
+                         ('主任务', 'start_to_start', 2))
+        self.assertEqual(list(tasks.get(name='子任务').dependencies.values_list('name', flat=True)), ['主任务'])
+        self.assertFalse(Drawing.objects.filter(worksite__project=project).exists())
+
+    def test_project_must_span_shifted_worksites(self):
+        response = self.create(end_date='2025-04-20')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('2025-04-01 至 2025-05-01', response.context['template_form'].errors['template'][0])
+        self.assertFalse(Project.objects.filter(name='新项目').exists())
+
+    def test_cloned_drawings_share_files(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        os.makedirs(os.path.join(media_root, 'drawings'))
+        path = os.path.join(media_root, 'drawings', 'plan.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF')
+
+        with override_settings(MEDIA_ROOT=media_root):
+            self.create(include_drawings='on')
+            project = Project.objects.get(name='新项目')
+            drawing = Drawing.objects.get(worksite__project=project)
+            self.assertEqual(drawing.file.name, 'drawings/plan.pdf')
+            self.assertEqual(list(Task.objects.get(worksite__project=project, name='主任务').drawings.all()), [drawing])
+
+            # 模板仍引用该文件，删除副本的图纸时保留文件
+            drawing.delete()
+            self.assertTrue(os.path.exists(path))
+            self.drawing.delete()
+            self.assertFalse(os.path.exists(path))
+
+
+class CounterCacheTest(TestCase):
+    """计数缓存：对象移动工地与查询集删除"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project = create_owned_project()
+        today = date.today()
+        cls.source, cls.target = [
+            WorkSite.objects.create(
+                project=cls.project, name=f'工地{i}', start_date=today, end_date=today + timedelta(days=30)
+            )
+            for i in range(2)
+        ]
+        cls.tasks = [
+            Task.objects.create(
+                worksite=cls.source, name=f'任务{i}', responsible_person='张三',
+                start_date=today, end_date=today + timedelta(days=5)
+            )
+            for i in range(4)
+        ]
+        cls.other_task = Task.objects.create(
+            worksite=cls.target, name='另一工地任务', responsible_person='李四',
+            start_date=today, end_date=today + timedelta(days=5)
+        )
+        cls.drawing = Drawing.objects.create(worksite=cls.source, name='平面图', file='drawings/plan.pdf', file_size=4)
+        cls.annotation = TaskAnnotation.objects.create(
+            task=cls.tasks[0], drawing=cls.drawing, annotation_type='point', x_coordinate=1, y_coordinate=1
+        )
+
+    def assertCountersMatch(self):
+        for worksite in (self.source, self.target):
+            worksite.refresh_from_db()
+            self.assertEqual(worksite.task_count, Task.objects.filter(worksite=worksite).count())
+            self.assertEqual(worksite.drawing_count, Drawing.objects.filter(worksite=worksite).count())
+            self.assertEqual(
+                worksite.annotation_count, TaskAnnotation.objects.filter(task__worksite=worksite).count()
+            )
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.task_count, Task.objects.filter(worksite__project=self.project).count())
+
+    def test_moving_task_refreshes_both_worksites(self):
+        task = self.tasks[1]
+        task.worksite = self.target
+        task.save()
+        self.assertCountersMatch()
+        self.assertEqual(self.target.task_count, 2)
+
+    def test_moving_drawing_and_annotation_refreshes_both_worksites(self):
+        self.drawing.worksite = self.target
+        self.drawing.save()
+        self.annotation.task = self.other_task
+        self.annotation.save()
+        self.assertCountersMatch()
+        self.assertEqual((self.source.drawing_count, self.target.drawing_count), (0, 1))
+        self.assertEqual((self.source.annotation_count, self.target.annotation_count), (0, 1))
+
+    def test_queryset_delete_refreshes_once_per_worksite(self):
+        deleting = Task.objects.filter(worksite=self.source).exclude(pk=self.tasks[0].pk)
+        with CaptureQueriesContext(connection) as queries:
+            deleting.delete()
+        refreshes = [query for query in queries if query['sql'].startswith('UPDATE "projects_worksite"')]
+        self.assertEqual(len(refreshes), 1)
+        self.assertCountersMatch()
+        self.assertEqual(self.source.task_count, 1)
+
+        # 同一查询集再次删除（新匹配的行）仍会刷新
+        Task.objects.create(
+            worksite=self.source, name='新任务', responsible_person='张三',
+            start_date=self.source.start_date, end_date=self.source.start_date
+        )
+        deleting.delete()
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.task_count, 1)
+
+    def test_detail_pages_and_user_stats_read_counters(self):
+        self.client.force_login(self.owner)
+        stats = self.client.get(reverse('projects:project_detail', kwargs={'pk': self.project.pk})).context['stats']
+        self.assertEqual(
+            (stats['total_worksites'], stats['total_tasks'], stats['total_drawings'], stats['total_annotations']),
+            (2, 5, 1, 1),
+        )
+        stats = self.client.get(reverse('projects:worksite_detail', kwargs={'pk': self.target.pk})).context['stats']
+        self.assertEqual((stats['total_tasks'], stats['open_tasks'], stats['total_drawings']), (1, 1, 0))
+
+        Task.objects.filter(pk=self.tasks[0].pk).update(status='completed')
+        WorkSite.objects.filter(pk=self.source.pk).refresh_counters()
+        Project.objects.filter(pk=self.project.pk).refresh_counters()
+        with self.assertNumQueries(1):
+            stats = get_user_stats(self.owner)
+        self.assertEqual(stats['total_projects'], 1)
+        self.assertEqual(stats['active_projects'], 0)
+        self.assertEqual((stats['total_tasks'], stats['completed_tasks'], stats['open_tasks']), (5, 1, 4))
+        self.assertEqual(stats['total_drawings'], 1)
+
+
+class ProgressQuerySetTest(TestCase):
+    """数据库端进度计算与 progress_percentage 属性一致"""
+
+    # (已过天数, 持续天数)：29/100 等用浮点计算会少1
+    SPANS = [(29, 100), (57, 100), (113, 200), (0, 1), (3, 7), (10, 10), (-5, 30), (40, 30)]
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = get_user_model().objects.create_user('owner', password='pass')
+        today = date.today()
+        container = Project.objects.create(
+            owner=owner, name='容器', start_date=today - timedelta(days=400), end_date=today + timedelta(days=400)
+        )
+        for elapsed, total in cls.SPANS:
+            start = today - timedelta(days=elapsed)
+            for status in ('planning', 'active', 'completed', 'suspended', 'cancelled'):
+                # 项目持续天数为 结束-开始，工地为 结束-开始+1
+                Project.objects.create(
+                    owner=owner, name=f'{elapsed}/{total}', status=status,
+                    start_date=start, end_date=start + timedelta(days=total),
+                )
+            for status in ('preparing', 'active', 'completed', 'suspended'):
+                WorkSite.objects.create(
+                    project=container, name=f'{elapsed}/{total}', status=status,
+                    start_date=start, end_date=start + timedelta(days=total - 1),
+                )
+
+    def test_project_progress_matches_property(self):
+        for project in Project.objects.with_progress():
+            self.assertEqual(project.progress, project.progress_percentage, (project.name, project.status))
+
+    def test_worksite_progress_matches_property(self):
+        for worksite in WorkSite.objects.with_progress():
+            self.assertEqual(worksite.progress, worksite.progress_percentage, (worksite.name, worksite.status))
+        self.assertEqual(WorkSite.objects.with_progress().get(name='29/100', status='active').progress, 29)
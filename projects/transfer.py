@@ -0,0 +1,291 @@
+"""
+单个项目的流式导出/导入（NDJSON，每行一条记录，通常经gzip压缩）
+
+文件结构:
+    {"type": "header", "format": "construction-pm-project", "version": 1, ...}
+    {"type": "project", "id": 3, "fields": {...}}
+    {"type": "worksite", "id": 7, "fields": {"project_id": 3, ...}}
+    ... drawing、task、task_drawing、task_prerequisite、dependency、annotation ...
+    {"type": "end", "counts": {"worksite": 20, "task": 100000, ...}}
+
+导出按类型逐批读取（values_list + iterator），内存占用与项目规模无关；导入逐行读取，
+按依赖顺序攒批 bulk_create，外键按旧ID→新ID映射改写，整个导入在一个事务中完成。
+导入不触发模型信号：完成后统一重算计数缓存。图纸只导出文件引用（路径、哈希、大小），
+文件本身需另行复制到目标环境的 MEDIA_ROOT。创建/更新时间为导入时间。
+"""
+import gzip
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from drawings.models import Drawing
+from tasks.models import Task, TaskAnnotation, TaskDependency
+from .models import COUNTER_FIELDS, Project, WorkSite
+
+FORMAT_NAME = 'construction-pm-project'
+FORMAT_VERSION = 1
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 2000
+
+# 不导出的字段：主键、所有者、计数缓存与数据版本（导入后重算）、软删除标记
+EXCLUDED_FIELDS = {'id', 'owner_id', 'deleted_at', 'data_version', 'worksite_count', *COUNTER_FIELDS}
+
+# 记录类型 -> (模型, {外键属性: 被引用的记录类型})，按导入顺序排列
+RECORD_TYPES = {
+    'project': (Project, {}),
+    'worksite': (WorkSite, {'project_id': 'project'}),
+    'drawing': (Drawing, {'worksite_id': 'worksite'}),
+    'task': (Task, {'worksite_id': 'worksite', 'parent_task_id': 'task'}),
+    'task_drawing': (Task.drawings.through, {'task_id': 'task', 'drawing_id': 'drawing'}),
+    'task_prerequisite': (Task.dependencies.through, {'from_task_id': 'task', 'to_task_id': 'task'}),
+    'dependency': (TaskDependency, {'predecessor_id': 'task', 'successor_id': 'task'}),
+    'annotation': (TaskAnnotation, {'task_id': 'task', 'drawing_id': 'drawing'}),
+}
+RECORD_ORDER = {record_type: index for index, record_type in enumerate(RECORD_TYPES)}
+
+
+class ProjectImportError(Exception):
+    """导入文件格式不正确或内容不完整"""
+
+
+def export_fields(model):
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in EXCLUDED_FIELDS]
+
+
+def export_querysets(project):
+    """各记录类型的导出查询（仅未软删除的工地及其数据）"""
+    def live(prefix):
+        # 直接按连接条件过滤：两端都用 __in 子查询时 SQLite 的查询计划很差
+        return {f'{prefix}worksite__project': project, f'{prefix}worksite__deleted_at__isnull': True}
+
+    return {
+        'project': Project.objects.filter(pk=project.pk),
+        'worksite': WorkSite.objects.filter(project=project),
+        'drawing': Drawing.objects.filter(**live('')),
+        'task': Task.objects.filter(**live('')),
+        'task_drawing': Task.drawings.through.objects.filter(**live('task__'), **live('drawing__')),
+        'task_prerequisite': Task.dependencies.through.objects.filter(**live('from_task__'), **live('to_task__')),
+        'dependency': TaskDependency.objects.filter(**live('predecessor__'), **live('successor__')),
+        'annotation': TaskAnnotation.objects.filter(**live('task__'), **live('drawing__')),
+    }
+
+
+def iter_export_records(project):
+    """按导入顺序逐条生成导出记录（dict）"""
+    yield {
+        'type': 'header',
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'exported_at': timezone.now(),
+        'source_project_id': project.pk,
+        'owner': project.owner.get_username(),
+    }
+    counts = {}
+    querysets = export_querysets(project)
+    for record_type, (model, _) in RECORD_TYPES.items():
+        fields = export_fields(model)
+        rows = querysets[record_type].order_by('pk').values_list('pk', *fields)
+        count = 0
+        for pk, *values in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield {'type': record_type, 'id': pk, 'fields': dict(zip(fields, values))}
+            count += 1
+        counts[record_type] = count
+    yield {'type': 'end', 'counts': counts}
+
+
+def export_project(project, stream):
+    """将项目写入文本流（每条记录一行JSON），返回各类型记录数"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    counts = {}
+    for record in iter_export_records(project):
+        stream.write(encoder.encode(record))
+        stream.write('\n')
+        if record['type'] == 'end':
+            counts = record['counts']
+    return counts
+
+
+def bulk_insert(model, objects, batch_size=IMPORT_BATCH_SIZE):
+    """批量插入并为对象填充新主键（数据库不返回批量插入的主键时逐行插入，如MySQL）"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(objects, batch_size=batch_size)
+    else:
+        for obj in objects:
+            obj.save_base(raw=True)
+
+
+def open_export_file(path, mode):
+    """以文本方式打开导出文件：写入时按扩展名决定是否gzip压缩，读取时按文件头自动识别"""
+    if 'w' in mode:
+        if str(path).endswith('.gz'):
+            return gzip.open(path, 'wt', encoding='utf-8')
+        return open(path, 'w', encoding='utf-8')
+    raw = open(path, 'rb')
+    if raw.read(2) == b'\x1f\x8b':
+        raw.seek(0)
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding='utf-8')
+    raw.seek(0)
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+
+class _Importer:
+    """逐条接收记录，按类型攒批插入并维护旧ID到新ID的映射"""
+
+    def __init__(self, owner, name, batch_size):
+        self.owner = owner
+        self.name = name
+        self.batch_size = batch_size
+        self.id_maps = {record_type: {} for record_type in RECORD_TYPES}
+        self.counts = {record_type: 0 for record_type in RECORD_TYPES}
+        self.seen = {record_type: 0 for record_type in RECORD_TYPES}
+        self.skipped = {}
+        self.current_type = None
+        self.batch = []
+        # 父任务尚未导入的任务（导出按主键排序，父任务主键可能更大），父任务导入后补插
+        self.orphan_tasks = {}
+        self.project = None
+
+    def add(self, record):
+        record_type = record['type']
+        if record_type not in RECORD_TYPES:
+            raise ProjectImportError(f'未知的记录类型: {record_type}')
+        if self.current_type is not None and RECORD_ORDER[record_type] < RECORD_ORDER[self.current_type]:
+            raise ProjectImportError(f'记录顺序不正确: {record_type} 出现在 {self.current_type} 之后')
+        self.seen[record_type] += 1
+        if record_type != self.current_type:
+            self.flush()
+            self.current_type = record_type
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        record_type, records, self.batch = self.current_type, self.batch, []
+        if record_type == 'project':
+            self.create_project(records)
+        elif record_type == 'task':
+            self.create_tasks(records)
+        else:
+            self.create(record_type, records)
+
+    def remap(self, record_type, record, allow_missing=()):
+        """改写外键；引用的记录不存在时返回None（allow_missing 中的外键保留为原值以便稍后处理）"""
+        model, references = RECORD_TYPES[record_type]
+        fields = dict(record['fields'])
+        for attname, target in references.items():
+            old_id = fields.get(attname)
+            if old_id is None:
+                continue
+            new_id = self.id_maps[target].get(old_id)
+            if new_id is None:
+                if attname in allow_missing:
+                    continue
+                return None
+            fields[attname] = new_id
+        return model(**fields)
+
+    def create_project(self, records):
+        if len(records) != 1 or self.project is not None:
+            raise ProjectImportError('导入文件应只包含一个项目')
+        fields = dict(records[0]['fields'])
+        if self.name:
+            fields['name'] = self.name
+        self.project = Project.objects.create(owner=self.owner, **fields)
+        self.id_maps['project'][records[0]['id']] = self.project.pk
+        self.counts['project'] = 1
+
+    def create(self, record_type, records):
+        model, _ = RECORD_TYPES[record_type]
+        objects, old_ids = [], []
+        for record in records:
+            obj = self.remap(record_type, record)
+            if obj is None:
+                self.skipped[record_type] = self.skipped.get(record_type, 0) + 1
+                continue
+            objects.append(obj)
+            old_ids.append(record['id'])
+        self.insert(record_type, model, objects, old_ids)
+
+    def create_tasks(self, records):
+        ready, old_ids = [], []
+        for record in records:
+            obj = self.remap('task', record, allow_missing={'parent_task_id'})
+            if obj is None:
+                self.skipped['task'] = self.skipped.get('task', 0) + 1
+                continue
+            parent_id = record['fields'].get('parent_task_id')
+            if parent_id is not None and parent_id not in self.id_maps['task']:
+                self.orphan_tasks.setdefault(parent_id, []).append(record)
+                continue
+            ready.append(obj)
+            old_ids.append(record['id'])
+        self.insert('task', Task, ready, old_ids)
+
+        # 本批插入的任务若是先前待定任务的父任务，补插这些子任务（可能逐层继续）
+        waiting = [record for old_id in old_ids for record in self.orphan_tasks.pop(old_id, [])]
+        if waiting:
+            self.create_tasks(waiting)
+
+    def insert(self, record_type, model, objects, old_ids):
+        if not objects:
+            return
+        bulk_insert(model, objects, self.batch_size)
+        id_map = self.id_maps[record_type]
+        for old_id, obj in zip(old_ids, objects):
+            id_map[old_id] = obj.pk
+        self.counts[record_type] += len(objects)
+
+    def finish(self, expected_counts):
+        self.flush()
+        orphans = sum(len(records) for records in self.orphan_tasks.values())
+        if orphans:
+            self.skipped['task'] = self.skipped.get('task', 0) + orphans
+        if self.project is None:
+            raise ProjectImportError('导入文件中没有项目记录')
+        if expected_counts is None:
+            raise ProjectImportError('导入文件不完整（缺少结束记录）')
+        for record_type, expected in expected_counts.items():
+            if self.seen.get(record_type) != expected:
+                raise ProjectImportError(
+                    f'{record_type} 记录数与结束记录不符（{self.seen.get(record_type)} != {expected}）'
+                )
+
+        WorkSite.objects.filter(project=self.project).refresh_counters()
+        Project.objects.filter(pk=self.project.pk).refresh_counters()
+        self.project.refresh_from_db()
+        return self.project
+
+
+def import_project(stream, owner, name=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    从文本流导入项目（归属 owner，可指定新名称），返回 (项目, 各类型导入数, 跳过数)。
+    文件不完整或格式错误时抛出 ProjectImportError，已写入的数据随事务回滚。
+    """
+    importer = _Importer(owner, name, batch_size)
+    expected_counts = None
+    with transaction.atomic():
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ProjectImportError(f'第{line_number}行不是有效的JSON: {e}')
+            if line_number == 1:
+                if record.get('type') != 'header' or record.get('format') != FORMAT_NAME:
+                    raise ProjectImportError('不是项目导出文件')
+                if record.get('version') != FORMAT_VERSION:
+                    raise ProjectImportError(f"不支持的导出文件版本: {record.get('version')}")
+                continue
+            if record.get('type') == 'end':
+                expected_counts = record['counts']
+                break
+            importer.add(record)
+        project = importer.finish(expected_counts)
+    return project, importer.counts, importer.skipped
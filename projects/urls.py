@@ -8,6 +8,8 @@ urlpatterns = [
     path('', views.project_list, name='project_list'),
     path('create/', views.project_create, name='project_create'),
     path('<int:pk>/', views.project_detail, name='project_detail'),
+    path('<int:pk>/tabs/<slug:tab>/', views.project_tab, name='project_tab'),
+    path('<int:pk>/events/', views.project_events, name='project_events'),
     path('<int:pk>/update/', views.project_update, name='project_update'),
     path('<int:pk>/delete/', views.project_delete, name='project_delete'),
     path('<int:pk>/status/', views.project_status_update, name='project_status_update'),
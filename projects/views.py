@@ -1,21 +1,50 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.urls import reverse
-from django.http import JsonResponse
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_http_methods
+from drawings.models import Drawing
+from tasks.models import Task
 from .models import Project, WorkSite
-from .forms import ProjectForm, WorkSiteForm
+from .forms import ProjectForm, ProjectTemplateForm, WorkSiteForm
+from core.async_views import async_login_required
+from core.conditional import versioned_condition
+from core.events import RESYNC, broker, format_sse
+from .changelog import current_cursor, project_channel
+from .cloning import clone_project
+from .deletion import soft_delete_project, soft_delete_worksite
+from .services import get_project_version
+
+# 实时事件流：心跳间隔（秒）、单个连接最长保持时间（秒，到期后客户端自动重连）、重连间隔（毫秒）
+EVENT_STREAM_HEARTBEAT = 15
+EVENT_STREAM_MAX_AGE = 5 * 60
+EVENT_STREAM_RETRY = 2000
+
+
+def owned_project_version(request, pk, **kwargs):
+    """当前用户项目的数据版本（条件请求）"""
+    return get_project_version(pk=pk, owner=request.user)
+
+
+def owned_worksite_version(request, pk, **kwargs):
+    """当前用户工地所属项目的数据版本（条件请求）"""
+    return get_project_version(worksites=pk, owner=request.user)
 
 
 @login_required
 def project_list(request):
     """项目列表页面"""
-    projects = Project.objects.filter(owner=request.user).select_related().prefetch_related(
-        'worksites',
-        'worksites__tasks',
-        'worksites__drawings'
-    ).order_by('-created_at')
+    # 图纸/任务数量直接读取计数缓存字段，无需预取工地下的全部任务和图纸
+    projects = Project.objects.filter(owner=request.user).order_by('-created_at')
     return render(request, 'projects/project_list.html', {
         'projects': projects
     })
@@ -23,71 +52,107 @@ def project_list(request):
 
 @login_required
 def project_create(request):
-    """创建项目"""
+    """创建项目（可选以现有项目为模板）"""
     if request.method == 'POST':
         form = ProjectForm(request.POST)
-        if form.is_valid():
+        template_form = ProjectTemplateForm(request.POST, owner=request.user, project_form=form)
+        if form.is_valid() and template_form.is_valid():
             project = form.save(commit=False)
             project.owner = request.user
-            project.save()
-            messages.success(request, f'项目"{project.name}"创建成功！')
+            template = template_form.cleaned_data['template']
+            if template is None:
+                project.save()
+                messages.success(request, f'项目"{project.name}"创建成功！')
+            else:
+                project, counts = clone_project(
+                    template, project, include_drawings=template_form.cleaned_data['include_drawings']
+                )
+                messages.success(
+                    request,
+                    f'项目"{project.name}"已按模板"{template.name}"创建：{counts["worksite"]} 个工地，{counts["task"]} 个任务'
+                )
             return redirect('projects:project_detail', pk=project.pk)
     else:
         form = ProjectForm()
+        template_form = ProjectTemplateForm(owner=request.user, initial={'template': request.GET.get('template')})
 
     return render(request, 'projects/project_create.html', {
-        'form': form
+        'form': form,
+        'template_form': template_form,
     })
 
 
 @login_required
+@versioned_condition(owned_project_version)
 def project_detail(request, pk):
     """项目详情页面（项目主页）"""
     project = get_object_or_404(Project.objects.select_related(), pk=pk, owner=request.user)
 
-    # 获取项目的工地
-    worksites = project.worksites.all().select_related().prefetch_related(
-        'tasks', 
-        'drawings'
-    ).order_by('-created_at')
-
-    # 获取项目相关数据（通过工地）
-    drawings = []
-    all_tasks = []
-    for worksite in worksites:
-        drawings.extend(worksite.drawings.all())
-        all_tasks.extend(worksite.tasks.all())
-
-    # 按时间排序
-    drawings = sorted(drawings, key=lambda x: x.uploaded_at, reverse=True)
-    all_tasks = sorted(all_tasks, key=lambda x: x.created_at, reverse=True)
-
-    # 分离主任务和子任务
-    main_tasks = [task for task in all_tasks if task.parent_task is None]
-    subtasks = [task for task in all_tasks if task.parent_task is not None]
-
-    # 统计数据
-    stats = {
-        'total_worksites': worksites.count(),
-        'total_drawings': len(drawings),
-        'total_tasks': len(all_tasks),
-        'main_tasks': len(main_tasks),
-        'subtasks': len(subtasks),
-        'completed_tasks': len([t for t in all_tasks if t.status == 'completed']),
-        'pending_tasks': len([t for t in all_tasks if t.status == 'pending']),
-        'in_progress_tasks': len([t for t in all_tasks if t.status == 'in_progress']),
-    }
+    # 获取项目的工地（图纸/任务数量读取计数缓存字段）
+    worksites = project.worksites.all().order_by('-created_at')
+
+    # 统计数据（来自项目行上的计数缓存）
+    stats = project.counter_stats()
 
+    # 图纸、主任务、子任务标签页由 project_tab 按需分页加载
     return render(request, 'projects/project_detail.html', {
         'project': project,
         'worksites': worksites,
-        'drawings': drawings,
-        'tasks': main_tasks,  # Only main tasks for the tasks tab
-        'subtasks': subtasks,  # Separate subtasks for the new tab
         'stats': stats
     })
 
 
+# 项目主页的延迟加载标签页及每页条数
+PROJECT_TAB_PAGE_SIZES = {
+    'drawings': 24,
+    'tasks': 50,
+    'subtasks': 50,
+}
+PROJECT_TAB_CACHE_TIMEOUT = 60 * 60
+
+
+def project_tab_queryset(project, tab):
+    """标签页数据查询（主任务的子任务数用聚合注解，避免逐行查询）"""
+    if tab == 'drawings':
+        return Drawing.objects.filter(worksite__project=project, worksite__deleted_at__isnull=True).order_by(
+            '-uploaded_at', '-pk'
+        )
+
+    tasks = Task.objects.filter(worksite__project=project).live().order_by('-created_at', '-pk')
+    if tab == 'tasks':
+        return tasks.filter(parent_task__isnull=True).annotate(
+            subtask_total=Count('subtasks'),
+            completed_subtask_total=Count('subtasks', filter=Q(subtasks__status='completed')),
+        )
+    return tasks.filter(parent_task__isnull=False).select_related('worksite', 'parent_task')
+
+
+@login_required
+@versioned_condition(owned_project_version)
+def project_tab(request, pk, tab):
+    """项目主页标签页HTML片段（分页，按项目数据版本缓存）"""
+    if tab not in PROJECT_TAB_PAGE_SIZES:
+        raise Http404('未知的标签页')
+
+    project = get_object_or_404(
+        Project.objects.only('pk', 'name', 'data_version', 'worksite_count'),
+        pk=pk, owner=request.user
+    )
+    # 先分页（一条COUNT查询）再以规范化后的页码作缓存键：?page=abc、越界页码与对应的有效页共用缓存
+    paginator = Paginator(project_tab_queryset(project, tab), PROJECT_TAB_PAGE_SIZES[tab])
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    def render_fragment():
+        return render_to_string(f'projects/fragments/project_{tab}_tab.html', {
+            'project': project,
+            'page_obj': page_obj,
+            'tab_url': reverse('projects:project_tab', kwargs={'pk': project.pk, 'tab': tab}),
+        }, request=request)
+
+    key = f'fragment:project:{project.pk}:v{project.data_version}:{tab}:{page_obj.number}'
+    return HttpResponse(cache.get_or_set(key, render_fragment, PROJECT_TAB_CACHE_TIMEOUT))
+
+
 def project_update(request, pk):
     """更新项目"""
     project = get_object_or_404(Project, pk=pk)
@@ -112,9 +177,9 @@ def project_delete(request, pk):
     project = get_object_or_404(Project, pk=pk)
 
     if request.method == 'POST':
-        project_name = project.name
-        project.delete()
-        messages.success(request, f'项目"{project_name}"已删除')
+        # 立即隐藏，级联数据与图纸文件由后台任务分批清除
+        soft_delete_project(project, user=request.user)
+        messages.success(request, f'项目"{project.name}"已删除')
         return redirect('projects:project_list')
 
     return render(request, 'projects/project_delete_confirm.html', {
@@ -167,6 +232,7 @@ def worksite_create(request, project_pk):
 
 
 @login_required
+@versioned_condition(owned_worksite_version)
 def worksite_detail(request, pk):
     """工地详情页面"""
     worksite = get_object_or_404(
@@ -175,29 +241,19 @@ def worksite_detail(request, pk):
         project__owner=request.user
     )
 
-    # 获取工地相关数据
-    drawings = worksite.drawings.all().select_related().order_by('-uploaded_at')
-    all_tasks = worksite.tasks.all().select_related(
-        'parent_task'
-    ).prefetch_related(
-        'subtasks',
-        'dependencies'
-    ).order_by('-created_at')
-
-    # 分离主任务和子任务
-    main_tasks = all_tasks.filter(parent_task__isnull=True)
-    subtasks = all_tasks.filter(parent_task__isnull=False)
-
-    # 统计数据
-    stats = {
-        'total_drawings': drawings.count(),
-        'total_tasks': all_tasks.count(),
-        'main_tasks': main_tasks.count(),
-        'subtasks': subtasks.count(),
-        'completed_tasks': all_tasks.filter(status='completed').count(),
-        'pending_tasks': all_tasks.filter(status='pending').count(),
-        'in_progress_tasks': all_tasks.filter(status='in_progress').count(),
-    }
+    # 获取工地相关数据（惰性查询集：模板片段缓存命中时不会执行）
+    drawings = worksite.drawings.all().order_by('-uploaded_at')
+    tasks = worksite.tasks.all().order_by('-created_at')
+
+    # 分离主任务和子任务（主任务的子任务数用聚合注解，同时作为行缓存键的一部分）
+    main_tasks = tasks.filter(parent_task__isnull=True).annotate(
+        subtask_total=Count('subtasks'),
+        completed_subtask_total=Count('subtasks', filter=Q(subtasks__status='completed')),
+    )
+    subtasks = tasks.filter(parent_task__isnull=False).select_related('parent_task')
+
+    # 统计数据（来自工地行上的计数缓存）
+    stats = worksite.counter_stats()
 
     return render(request, 'projects/worksite_detail.html', {
         'worksite': worksite,
@@ -237,12 +293,57 @@ def worksite_delete(request, pk):
     project = worksite.project
 
     if request.method == 'POST':
-        worksite_name = worksite.name
-        worksite.delete()
-        messages.success(request, f'工地"{worksite_name}"已删除')
+        soft_delete_worksite(worksite, user=request.user)
+        messages.success(request, f'工地"{worksite.name}"已删除')
         return redirect('projects:project_detail', pk=project.pk)
 
     return render(request, 'projects/worksite_delete_confirm.html', {
         'worksite': worksite,
         'project': project
     })
+
+
+async def project_event_stream(subscription, cursor):
+    """
+    事件流内容：先发送 ready（当前游标），之后每条变更一个 change 事件（id 为变更日志游标）；
+    订阅者积压过多时发送 resync，客户端应按游标增量补齐
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EVENT_STREAM_MAX_AGE
+    try:
+        yield format_sse({'cursor': cursor}, event='ready', retry=EVENT_STREAM_RETRY)
+        while loop.time() < deadline:
+            timeout = min(EVENT_STREAM_HEARTBEAT, deadline - loop.time())
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is RESYNC:
+                yield format_sse({}, event='resync')
+            else:
+                yield format_sse(event, event='change', event_id=event['cursor'])
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@async_login_required
+async def project_events(request, pk):
+    """
+    项目实时事件流（Server-Sent Events）：任务状态/日期、标注等写入在事务提交后推送。
+    需以ASGI方式运行（construction_pm.asgi），WSGI下返回501。
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': '实时事件流需要以ASGI方式部署'}, status=501)
+    if not await Project.objects.filter(pk=pk, owner_id=request.user.pk).aexists():
+        raise Http404('项目不存在')
+
+    # 先订阅再取游标：之后提交的变更都会推送，不会遗漏
+    subscription = broker.subscribe(project_channel(pk))
+    cursor = await sync_to_async(current_cursor)()
+    response = StreamingHttpResponse(
+        project_event_stream(subscription, cursor), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
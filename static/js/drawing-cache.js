@@ -0,0 +1,58 @@
+// 建筑项目管理系统 - 图纸离线缓存
+// 注册 Service Worker；页面指定了工地清单时，在Wi-Fi（或未知网络类型）下预缓存该工地的全部图纸。
+
+(function() {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+
+    const script = document.currentScript;
+    const serviceWorkerUrl = script.dataset.serviceWorker;
+    const manifestUrl = script.dataset.drawingManifest;
+
+    // 是否适合批量下载：省流量模式或蜂窝网络下不自动预缓存
+    function onUnmeteredNetwork() {
+        const connection = navigator.connection;
+        if (!connection) {
+            return true;
+        }
+        if (connection.saveData) {
+            return false;
+        }
+        return !connection.type || ['wifi', 'ethernet'].includes(connection.type);
+    }
+
+    function notify(message, type) {
+        if (window.ConstructionPM && window.ConstructionPM.showNotification) {
+            window.ConstructionPM.showNotification(message, type);
+        } else {
+            console.info(message);
+        }
+    }
+
+    // 预缓存指定工地清单中的图纸
+    function precacheWorksiteDrawings(url) {
+        return navigator.serviceWorker.ready.then(registration => {
+            registration.active.postMessage({type: 'precache-worksite', manifestUrl: url});
+        });
+    }
+
+    navigator.serviceWorker.addEventListener('message', event => {
+        const data = event.data || {};
+        if (data.type === 'precache-done' && (data.fetched || data.removed)) {
+            notify(`已离线缓存工地图纸 ${data.total} 个文件（新下载 ${data.fetched}，移除 ${data.removed}）`, 'success');
+        } else if (data.type === 'precache-failed') {
+            console.warn('图纸离线缓存失败:', data.message);
+        }
+    });
+
+    navigator.serviceWorker.register(serviceWorkerUrl, {scope: '/'}).then(() => {
+        if (manifestUrl && onUnmeteredNetwork()) {
+            precacheWorksiteDrawings(manifestUrl);
+        }
+    }).catch(error => console.warn('Service Worker 注册失败:', error));
+
+    window.DrawingCache = {
+        precacheWorksiteDrawings
+    };
+})();
@@ -0,0 +1,374 @@
+"""
+离线同步：工地快照、按游标拉取增量、批量推送离线修改（逐行版本校验与冲突报告）
+"""
+import base64
+import gzip
+import json
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from drawings.models import Drawing
+from projects.changelog import changes_since, current_cursor, split_changes
+from tasks.models import Task, TaskAnnotation, TaskDependency
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_CACHE_TIMEOUT = 60 * 60
+SYNC_MODELS = ['worksite', 'task', 'dependency', 'drawing', 'annotation']
+
+# 推送时允许客户端修改的字段
+TASK_FIELDS = ['name', 'description', 'task_type', 'status', 'responsible_person', 'start_date', 'end_date', 'deadline']
+TASK_DATE_FIELDS = ['start_date', 'end_date', 'deadline']
+ANNOTATION_FIELDS = [
+    'annotation_type', 'page_number', 'x_coordinate', 'y_coordinate',
+    'width', 'height', 'end_x', 'end_y', 'color', 'content',
+]
+
+
+class PushError(Exception):
+    """单个推送操作无法执行（报告给客户端，不影响同批其它操作）"""
+
+
+def row_version(obj):
+    """行版本：最后更新时间"""
+    return obj.updated_at.isoformat()
+
+
+# ==================== 序列化 ====================
+
+def serialize_worksite(worksite):
+    return {
+        'id': worksite.id,
+        'project_id': worksite.project_id,
+        'name': worksite.name,
+        'status': worksite.status,
+        'start_date': worksite.start_date.isoformat(),
+        'end_date': worksite.end_date.isoformat(),
+        'version': row_version(worksite),
+    }
+
+
+def serialize_task(task):
+    return {
+        'id': task.id,
+        'parent_task_id': task.parent_task_id,
+        'name': task.name,
+        'description': task.description,
+        'task_type': task.task_type,
+        'status': task.status,
+        'responsible_person': task.responsible_person,
+        'start_date': task.start_date.isoformat(),
+        'end_date': task.end_date.isoformat(),
+        'deadline': task.deadline.isoformat(),
+        'version': row_version(task),
+    }
+
+
+def serialize_dependency(dependency):
+    return {
+        'id': dependency.id,
+        'predecessor_id': dependency.predecessor_id,
+        'successor_id': dependency.successor_id,
+        'dependency_type': dependency.dependency_type,
+        'lag_days': dependency.lag_days,
+    }
+
+
+def serialize_drawing(drawing, include_thumbnail=False):
+    data = {
+        'id': drawing.id,
+        'name': drawing.name,
+        'file_type': drawing.file_type,
+        'file_size': drawing.file_size,
+        'page_count': drawing.page_count,
+        'file_url': drawing.file.url if drawing.file else None,
+        'thumbnail_url': drawing.thumbnail.url if drawing.thumbnail else None,
+        'version': row_version(drawing),
+    }
+    if include_thumbnail:
+        data['thumbnail_data'] = read_thumbnail(drawing)
+    return data
+
+
+def serialize_annotation(annotation):
+    data = {
+        'id': annotation.id,
+        'task_id': annotation.task_id,
+        'drawing_id': annotation.drawing_id,
+        'version': row_version(annotation),
+    }
+    data.update({field: getattr(annotation, field) for field in ANNOTATION_FIELDS})
+    return data
+
+
+def read_thumbnail(drawing):
+    """缩略图内容（base64），文件缺失时返回None"""
+    if not drawing.thumbnail:
+        return None
+    try:
+        with drawing.thumbnail.open('rb') as f:
+            return base64.b64encode(f.read()).decode('ascii')
+    except (OSError, ValueError):
+        return None
+
+
+# ==================== 查询 ====================
+
+def task_queryset(worksite):
+    return Task.objects.filter(worksite=worksite).order_by('pk')
+
+
+def dependency_queryset(worksite):
+    """后继任务在本工地的依赖（前置任务可能在其它工地）"""
+    return TaskDependency.objects.filter(successor__worksite=worksite).order_by('pk')
+
+
+def drawing_queryset(worksite):
+    return Drawing.objects.filter(worksite=worksite).order_by('pk')
+
+
+def annotation_queryset(worksite):
+    return TaskAnnotation.objects.filter(task__worksite=worksite).order_by('pk')
+
+
+# ==================== 快照与增量 ====================
+
+def build_snapshot(worksite, include_thumbnails=False):
+    """工地全量快照（游标在读取数据之前获取）"""
+    cursor = current_cursor()
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'cursor': cursor,
+        'generated_at': timezone.now().isoformat(),
+        'worksite': serialize_worksite(worksite),
+        'tasks': [serialize_task(task) for task in task_queryset(worksite)],
+        'dependencies': [serialize_dependency(dep) for dep in dependency_queryset(worksite)],
+        'drawings': [
+            serialize_drawing(drawing, include_thumbnails) for drawing in drawing_queryset(worksite)
+        ],
+        'annotations': [serialize_annotation(annotation) for annotation in annotation_queryset(worksite)],
+    }
+
+
+def compress(payload):
+    """紧凑JSON并gzip压缩"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(body, compresslevel=6)
+
+
+def get_compressed_snapshot(worksite, include_thumbnails=False):
+    """压缩后的工地快照，按项目数据版本缓存（worksite.project 应已 select_related）"""
+    key = f'sync:snapshot:{worksite.pk}:v{worksite.project.data_version}:t{int(include_thumbnails)}'
+    return cache.get_or_set(
+        key, lambda: compress(build_snapshot(worksite, include_thumbnails)), SNAPSHOT_CACHE_TIMEOUT
+    )
+
+
+def pull_changes(worksite, since, limit=None):
+    """游标之后本工地的变更（按变更日志条数分批）与删除墓碑"""
+    cursor, has_more, changes = changes_since(since, worksite_id=worksite.pk, models=SYNC_MODELS, limit=limit)
+    payload = {'cursor': cursor, 'has_more': has_more, 'deleted': {}}
+    sources = [
+        ('worksites', 'worksite', type(worksite).objects.filter(pk=worksite.pk), serialize_worksite),
+        ('tasks', 'task', task_queryset(worksite), serialize_task),
+        ('dependencies', 'dependency', dependency_queryset(worksite), serialize_dependency),
+        ('drawings', 'drawing', drawing_queryset(worksite), serialize_drawing),
+        ('annotations', 'annotation', annotation_queryset(worksite), serialize_annotation),
+    ]
+    for key, model, queryset, serializer in sources:
+        payload[key], payload['deleted'][key] = split_changes(changes, model, queryset, serializer)
+    return payload
+
+
+# ==================== 推送 ====================
+
+class PushProcessor:
+    """
+    按顺序执行一批离线修改。
+
+    每个操作形如 {"op_id", "model": "task"|"annotation", "action": "create"|"update"|"delete",
+    "id", "version", "client_id", "fields"}。更新/删除须携带客户端所见的行版本，
+    与服务器不一致时记为冲突并返回服务器当前数据；新建可用 client_id 命名，
+    同批后续操作可用该 client_id 引用（如新建子任务后为其添加标注）。
+    """
+
+    def __init__(self, worksite):
+        self.worksite = worksite
+        self.client_ids = {'task': {}, 'annotation': {}}
+        self.applied = []
+        self.conflicts = []
+        self.errors = []
+
+    def process(self, operations):
+        """执行全部操作；逐个使用保存点，失败或冲突的操作不影响其它操作"""
+        self.prefetch(operations)
+        with transaction.atomic():
+            for operation in operations:
+                op_id = operation.get('op_id') if isinstance(operation, dict) else None
+                try:
+                    with transaction.atomic():
+                        self.apply(operation)
+                except (PushError, ValidationError) as e:
+                    message = '; '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+                    self.errors.append({'op_id': op_id, 'error': message})
+                    self.forget(operation)
+        return {
+            'applied': self.applied,
+            'conflicts': self.conflicts,
+            'errors': self.errors,
+            'cursor': current_cursor(),
+        }
+
+    def prefetch(self, operations):
+        """一次性读取本批要修改的任务和标注"""
+        ids = {'task': set(), 'annotation': set()}
+        for operation in operations:
+            if isinstance(operation, dict) and operation.get('model') in ids and isinstance(operation.get('id'), int):
+                ids[operation['model']].add(operation['id'])
+        self.tasks = task_queryset(self.worksite).filter(pk__in=ids['task']).in_bulk()
+        self.annotations = annotation_queryset(self.worksite).filter(pk__in=ids['annotation']).in_bulk()
+        for task in self.tasks.values():
+            task.worksite = self.worksite
+
+    def forget(self, operation):
+        """操作失败已回滚，丢弃可能被部分修改的缓存行，后续操作重新读取"""
+        if isinstance(operation, dict):
+            objects = {'task': self.tasks, 'annotation': self.annotations}.get(operation.get('model'), {})
+            if isinstance(operation.get('id'), int):
+                objects.pop(operation['id'], None)
+
+    def apply(self, operation):
+        if not isinstance(operation, dict):
+            raise PushError('操作格式错误')
+        model, action = operation.get('model'), operation.get('action')
+        handler = getattr(self, f'{action}_{model}', None) if model in self.client_ids else None
+        if handler is None or action not in ('create', 'update', 'delete'):
+            raise PushError(f'不支持的操作: {model}.{action}')
+        handler(operation, operation.get('fields') or {})
+
+    # ----- 公共步骤 -----
+
+    def resolve(self, model, reference):
+        """将服务器ID或同批新建的 client_id 解析为服务器ID"""
+        if isinstance(reference, str) and reference in self.client_ids[model]:
+            return self.client_ids[model][reference]
+        if isinstance(reference, int):
+            return reference
+        raise PushError(f'无法解析的{model}引用: {reference}')
+
+    def existing(self, operation, objects, queryset):
+        """
+        取出要更新/删除的行并校验版本，冲突时返回None。
+
+        校验通过后以 UPDATE ... WHERE updated_at=<所见版本> 占用该行（比较并交换）：
+        读取后被并发请求修改的行影响0行，同样记为版本冲突；占用成功后该行在事务结束前
+        不会再被其他请求修改
+        """
+        object_id = operation.get('id')
+        if not isinstance(object_id, int):
+            raise PushError('缺少有效的ID')
+        obj = objects.get(object_id) or queryset.filter(pk=object_id).first()
+        if obj is not None and operation.get('version') == row_version(obj):
+            if queryset.filter(pk=object_id, updated_at=obj.updated_at).update(updated_at=timezone.now()):
+                return obj
+            obj = queryset.filter(pk=object_id).first()
+
+        objects.pop(object_id, None)
+        self.conflicts.append({
+            'op_id': operation.get('op_id'), 'model': operation['model'], 'id': object_id,
+            'reason': 'deleted' if obj is None else 'version_mismatch',
+            'server': None if obj is None else self.serialize(operation['model'], obj),
+        })
+        return None
+
+    def saved(self, operation, obj):
+        objects = self.tasks if operation['model'] == 'task' else self.annotations
+        objects[obj.pk] = obj
+        if operation.get('client_id'):
+            self.client_ids[operation['model']][operation['client_id']] = obj.pk
+        self.applied.append({
+            'op_id': operation.get('op_id'), 'model': operation['model'], 'action': operation['action'],
+            'id': obj.pk, 'client_id': operation.get('client_id'), 'version': row_version(obj),
+        })
+
+    @staticmethod
+    def serialize(model, obj):
+        return serialize_task(obj) if model == 'task' else serialize_annotation(obj)
+
+    @staticmethod
+    def assign(obj, fields, allowed, date_fields=()):
+        unknown = set(fields) - set(allowed)
+        if unknown:
+            raise PushError(f"不允许修改的字段: {', '.join(sorted(unknown))}")
+        for field, value in fields.items():
+            if field in date_fields and isinstance(value, str):
+                try:
+                    value = date.fromisoformat(value)
+                except ValueError:
+                    raise PushError(f'日期格式错误: {field}')
+            setattr(obj, field, value)
+
+    # ----- 任务 -----
+
+    def create_task(self, operation, fields):
+        fields = dict(fields)
+        parent_reference = fields.pop('parent_task_id', None)
+        task = Task(worksite=self.worksite)
+        if parent_reference is not None:
+            parent_id = self.resolve('task', parent_reference)
+            task.parent_task = self.tasks.get(parent_id) or task_queryset(self.worksite).filter(pk=parent_id).first()
+            if task.parent_task is None:
+                raise PushError('父任务不存在或不属于该工地')
+        self.assign(task, fields, TASK_FIELDS, TASK_DATE_FIELDS)
+        task.save()
+        self.saved(operation, task)
+
+    def update_task(self, operation, fields):
+        task = self.existing(operation, self.tasks, task_queryset(self.worksite))
+        if task is not None:
+            self.assign(task, fields, TASK_FIELDS, TASK_DATE_FIELDS)
+            task.save()
+            self.saved(operation, task)
+
+    def delete_task(self, operation, fields):
+        raise PushError('离线同步不支持删除任务')
+
+    # ----- 标注 -----
+
+    def create_annotation(self, operation, fields):
+        fields = dict(fields)
+        task_id = self.resolve('task', fields.pop('task_id', None))
+        drawing_id = fields.pop('drawing_id', None)
+        task = self.tasks.get(task_id) or task_queryset(self.worksite).filter(pk=task_id).first()
+        if task is None:
+            raise PushError('任务不存在或不属于该工地')
+        drawing = drawing_queryset(self.worksite).filter(pk=drawing_id).first() if isinstance(drawing_id, int) else None
+        if drawing is None:
+            raise PushError('图纸不存在或不属于该工地')
+        annotation = TaskAnnotation(task=task, drawing=drawing)
+        self.assign(annotation, fields, ANNOTATION_FIELDS)
+        annotation.full_clean()
+        annotation.save()
+        self.saved(operation, annotation)
+
+    def update_annotation(self, operation, fields):
+        annotation = self.existing(operation, self.annotations, annotation_queryset(self.worksite))
+        if annotation is not None:
+            self.assign(annotation, fields, ANNOTATION_FIELDS)
+            annotation.full_clean()
+            annotation.save()
+            self.saved(operation, annotation)
+
+    def delete_annotation(self, operation, fields):
+        annotation = self.existing(operation, self.annotations, annotation_queryset(self.worksite))
+        if annotation is not None:
+            annotation_id = annotation.pk
+            annotation.delete()
+            self.annotations.pop(annotation_id, None)
+            self.applied.append({
+                'op_id': operation.get('op_id'), 'model': 'annotation', 'action': 'delete',
+                'id': annotation_id, 'client_id': None, 'version': None,
+            })
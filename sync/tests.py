@@ -0,0 +1,110 @@
+import gzip
+import json
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.testing import create_project_fixture
+from drawings.models import Drawing
+from tasks.models import Task, TaskAnnotation
+from .services import PushProcessor
+
+
+class WorksiteSyncTest(TestCase):
+    """离线同步：快照、推送冲突与增量拉取"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, _, cls.worksite = create_project_fixture()
+        today = date.today()
+        cls.task = Task.objects.create(
+            worksite=cls.worksite, name='主任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+        cls.drawing = Drawing.objects.create(worksite=cls.worksite, name='平面图', file='drawings/plan.pdf', file_size=1024)
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+        self.snapshot_url = reverse('sync:worksite_snapshot', kwargs={'worksite_id': self.worksite.pk})
+        self.push_url = reverse('sync:worksite_push', kwargs={'worksite_id': self.worksite.pk})
+        self.changes_url = reverse('sync:worksite_changes', kwargs={'worksite_id': self.worksite.pk})
+
+    def snapshot(self):
+        response = self.client.get(self.snapshot_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        return json.loads(gzip.decompress(response.content))
+
+    def push(self, operations):
+        return self.client.post(self.push_url, {'operations': operations}, content_type='application/json').json()
+
+    def test_snapshot_contents(self):
+        snapshot = self.snapshot()
+        self.assertEqual([task['id'] for task in snapshot['tasks']], [self.task.pk])
+        self.assertEqual([drawing['id'] for drawing in snapshot['drawings']], [self.drawing.pk])
+
+    def test_push_applies_batch_and_reports_conflicts(self):
+        snapshot = self.snapshot()
+        version = snapshot['tasks'][0]['version']
+        result = self.push([
+            {'op_id': '1', 'model': 'task', 'action': 'update', 'id': self.task.pk,
+             'version': version, 'fields': {'status': 'in_progress'}},
+            {'op_id': '2', 'model': 'task', 'action': 'create', 'client_id': 'tmp-sub',
+             'fields': {'name': '子任务', 'responsible_person': '李四', 'parent_task_id': self.task.pk,
+                        'start_date': snapshot['tasks'][0]['start_date'],
+                        'end_date': snapshot['tasks'][0]['start_date']}},
+            {'op_id': '3', 'model': 'annotation', 'action': 'create', 'client_id': 'tmp-note',
+             'fields': {'task_id': 'tmp-sub', 'drawing_id': self.drawing.pk, 'annotation_type': 'point',
+                        'x_coordinate': 10, 'y_coordinate': 20, 'content': '检查点'}},
+            {'op_id': '4', 'model': 'task', 'action': 'update', 'id': self.task.pk,
+             'version': version, 'fields': {'status': 'completed'}},
+            {'op_id': '5', 'model': 'task', 'action': 'delete', 'id': self.task.pk, 'version': version},
+        ])
+
+        self.assertEqual([op['op_id'] for op in result['applied']], ['1', '2', '3'])
+        self.assertEqual([(c['op_id'], c['reason']) for c in result['conflicts']], [('4', 'version_mismatch')])
+        self.assertEqual(result['conflicts'][0]['server']['status'], 'in_progress')
+        self.assertEqual([error['op_id'] for error in result['errors']], ['5'])
+
+        subtask_id = result['applied'][1]['id']
+        self.assertEqual(TaskAnnotation.objects.get().task_id, subtask_id)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'in_progress')
+
+    def test_concurrent_write_after_read_is_a_conflict(self):
+        version = self.snapshot()['tasks'][0]['version']
+        prefetch = PushProcessor.prefetch
+
+        def prefetch_then_concurrent_write(processor, operations):
+            prefetch(processor, operations)
+            # 本批读取之后、写入之前，另一请求修改了同一任务
+            Task.objects.filter(pk=self.task.pk).update(status='pending', updated_at=timezone.now())
+
+        with mock.patch.object(PushProcessor, 'prefetch', prefetch_then_concurrent_write):
+            result = self.push([
+                {'op_id': '1', 'model': 'task', 'action': 'update', 'id': self.task.pk,
+                 'version': version, 'fields': {'status': 'completed'}},
+            ])
+
+        self.assertEqual(result['applied'], [])
+        self.assertEqual([(c['op_id'], c['reason']) for c in result['conflicts']], [('1', 'version_mismatch')])
+        self.assertEqual(result['conflicts'][0]['server']['status'], 'pending')
+        self.assertEqual(Task.objects.get(pk=self.task.pk).status, 'pending')
+
+    def test_pull_changes_after_snapshot(self):
+        cursor = self.snapshot()['cursor']
+        annotation = TaskAnnotation.objects.create(
+            task=self.task, drawing=self.drawing, annotation_type='text',
+            x_coordinate=1, y_coordinate=2, content='备注'
+        )
+        annotation_id = annotation.pk
+        self.task.status = 'completed'
+        self.task.save()
+        annotation.delete()
+
+        changes = self.client.get(self.changes_url, {'since': cursor}).json()
+        self.assertEqual([task['id'] for task in changes['tasks']], [self.task.pk])
+        self.assertEqual(changes['annotations'], [])
+        self.assertEqual(changes['deleted']['annotations'], [annotation_id])
+        self.assertFalse(changes['has_more'])
@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'sync'
+
+urlpatterns = [
+    # 工地快照（gzip压缩）
+    path('worksites/<int:worksite_id>/snapshot/', views.worksite_snapshot, name='worksite_snapshot'),
+
+    # 按游标拉取增量
+    path('worksites/<int:worksite_id>/changes/', views.worksite_changes, name='worksite_changes'),
+
+    # 批量推送离线修改
+    path('worksites/<int:worksite_id>/push/', views.worksite_push, name='worksite_push'),
+]
@@ -0,0 +1,94 @@
+import gzip
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET, require_POST
+
+from core.conditional import versioned_condition
+from projects.changelog import CursorExpired
+from projects.models import WorkSite
+from projects.services import get_project_version
+from .services import PushProcessor, get_compressed_snapshot, pull_changes
+
+# 增量拉取每批默认/最大日志条数，单次推送最大操作数
+CHANGES_DEFAULT_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+PUSH_MAX_OPERATIONS = 1000
+
+
+def owned_worksite_version(request, worksite_id, **kwargs):
+    """当前用户工地所属项目的数据版本（条件请求）"""
+    return get_project_version(worksites=worksite_id, owner=request.user)
+
+
+def get_owned_worksite(request, worksite_id):
+    return get_object_or_404(
+        WorkSite.objects.select_related('project'), pk=worksite_id, project__owner=request.user
+    )
+
+
+@login_required
+@require_GET
+@versioned_condition(owned_worksite_version)
+def worksite_snapshot(request, worksite_id):
+    """
+    工地离线快照：任务（含子任务）、依赖、图纸元数据、标注及当前游标，紧凑JSON经gzip压缩。
+    thumbnails=1 时内嵌缩略图（base64）。客户端不接受gzip时返回未压缩JSON。
+    """
+    worksite = get_owned_worksite(request, worksite_id)
+    include_thumbnails = request.GET.get('thumbnails') == '1'
+    body = get_compressed_snapshot(worksite, include_thumbnails)
+
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type='application/json')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@login_required
+@require_GET
+@versioned_condition(owned_worksite_version)
+def worksite_changes(request, worksite_id):
+    """按游标拉取本工地的增量（has_more 为真时用返回的游标继续拉取）"""
+    worksite = get_owned_worksite(request, worksite_id)
+    try:
+        since = int(request.GET.get('since', ''))
+        limit = min(int(request.GET.get('limit', CHANGES_DEFAULT_LIMIT)), CHANGES_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': '无效的游标或条数'}, status=400)
+    if limit <= 0:
+        return JsonResponse({'error': '无效的游标或条数'}, status=400)
+
+    try:
+        return JsonResponse(pull_changes(worksite, since, limit=limit))
+    except CursorExpired:
+        return JsonResponse({'error': '游标已过期，请重新下载快照'}, status=410)
+
+
+@login_required
+@require_POST
+def worksite_push(request, worksite_id):
+    """
+    批量推送离线修改：{"operations": [...]}，请求体可gzip压缩（Content-Encoding: gzip）。
+    返回已应用、冲突（附服务器当前数据）和错误的操作，以及推送后的游标。
+    """
+    worksite = get_owned_worksite(request, worksite_id)
+    try:
+        body = request.body
+        if request.META.get('HTTP_CONTENT_ENCODING') == 'gzip':
+            body = gzip.decompress(body)
+        operations = json.loads(body)['operations']
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return JsonResponse({'error': '请求格式错误'}, status=400)
+    if not isinstance(operations, list):
+        return JsonResponse({'error': '请求格式错误'}, status=400)
+    if len(operations) > PUSH_MAX_OPERATIONS:
+        return JsonResponse({'error': f'单次最多推送 {PUSH_MAX_OPERATIONS} 个操作'}, status=400)
+
+    return JsonResponse(PushProcessor(worksite).process(operations))
@@ -0,0 +1,302 @@
+"""
+任务依赖图的内存索引：按项目缓存邻接表，循环检查在内存中完成
+
+两种依赖边分别建索引：
+    dependency    TaskDependency（前置任务 -> 后续任务）
+    prerequisite  Task.dependencies 多对多（被依赖的任务 -> 依赖它的任务）
+
+索引缓存在进程内（不经序列化，检查一次只需微秒级），以 (项目数据版本, 项目创建时间) 为版本：
+依赖增删时信号会递增项目数据版本，下次取用时重新加载（每次取用一条单行查询校验版本）。
+
+冗余依赖分析：A→B→C 已隐含 A→C 时，A→C 可以删除（传递约简）。只对零滞后的完成-开始依赖
+计算——这类边组成的路径才隐含同类的直接边。
+"""
+import threading
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+
+from gantt.services import dependency_queryset
+from projects.changelog import record_queryset_changes
+from projects.deletion import delete_in_batches
+from projects.models import ChangeLog, Project
+from .models import Task, TaskDependency
+
+# 进程内最多缓存的项目依赖图数
+GRAPH_CACHE_SIZE = 32
+# 删除冗余依赖时每条查询的ID数（SQLite参数个数有上限）
+DELETE_BATCH_SIZE = 500
+
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def topological_levels(nodes, edges):
+    """
+    Kahn拓扑排序：edges 为 {节点: 其前驱节点集合}（只含 nodes 内的节点）。
+    返回 (按层分组的节点列表, 处于环上或夹在环之间的节点集合)
+    """
+    indegree = {node: len(edges.get(node, ())) for node in nodes}
+    successors = {}
+    for node, predecessors in edges.items():
+        for predecessor in predecessors:
+            successors.setdefault(predecessor, []).append(node)
+
+    levels = []
+    level = [node for node, degree in indegree.items() if degree == 0]
+    while level:
+        levels.append(level)
+        following = []
+        for node in level:
+            for successor in successors.get(node, ()):
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    following.append(successor)
+        level = following
+
+    remaining = {node for node, degree in indegree.items() if degree > 0}
+    # 再从末端剥离只是“下游受环阻塞”的节点，剩下的才是环上（或环之间）的节点
+    outdegree = {node: 0 for node in remaining}
+    for node in remaining:
+        for predecessor in edges.get(node, ()):
+            if predecessor in remaining:
+                outdegree[predecessor] += 1
+    sinks = [node for node, degree in outdegree.items() if degree == 0]
+    while sinks:
+        node = sinks.pop()
+        remaining.discard(node)
+        for predecessor in edges.get(node, ()):
+            if predecessor in remaining:
+                outdegree[predecessor] -= 1
+                if outdegree[predecessor] == 0:
+                    sinks.append(predecessor)
+    return levels, remaining
+
+
+class DependencyGraph:
+    """依赖图邻接表（任务ID），边为 前置 -> 后续"""
+
+    def __init__(self, edges):
+        self.successors = {}
+        self.predecessors = {}
+        for predecessor, successor in edges:
+            self.successors.setdefault(predecessor, set()).add(successor)
+            self.predecessors.setdefault(successor, set()).add(predecessor)
+
+    def reaches(self, start, target):
+        """start 沿依赖方向能否到达 target（迭代DFS，每个节点只访问一次）"""
+        if start == target:
+            return True
+        visited = {start}
+        stack = [start]
+        while stack:
+            for successor in self.successors.get(stack.pop(), ()):
+                if successor == target:
+                    return True
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append(successor)
+        return False
+
+    def would_create_cycle(self, predecessor_id, successor_id):
+        """添加 前置 -> 后续 这条边是否会形成环"""
+        return self.reaches(successor_id, predecessor_id)
+
+    def cyclic_edges(self, new_edges):
+        """
+        一次拓扑排序检查一批新边：返回会处于环上的新边列表（为空表示可以全部添加）。
+        只需对新边可达的部分排序：新边的后续任务出发可达的节点
+        """
+        new_edges = list(new_edges)
+        pending, pending_successors = {}, {}
+        for predecessor, successor in new_edges:
+            pending.setdefault(successor, set()).add(predecessor)
+            pending_successors.setdefault(predecessor, []).append(successor)
+
+        # 环必经过某条新边，因此只在新边后续任务可达的子图内排序
+        nodes = set()
+        stack = list(pending)
+        while stack:
+            node = stack.pop()
+            if node in nodes:
+                continue
+            nodes.add(node)
+            stack.extend(self.successors.get(node, ()))
+            stack.extend(pending_successors.get(node, ()))
+
+        edges = {}
+        for node in nodes:
+            predecessors = (self.predecessors.get(node, set()) | pending.get(node, set())) & nodes
+            if predecessors:
+                edges[node] = predecessors
+        _, cyclic = topological_levels(nodes, edges)
+        return [(predecessor, successor) for predecessor, successor in new_edges
+                if predecessor in cyclic and successor in cyclic]
+
+
+def _load_edges(kind, project_id):
+    """项目内任务相关的全部依赖边（任一端属于该项目）"""
+    if kind == 'dependency':
+        return TaskDependency.objects.filter(
+            Q(predecessor__worksite__project_id=project_id) | Q(successor__worksite__project_id=project_id)
+        ).order_by().values_list('predecessor_id', 'successor_id')
+    through = Task.dependencies.through
+    return through.objects.filter(
+        Q(from_task__worksite__project_id=project_id) | Q(to_task__worksite__project_id=project_id)
+    ).order_by().values_list('to_task_id', 'from_task_id')
+
+
+def _cached_graph(kind, **project_filter):
+    """按条件找到项目并返回其依赖图索引（进程内缓存，项目数据版本变化后重新加载）"""
+    row = Project.all_objects.filter(**project_filter).values_list('pk', 'data_version', 'created_at').first()
+    if row is None:
+        return DependencyGraph(())
+    # 项目ID可能被重用（如回滚的事务中创建的项目），版本中加入创建时间
+    project_id, *version = row
+    key = (kind, project_id)
+    with _graphs_lock:
+        cached = _graphs.get(key)
+        if cached is not None and cached[0] == version:
+            _graphs.move_to_end(key)
+            return cached[1]
+
+    graph = DependencyGraph(_load_edges(kind, project_id))
+    # 事务中读到的是未提交的数据，不放入进程共享的缓存
+    if not transaction.get_connection().in_atomic_block:
+        with _graphs_lock:
+            _graphs[key] = (version, graph)
+            while len(_graphs) > GRAPH_CACHE_SIZE:
+                _graphs.popitem(last=False)
+    return graph
+
+
+def project_graph(project_id, kind='dependency'):
+    """项目的依赖图索引"""
+    return _cached_graph(kind, pk=project_id)
+
+
+def task_graph(task, kind='dependency'):
+    """任务所属项目的依赖图索引（版本校验与查找项目为同一条查询）"""
+    return _cached_graph(kind, worksites=task.worksite_id)
+
+
+def add_dependencies(successor, predecessors, dependency_type='finish_to_start', lag_days=0):
+    """
+    为 successor 批量添加前置任务（跳过已有的），一次拓扑排序校验后 bulk_create。
+    会形成循环依赖时抛出 ValidationError（不添加任何依赖）。返回新建的依赖列表
+    """
+    if dependency_type not in dict(TaskDependency.DEPENDENCY_TYPE_CHOICES):
+        raise ValidationError(f'无效的依赖类型: {dependency_type}')
+    graph = task_graph(successor)
+    existing = graph.predecessors.get(successor.pk, set())
+    new = [predecessor for predecessor in dict.fromkeys(predecessors) if predecessor.pk not in existing]
+    cyclic = graph.cyclic_edges((predecessor.pk, successor.pk) for predecessor in new)
+    if cyclic:
+        names = {predecessor.pk: predecessor.name for predecessor in new}
+        listed = '、'.join(f'“{names[predecessor_id]}”' for predecessor_id, _ in cyclic)
+        raise ValidationError(f'与任务{listed}存在循环依赖关系')
+
+    with transaction.atomic():
+        created = TaskDependency.objects.bulk_create([
+            TaskDependency(predecessor=predecessor, successor=successor,
+                           dependency_type=dependency_type, lag_days=lag_days)
+            for predecessor in new
+        ])
+        # bulk_create 不触发信号：补记变更日志并使项目缓存失效
+        if created:
+            record_queryset_changes(
+                'dependency', TaskDependency.objects.filter(successor=successor, predecessor__in=new),
+                ChangeLog.ACTION_UPSERT, worksite_field='successor__worksite',
+            )
+            Project.objects.filter(worksites=successor.worksite_id).touch()
+    return created
+
+
+def _components(nodes, edges):
+    """弱连通分量（并查集），返回 {代表节点: [节点, ...]}，节点保持 nodes 中的顺序"""
+    parent = {node: node for node in nodes}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for predecessor, successor in edges:
+        parent[find(predecessor)] = find(successor)
+    components = {}
+    for node in nodes:
+        components.setdefault(find(node), []).append(node)
+    return components
+
+
+def transitive_reduction(edges):
+    """
+    edges 为 (边ID, 前置, 后续) 序列，返回冗余边 [(边ID, 前置, 后续, 经由的另一后续任务), ...]。
+
+    按逆拓扑序为每个节点计算可达集合（Python 整数作位集，按弱连通分量分别编号以控制位数）：
+    u 的某条出边 u→v 冗余，当且仅当 v 在 u 的其他后续任务的可达集合中。
+    处于环上的节点（正常不会出现）不参与计算。
+    """
+    successors = {}
+    predecessors = {}
+    for edge_id, predecessor, successor in edges:
+        successors.setdefault(predecessor, []).append((successor, edge_id))
+        predecessors.setdefault(successor, set()).add(predecessor)
+    nodes = set(successors) | set(predecessors)
+    levels, cyclic = topological_levels(nodes, predecessors)
+    order = [node for level in levels for node in level]
+    acyclic_edges = [
+        (predecessor, successor) for predecessor, targets in successors.items() if predecessor not in cyclic
+        for successor, _ in targets if successor not in cyclic
+    ]
+
+    redundant = []
+    for component in _components(order, acyclic_edges).values():
+        # 后续任务在拓扑序中靠后：按逆序编号，可达集合只用到较低的位
+        bit = {node: 1 << index for index, node in enumerate(reversed(component))}
+        waiting = {node: len(predecessors.get(node, ())) for node in component}
+        reach = {}
+        for node in reversed(component):
+            targets = [(successor, edge_id) for successor, edge_id in successors.get(node, ()) if successor not in cyclic]
+            below = 0
+            for successor, _ in targets:
+                below |= reach[successor]
+            for successor, edge_id in targets:
+                if below & bit[successor]:
+                    via = next(other for other, _ in targets if other != successor and reach[other] & bit[successor])
+                    redundant.append((edge_id, node, successor, via))
+            reach[node] = below | sum(bit[successor] for successor, _ in targets)
+            # 所有前置任务都已计算完毕的节点不再需要可达集合
+            for successor, _ in targets:
+                waiting[successor] -= 1
+                if not waiting[successor]:
+                    del reach[successor]
+    return redundant
+
+
+def redundant_dependencies(project):
+    """项目中冗余的零滞后完成-开始依赖，返回 transitive_reduction() 的结果"""
+    edges = dependency_queryset(project).filter(dependency_type='finish_to_start', lag_days=0)
+    return transitive_reduction(edges.order_by().values_list('pk', 'predecessor_id', 'successor_id'))
+
+
+def remove_redundant_dependencies(project):
+    """批量删除项目中的冗余依赖（分批提交，补记删除日志），返回删除数"""
+    edge_ids = [edge_id for edge_id, *_ in redundant_dependencies(project)]
+
+    def on_batch(ids):
+        record_queryset_changes(
+            'dependency', TaskDependency.objects.filter(pk__in=ids), ChangeLog.ACTION_DELETE,
+            worksite_field='successor__worksite',
+        )
+        Project.objects.filter(pk=project.pk).touch()
+
+    removed = 0
+    for start in range(0, len(edge_ids), DELETE_BATCH_SIZE):
+        removed += delete_in_batches(
+            TaskDependency.objects.filter(pk__in=edge_ids[start:start + DELETE_BATCH_SIZE]), on_batch=on_batch
+        )
+    return removed
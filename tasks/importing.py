@@ -0,0 +1,404 @@
+"""
+从电子表格（CSV/Excel）批量导入任务
+
+每行一个任务，表头可用英文字段名（与 ExportUtils 导出的表头相同，如 "Responsible Person"）或中文列名:
+    编号(ref)、任务名称(name)、任务类型(task_type)、任务状态(status)、负责人(responsible_person)、
+    任务描述(description)、开始日期(start_date)、结束日期(end_date)、截止时间(deadline)、
+    工地(worksite)、父任务(parent)、前置任务(predecessor)、依赖类型(dependency_type)、滞后天数(lag_days)
+
+父任务/前置任务填写文件中另一行的编号（无编号列时为任务名称），或 "#ID" 引用项目中已有的任务；
+前置任务可用分号分隔多个，依赖类型与滞后天数对该行所有前置任务生效。
+
+逐行解析，不逐行 full_clean()：工地与已有任务的日期一次性预加载，日期规则（开始≤结束≤截止、
+在工地及父任务日期范围内）在内存中批量校验；父任务与依赖关系的循环各用一次拓扑排序检查。
+任何一行有错误时不导入任何数据并返回逐行错误报告；全部通过后按父任务层级 bulk_create 分批插入。
+"""
+import codecs
+import csv
+import io
+import re
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.backends.base.operations import BaseDatabaseOperations
+
+from projects.changelog import record_queryset_changes
+from projects.models import ChangeLog, Project, WorkSite
+from projects.transfer import bulk_insert
+from .graph import topological_levels
+from .models import Task, TaskDependency
+
+IMPORT_BATCH_SIZE = 2000
+# 判断CSV编码时读取的开头字节数
+CSV_SAMPLE_SIZE = 64 * 1024
+# 滞后天数的取值范围（IntegerField 在各数据库上都能存储的范围）
+LAG_DAYS_RANGE = BaseDatabaseOperations.integer_field_ranges['IntegerField']
+
+# 字段 -> 可接受的表头（英文表头按小写、空格/连字符转下划线后比较）
+COLUMN_ALIASES = {
+    'ref': ('ref', 'id', '编号', '序号'),
+    'name': ('name', '任务名称', '名称'),
+    'task_type': ('task_type', 'type', '任务类型', '类型'),
+    'status': ('status', '任务状态', '状态'),
+    'responsible_person': ('responsible_person', '负责人'),
+    'description': ('description', '任务描述', '描述'),
+    'start_date': ('start_date', '开始日期'),
+    'end_date': ('end_date', '结束日期'),
+    'deadline': ('deadline', '截止时间', '截止日期'),
+    'worksite': ('worksite', '工地', '所属工地'),
+    'parent': ('parent', 'parent_task', '父任务'),
+    'predecessor': ('predecessor', 'predecessors', '前置任务'),
+    'dependency_type': ('dependency_type', '依赖类型'),
+    'lag_days': ('lag_days', 'lag', '滞后天数'),
+}
+REQUIRED_COLUMNS = ('name', 'responsible_person', 'start_date', 'end_date')
+
+DATE_SEPARATORS = re.compile(r'[-/.]')
+
+
+class TaskImportError(Exception):
+    """文件无法读取或缺少必需的列（行内错误见导入报告）"""
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _column_map(header):
+    """表头 -> {列序号: 字段}，缺少必需列时抛出 TaskImportError"""
+    lookup = {_normalize_header(alias): field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    columns = {}
+    for index, value in enumerate(header):
+        field = lookup.get(_normalize_header(value))
+        if field and field not in columns.values():
+            columns[index] = field
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns.values()]
+    if missing:
+        labels = '、'.join(COLUMN_ALIASES[field][-1] for field in missing)
+        raise TaskImportError(f'缺少必需的列: {labels}')
+    return columns
+
+
+def _iter_records(rows):
+    """(行号, 单元格列表) -> (行号, {字段: 值})，跳过空行"""
+    columns = None
+    for line_number, cells in rows:
+        if columns is None:
+            columns = _column_map(cells)
+            continue
+        record = {
+            field: cells[index] for index, field in columns.items()
+            if index < len(cells) and cells[index] not in (None, '')
+        }
+        if any(str(value).strip() for value in record.values()):
+            yield line_number, record
+    if columns is None:
+        raise TaskImportError('文件为空')
+
+
+def _csv_encoding(file):
+    """开头一段能按UTF-8解码时为 utf-8-sig（兼容Excel另存的带BOM的CSV），否则按 gb18030（兼容中文Excel默认的GBK）"""
+    sample = file.read(CSV_SAMPLE_SIZE)
+    file.seek(0)
+    try:
+        # final=False：截断在多字节字符中间的结尾不算错误
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'utf-8-sig'
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding=_csv_encoding(file), newline='')
+    try:
+        yield from enumerate(csv.reader(text), 1)
+    except UnicodeDecodeError:
+        raise TaskImportError('无法识别文件编码，请将CSV文件另存为UTF-8编码后重新导入')
+
+
+def read_spreadsheet(file, filename):
+    """逐行读取上传/打开的文件（二进制），按扩展名识别 CSV 或 Excel(.xlsx)，返回 (行号, 记录) 迭代器"""
+    if str(filename).lower().endswith('.xlsx'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise TaskImportError('导入Excel文件需要安装 openpyxl: pip install openpyxl')
+        try:
+            sheet = load_workbook(file, read_only=True, data_only=True).active
+        except Exception as e:
+            raise TaskImportError(f'无法读取Excel文件: {e}')
+        rows = enumerate(sheet.iter_rows(values_only=True), 1)
+    else:
+        rows = _csv_rows(file)
+    return _iter_records(rows)
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # 2025-03-01、2025/3/1、2025.3.1（不用 strptime：逐行调用开销大）
+    parts = DATE_SEPARATORS.split(str(value).strip())
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(value)
+    return date(*map(int, parts))
+
+
+def _choice_lookup(choices):
+    """选项值与中文名称都可识别"""
+    lookup = {}
+    for value, label in choices:
+        lookup[value] = value
+        lookup[label] = value
+    return lookup
+
+
+TASK_TYPES = _choice_lookup(Task.TASK_TYPE_CHOICES)
+TASK_STATUSES = _choice_lookup(Task.STATUS_CHOICES)
+DEPENDENCY_TYPES = _choice_lookup(TaskDependency.DEPENDENCY_TYPE_CHOICES)
+
+
+def _text(record, field):
+    value = record.get(field, '')
+    if isinstance(value, float) and value.is_integer():
+        # Excel 中的数字编号读出为浮点数
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_reference(value):
+    """"#12" 引用已有任务（返回 ('task', 12)），其他为文件内编号（返回 ('ref', 编号)）"""
+    if value.startswith('#') and value[1:].isdigit():
+        return 'task', int(value[1:])
+    return 'ref', value
+
+
+class _Row:
+    """解析后的一行"""
+
+    __slots__ = ('line', 'ref', 'fields', 'parent', 'predecessors', 'dependency_type', 'lag_days', 'task')
+
+    def __init__(self, line, ref):
+        self.line = line
+        self.ref = ref
+        self.fields = {}
+        self.parent = None
+        self.predecessors = []
+        self.dependency_type = 'finish_to_start'
+        self.lag_days = 0
+        self.task = None
+
+
+class TaskImporter:
+    """
+    将表格行导入项目：worksite 为未填写工地列时使用的默认工地（项目只有一个工地时默认为该工地）。
+    run() 返回导入报告 {'created': 任务数, 'dependencies': 依赖数, 'errors': [{'row': 行号, 'errors': [...]}]}
+    """
+
+    def __init__(self, project, worksite=None, batch_size=IMPORT_BATCH_SIZE):
+        self.project = project
+        self.batch_size = batch_size
+        self.worksites = {ws.name: ws for ws in WorkSite.objects.filter(project=project)}
+        if worksite is None and len(self.worksites) == 1:
+            # 项目只有一个工地时无需填写工地列
+            worksite, = self.worksites.values()
+        self.default_worksite = worksite
+        self.rows = []
+        self.by_ref = {}
+        self.errors = {}
+        self.max_lengths = {
+            field: Task._meta.get_field(field).max_length for field in ('name', 'responsible_person')
+        }
+
+    def error(self, row, message):
+        self.errors.setdefault(row.line, []).append(message)
+
+    def add(self, line, record):
+        """解析并校验一行的字段（不涉及其他行）"""
+        ref = _text(record, 'ref') or _text(record, 'name')
+        row = _Row(line, ref)
+        self.rows.append(row)
+        if ref in self.by_ref:
+            self.error(row, f'编号“{ref}”与第{self.by_ref[ref].line}行重复')
+        else:
+            self.by_ref[ref] = row
+
+        fields = row.fields
+        for field in ('name', 'responsible_person'):
+            value = _text(record, field)
+            label = Task._meta.get_field(field).verbose_name
+            if not value:
+                self.error(row, f'{label}不能为空')
+            elif len(value) > self.max_lengths[field]:
+                self.error(row, f'{label}超过{self.max_lengths[field]}个字符')
+            fields[field] = value
+        fields['description'] = _text(record, 'description')
+
+        for field, lookup, default in (('task_type', TASK_TYPES, 'new_construction'), ('status', TASK_STATUSES, 'open')):
+            value = _text(record, field)
+            fields[field] = lookup.get(value) if value else default
+            if fields[field] is None:
+                self.error(row, f'无效的{Task._meta.get_field(field).verbose_name}: {value}')
+
+        for field in ('start_date', 'end_date', 'deadline'):
+            if field not in record:
+                if field != 'deadline':
+                    self.error(row, f'{Task._meta.get_field(field).verbose_name}不能为空')
+                continue
+            try:
+                fields[field] = _parse_date(record[field])
+            except ValueError:
+                self.error(row, f'无效的{Task._meta.get_field(field).verbose_name}: {record[field]}')
+        if 'deadline' not in fields and 'end_date' in fields:
+            fields['deadline'] = fields['end_date']
+        start, end, deadline = (fields.get(name) for name in ('start_date', 'end_date', 'deadline'))
+        if start and end and start > end:
+            self.error(row, '开始日期不能晚于结束日期')
+        if end and deadline and end > deadline:
+            self.error(row, '结束日期不能晚于截止时间')
+
+        worksite_name = _text(record, 'worksite')
+        worksite = self.worksites.get(worksite_name) if worksite_name else self.default_worksite
+        if worksite is None:
+            self.error(row, f'工地不存在: {worksite_name}' if worksite_name else '未指定工地')
+        else:
+            fields['worksite'] = worksite
+            if start and start < worksite.start_date:
+                self.error(row, '任务开始日期不能早于工地开始日期')
+            if end and end > worksite.end_date:
+                self.error(row, '任务结束日期不能晚于工地结束日期')
+
+        if _text(record, 'parent'):
+            row.parent = _parse_reference(_text(record, 'parent'))
+        row.predecessors = [
+            _parse_reference(value.strip()) for value in _text(record, 'predecessor').replace('；', ';').split(';')
+            if value.strip()
+        ]
+        dependency_type = _text(record, 'dependency_type')
+        if dependency_type:
+            row.dependency_type = DEPENDENCY_TYPES.get(dependency_type)
+            if row.dependency_type is None:
+                self.error(row, f'无效的依赖类型: {dependency_type}')
+        if 'lag_days' in record:
+            try:
+                row.lag_days = int(float(str(record['lag_days']).strip()))
+            except (ValueError, OverflowError):
+                # 无穷大转换为整数时抛出 OverflowError
+                self.error(row, f"无效的滞后天数: {record['lag_days']}")
+            else:
+                if not LAG_DAYS_RANGE[0] <= row.lag_days <= LAG_DAYS_RANGE[1]:
+                    self.error(row, f"滞后天数超出范围: {record['lag_days']}")
+
+    def _existing_tasks(self):
+        """一次查询加载 "#ID" 引用的项目内已有任务（父任务只需日期）"""
+        ids = {
+            target for row in self.rows for kind, target in filter(None, [row.parent, *row.predecessors])
+            if kind == 'task'
+        }
+        if not ids:
+            return {}
+        tasks = Task.objects.filter(pk__in=ids, worksite__project=self.project).live()
+        return {task.pk: task for task in tasks.only('pk', 'name', 'start_date', 'end_date')}
+
+    def _resolve(self, row, reference, existing):
+        """引用 -> 文件中的行或已有任务，找不到时返回None"""
+        kind, target = reference
+        if kind == 'task':
+            return existing.get(target)
+        return self.by_ref.get(target)
+
+    def validate_relations(self):
+        """父任务日期范围与循环检查（需全部行解析完成）"""
+        existing = self._existing_tasks()
+        parent_edges, dependency_edges = {}, {}
+        for row in self.rows:
+            if row.parent is not None:
+                parent = self._resolve(row, row.parent, existing)
+                if parent is None:
+                    self.error(row, f'父任务不存在: {row.parent[1]}')
+                    row.parent = None
+                else:
+                    row.parent = parent
+                    if isinstance(parent, _Row):
+                        parent_edges[row] = {parent}
+                        parent_dates = parent.fields
+                    else:
+                        parent_dates = {'start_date': parent.start_date, 'end_date': parent.end_date}
+                    start, end = row.fields.get('start_date'), row.fields.get('end_date')
+                    if start and parent_dates.get('start_date') and start < parent_dates['start_date']:
+                        self.error(row, '子任务开始日期不能早于父任务开始日期')
+                    if end and parent_dates.get('end_date') and end > parent_dates['end_date']:
+                        self.error(row, '子任务结束日期不能晚于父任务结束日期')
+
+            predecessors = []
+            for reference in row.predecessors:
+                predecessor = self._resolve(row, reference, existing)
+                if predecessor is None:
+                    self.error(row, f'前置任务不存在: {reference[1]}')
+                elif predecessor not in predecessors:
+                    predecessors.append(predecessor)
+            row.predecessors = predecessors
+            # 已有任务不会依赖新任务，环只可能出现在文件内的任务之间
+            internal = {predecessor for predecessor in predecessors if isinstance(predecessor, _Row)}
+            if internal:
+                dependency_edges[row] = internal
+
+        self.parent_levels, cyclic = topological_levels(self.rows, parent_edges)
+        for row in cyclic:
+            self.error(row, '父任务关系存在循环')
+        _, cyclic = topological_levels(self.rows, dependency_edges)
+        for row in cyclic:
+            self.error(row, '前置任务关系存在循环依赖')
+
+    def report(self, created=0, dependencies=0):
+        return {
+            'created': created,
+            'dependencies': dependencies,
+            'errors': [{'row': line, 'errors': self.errors[line]} for line in sorted(self.errors)],
+        }
+
+    def run(self, records, dry_run=False):
+        for line, record in records:
+            self.add(line, record)
+        self.validate_relations()
+        # 只有表头的文件没有可导入的行
+        if self.errors or dry_run or not self.rows:
+            return self.report()
+
+        with transaction.atomic():
+            # 父任务先插入（逐层），同一层内按批 bulk_create
+            for level in self.parent_levels:
+                for row in level:
+                    parent = row.parent.task if isinstance(row.parent, _Row) else row.parent
+                    row.task = Task(parent_task=parent, **row.fields)
+                bulk_insert(Task, [row.task for row in level], self.batch_size)
+
+            dependencies = [
+                TaskDependency(
+                    predecessor=predecessor.task if isinstance(predecessor, _Row) else predecessor,
+                    successor=row.task, dependency_type=row.dependency_type, lag_days=row.lag_days,
+                )
+                for row in self.rows for predecessor in row.predecessors
+            ]
+            bulk_insert(TaskDependency, dependencies, self.batch_size)
+
+            # bulk_create 不触发信号：重算计数缓存（同时递增数据版本），补记变更日志。
+            # 按主键区间而非ID列表筛选（避免超过SQLite参数上限），区间内其他并发新增的任务多记一条无妨
+            task_ids = [row.task.pk for row in self.rows]
+            imported = {'worksite__project': self.project, 'pk__range': (min(task_ids), max(task_ids))}
+            WorkSite.objects.filter(project=self.project).refresh_counters()
+            Project.objects.filter(pk=self.project.pk).refresh_counters()
+            record_queryset_changes('task', Task.objects.filter(**imported), ChangeLog.ACTION_UPSERT)
+            if dependencies:
+                record_queryset_changes(
+                    'dependency',
+                    TaskDependency.objects.filter(**{f'successor__{key}': value for key, value in imported.items()}),
+                    ChangeLog.ACTION_UPSERT, worksite_field='successor__worksite',
+                )
+        return self.report(created=len(self.rows), dependencies=len(dependencies))
+
+
+def import_tasks(file, filename, project, worksite=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """读取表格文件并导入到 project，返回导入报告（见 TaskImporter）；文件级错误抛出 TaskImportError"""
+    return TaskImporter(project, worksite, batch_size).run(read_spreadsheet(file, filename), dry_run=dry_run)
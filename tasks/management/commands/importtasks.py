@@ -0,0 +1,56 @@
+"""
+从CSV/Excel表格批量导入任务到项目，有错误时不导入并列出出错的行
+
+示例:
+    python manage.py importtasks tasks.xlsx --project 3 --worksite "1号楼" --dry-run
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project, WorkSite
+from tasks.importing import IMPORT_BATCH_SIZE, TaskImportError, import_tasks
+
+
+class Command(BaseCommand):
+    help = '从CSV/Excel表格批量导入任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='表格文件路径（.csv 或 .xlsx）')
+        parser.add_argument('--project', type=int, required=True, help='导入到的项目ID')
+        parser.add_argument('--worksite', help='表格中未填写工地时使用的工地名称')
+        parser.add_argument('--dry-run', action='store_true', help='只校验，不写入数据库')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='每批插入的行数')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError(f"项目 {options['project']} 不存在")
+        worksite = None
+        if options['worksite']:
+            worksite = WorkSite.objects.filter(project=project, name=options['worksite']).first()
+            if worksite is None:
+                raise CommandError(f"项目中没有名为 {options['worksite']} 的工地")
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_tasks(
+                    file, options['path'], project, worksite,
+                    dry_run=options['dry_run'], batch_size=options['batch_size'],
+                )
+        except (OSError, TaskImportError) as e:
+            raise CommandError(f'导入失败: {e}')
+
+        if report['errors']:
+            for error in report['errors']:
+                self.stderr.write(f"第{error['row']}行: {'；'.join(error['errors'])}")
+            raise CommandError(f"{len(report['errors'])} 行有错误，未导入任何任务")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('校验通过（未写入数据库）'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"已导入任务 {report['created']} 个、依赖 {report['dependencies']} 条，"
+            f'耗时 {time.perf_counter() - started:.2f} 秒'
+        ))
@@ -0,0 +1,49 @@
+"""
+查找项目中冗余的任务依赖（A→B→C 已隐含 A→C，只针对零滞后的完成-开始依赖），可选批量删除
+
+示例:
+    python manage.py reducedependencies --project 3
+    python manage.py reducedependencies --project 3 --apply
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from projects.models import Project
+from tasks.graph import redundant_dependencies, remove_redundant_dependencies
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = '查找并可选删除项目中的冗余任务依赖（传递约简）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, required=True, help='项目ID')
+        parser.add_argument('--apply', action='store_true', help='删除找到的冗余依赖')
+        parser.add_argument('--limit', type=int, default=20, help='最多列出的冗余依赖条数')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project'])
+        except Project.DoesNotExist:
+            raise CommandError(f"项目 {options['project']} 不存在")
+
+        started = time.perf_counter()
+        redundant = redundant_dependencies(project)
+        elapsed = time.perf_counter() - started
+        listed = redundant[:options['limit']]
+        names = dict(Task.objects.filter(
+            pk__in={task_id for _, *task_ids in listed for task_id in task_ids}
+        ).values_list('pk', 'name'))
+        for edge_id, predecessor_id, successor_id, via_id in listed:
+            self.stdout.write(
+                f'#{edge_id} {names[predecessor_id]} → {names[successor_id]}'
+                f'（已由 {names[predecessor_id]} → {names[via_id]} → … 隐含）'
+            )
+        if len(redundant) > len(listed):
+            self.stdout.write(f'…… 另有 {len(redundant) - len(listed)} 条')
+        self.stdout.write(f'冗余依赖 {len(redundant)} 条，分析耗时 {elapsed:.2f} 秒')
+
+        if options['apply'] and redundant:
+            removed = remove_redundant_dependencies(project)
+            self.stdout.write(self.style.SUCCESS(f'已删除冗余依赖 {removed} 条'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_dependencies_task_end_date_task_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'end_date'], name='task_status_end_idx'),
+        ),
+    ]
@@ -1,6 +1,41 @@
 from django.db import models
 from django.urls import reverse
 from django.utils import timezone
+from datetime import date
+
+from core.expressions import DaysBetween, time_progress_expression
+
+
+class TaskQuerySet(models.QuerySet):
+    """任务查询集 - 进度/逾期计算下推到数据库"""
+
+    def with_time_progress(self, today=None):
+        """注解 time_progress（与 Task.time_progress_percentage 相同规则）"""
+        today = today or date.today()
+        return self.annotate(time_progress=time_progress_expression(
+            today,
+            DaysBetween(models.F('end_date'), models.F('start_date')) + models.Value(1),
+            [
+                models.When(status='completed', then=models.Value(100)),
+                models.When(status='open', then=models.Value(0)),
+            ],
+        ))
+
+    def live(self):
+        """排除已软删除工地（含已删除项目的工地）下的任务"""
+        return self.filter(worksite__deleted_at__isnull=True)
+
+    def overdue(self, today=None):
+        """已超过结束日期但未完成的任务"""
+        today = today or date.today()
+        return self.filter(end_date__lt=today).exclude(status='completed')
+
+    def with_lateness(self, today=None):
+        """注解 days_overdue：超过结束日期的天数（未过期为负数）"""
+        today = today or date.today()
+        return self.annotate(days_overdue=DaysBetween(
+            models.Value(today, output_field=models.DateField()), models.F('end_date')
+        ))
 
 
 class Task(models.Model):
@@ -94,10 +129,15 @@ class Task(models.Model):
     # 更新时间
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         verbose_name = '任务'
         verbose_name_plural = '任务'
         ordering = ['-deadline']  # 按截止时间倒序
+        indexes = [
+            models.Index(fields=['status', 'end_date'], name='task_status_end_idx'),
+        ]
 
     def __str__(self):
         parent_info = f" (子任务: {self.parent_task.name})" if self.parent_task else ""
@@ -204,7 +244,8 @@ class Task(models.Model):
         else:
             total_days = self.duration_days
             elapsed_days = (today - self.start_date).days
-            return min(100, int((elapsed_days / total_days) * 100)) if total_days > 0 else 0
+            # 整数除法，与 with_time_progress() 的数据库计算结果一致
+            return min(100, elapsed_days * 100 // total_days) if total_days > 0 else 0
 
     def can_start(self):
         """检查任务是否可以开始（所有依赖任务都已完成）"""
@@ -233,26 +274,12 @@ class Task(models.Model):
         return chain
 
     def has_circular_dependency(self, new_dependency):
-        """检查是否会产生循环依赖"""
+        """检查添加 new_dependency 为依赖任务是否会产生循环依赖（查项目依赖图索引）"""
+        from .graph import task_graph
+
         if new_dependency == self:
             return True
-
-        # 检查新依赖是否依赖于当前任务
-        def check_circular(task, target, visited=None):
-            if visited is None:
-                visited = set()
-
-            if task.id in visited:
-                return False
-            visited.add(task.id)
-
-            if task == target:
-                return True
-
-            return any(check_circular(dep, target, visited.copy())
-                      for dep in task.dependencies.all())
-
-        return check_circular(new_dependency, self)
+        return task_graph(self, kind='prerequisite').would_create_cycle(new_dependency.pk, self.pk)
 
     def clean(self):
         """数据验证"""
@@ -351,26 +378,10 @@ class TaskDependency(models.Model):
             raise ValidationError('此依赖关系会创建循环依赖')
 
     def would_create_cycle(self):
-        """检查是否会创建循环依赖"""
-        def has_path(start, end, visited=None):
-            if visited is None:
-                visited = set()
-
-            if start.id in visited:
-                return False
-            visited.add(start.id)
+        """检查是否会创建循环依赖（查项目依赖图索引，不逐节点查询）"""
+        from .graph import task_graph
 
-            if start == end:
-                return True
-
-            # 检查所有后续任务
-            for dep in TaskDependency.objects.filter(predecessor=start):
-                if has_path(dep.successor, end, visited.copy()):
-                    return True
-
-            return False
-
-        return has_path(self.successor, self.predecessor)
+        return task_graph(self.successor).would_create_cycle(self.predecessor_id, self.successor_id)
 
     def save(self, *args, **kwargs):
         self.full_clean()
@@ -449,6 +460,9 @@ class TaskAnnotation(models.Model):
     # 创建时间
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
 
+    # 更新时间（离线同步的行版本）
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+
     class Meta:
         verbose_name = '任务标注'
         verbose_name_plural = '任务标注'
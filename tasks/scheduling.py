@@ -0,0 +1,149 @@
+"""
+批量调整任务日期：整体平移（天数）或按比例伸缩工期
+
+范围为工地、项目或某任务及其全部子任务。新日期由数据库表达式计算：先用两三条查询集合式地校验
+工地与父任务日期范围，通过后以一条 UPDATE（start_date = start_date + N ...）写入，不逐个任务
+save()/full_clean()。
+
+伸缩以范围内最早的开始日期为基准：新日期 = 基准 + 平移 + round((原日期 - 基准) × 比例)。
+平移与伸缩都是单调变换，范围内任务之间的 开始≤结束≤截止、子任务在父任务范围内 等关系保持不变，
+因此只需校验与范围外日期（工地、范围外的父任务/子任务）的关系。
+"""
+import math
+from fractions import Fraction
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DateField, F, Min, Q, Value
+from django.utils import timezone
+
+from core.expressions import AddDays, DaysBetween, IntegerDivide
+from projects.changelog import record_queryset_changes
+from projects.models import ChangeLog, Project
+from .models import Task
+
+DATE_FIELDS = ('start_date', 'end_date', 'deadline')
+
+# 校验失败时最多列出的任务数
+MAX_REPORTED_TASKS = 5
+
+
+def subtree_task_ids(root):
+    """任务及其全部子任务的ID（每层一次查询）"""
+    ids = [root.pk]
+    frontier = [root.pk]
+    while frontier:
+        frontier = list(Task.objects.filter(parent_task_id__in=frontier).values_list('pk', flat=True))
+        ids.extend(frontier)
+    return ids
+
+
+def scope_tasks(project=None, worksite=None, root=None):
+    """调整范围内的任务：项目、工地或任务子树（只含未删除工地的任务）"""
+    if root is not None:
+        return Task.objects.filter(pk__in=subtree_task_ids(root)).live()
+    if worksite is not None:
+        return Task.objects.filter(worksite=worksite).live()
+    return Task.objects.filter(worksite__project=project).live()
+
+
+class DateTransform:
+    """日期变换：平移 shift_days 天，并以 anchor 为基准按 scale 伸缩（Fraction）"""
+
+    def __init__(self, shift_days=0, scale=None, anchor=None):
+        self.shift_days = shift_days
+        if scale is not None and not math.isfinite(scale):
+            raise ValidationError('伸缩比例必须是有限的数值')
+        self.scale = Fraction(scale).limit_denominator(1000) if scale is not None else None
+        self.anchor = anchor
+        if self.scale is not None and self.scale <= 0:
+            raise ValidationError('伸缩比例必须大于0')
+
+    @property
+    def is_identity(self):
+        return not self.shift_days and (self.scale is None or self.scale == 1)
+
+    def expression(self, field):
+        """字段的新日期（数据库表达式）"""
+        if self.scale is None or self.scale == 1:
+            return AddDays(F(field), Value(self.shift_days))
+        anchor = Value(self.anchor, output_field=DateField())
+        numerator, denominator = self.scale.numerator, self.scale.denominator
+        # 距基准的天数非负，整数除法加半个分母即四舍五入
+        scaled = IntegerDivide(
+            DaysBetween(F(field), anchor) * Value(numerator) + Value(denominator // 2), Value(denominator)
+        )
+        return AddDays(anchor, scaled + Value(self.shift_days))
+
+
+def _violations(queryset, message):
+    names = list(queryset.values_list('name', flat=True)[:MAX_REPORTED_TASKS + 1])
+    if not names:
+        return []
+    listed = '、'.join(f'“{name}”' for name in names[:MAX_REPORTED_TASKS])
+    more = ' 等' if len(names) > MAX_REPORTED_TASKS else ''
+    return [f'{message}: {listed}{more}']
+
+
+def validate_reschedule(tasks, transform):
+    """集合式校验调整后的日期，返回错误信息列表"""
+    new = {f'new_{field}': transform.expression(field) for field in DATE_FIELDS}
+    moved = tasks.annotate(**new)
+    errors = []
+
+    # 工地日期范围
+    errors += _violations(
+        moved.filter(new_start_date__lt=F('worksite__start_date')), '任务开始日期将早于工地开始日期'
+    )
+    errors += _violations(
+        moved.filter(new_end_date__gt=F('worksite__end_date')), '任务结束日期将晚于工地结束日期'
+    )
+
+    # 父任务不在范围内（如子树的根任务）：新日期需在父任务原日期范围内
+    outside_parent = moved.filter(parent_task__isnull=False).exclude(parent_task__in=tasks)
+    errors += _violations(
+        outside_parent.filter(
+            Q(new_start_date__lt=F('parent_task__start_date')) | Q(new_end_date__gt=F('parent_task__end_date'))
+        ),
+        '子任务日期将超出父任务日期范围',
+    )
+
+    # 子任务不在范围内（如只调整某工地而子任务属于其他工地）：父任务新日期需包含子任务
+    parent_new = {
+        f'parent_new_{field}': transform.expression(f'parent_task__{field}') for field in ('start_date', 'end_date')
+    }
+    outside_children = Task.objects.filter(parent_task__in=tasks).exclude(pk__in=tasks).annotate(**parent_new)
+    errors += _violations(
+        outside_children.filter(
+            Q(start_date__lt=F('parent_new_start_date')) | Q(end_date__gt=F('parent_new_end_date'))
+        ),
+        '父任务调整后将不再包含这些子任务',
+    )
+    return errors
+
+
+def reschedule_tasks(tasks, shift_days=0, scale=None):
+    """
+    平移/伸缩 tasks（scope_tasks() 的结果）的日期，返回更新的任务数。
+    校验失败时抛出 ValidationError（不做任何修改）。
+    """
+    with transaction.atomic():
+        anchor = tasks.aggregate(anchor=Min('start_date'))['anchor']
+        if anchor is None:
+            return 0
+        transform = DateTransform(shift_days, scale, anchor)
+        if transform.is_identity:
+            return 0
+
+        errors = validate_reschedule(tasks, transform)
+        if errors:
+            raise ValidationError(errors)
+
+        updated = tasks.update(
+            updated_at=timezone.now(), **{field: transform.expression(field) for field in DATE_FIELDS}
+        )
+
+        # UPDATE 不触发信号：补记变更日志（增量同步/实时事件）并使项目缓存失效
+        record_queryset_changes('task', tasks, ChangeLog.ACTION_UPSERT)
+        Project.objects.filter(pk__in=tasks.values('worksite__project_id')).touch()
+    return updated
@@ -0,0 +1,48 @@
+"""
+任务依赖状态：一批任务的可开始状态、阻塞任务与依赖明细，共两条查询
+"""
+from .models import Task, TaskDependency
+
+STATUS_LABELS = dict(Task.STATUS_CHOICES)
+DEPENDENCY_TYPE_LABELS = dict(TaskDependency.DEPENDENCY_TYPE_CHOICES)
+
+
+def dependency_statuses(tasks):
+    """
+    tasks 查询集中每个任务的依赖状态 {任务ID: {...}}（与 task_dependency_status 的返回格式相同）。
+
+    第一条查询左连接依赖任务（多对多），没有依赖的任务也返回一行，由此得到任务列表、
+    can_start 与阻塞任务；第二条查询取依赖明细（TaskDependency 连同前置任务名称和状态）。
+    """
+    statuses = {}
+    rows = tasks.order_by('pk', '-dependencies__deadline').values_list(
+        'pk', 'dependencies__name', 'dependencies__status'
+    )
+    for task_id, name, status in rows:
+        entry = statuses.get(task_id)
+        if entry is None:
+            entry = statuses[task_id] = {
+                'can_start': True, 'dependencies': [], 'blocking_count': 0, 'blocking_tasks': [],
+            }
+        if name is not None and status != 'completed':
+            entry['blocking_tasks'].append({'name': name, 'status': STATUS_LABELS.get(status, status)})
+    if not statuses:
+        return statuses
+
+    details = TaskDependency.objects.filter(successor__in=tasks.values('pk')).order_by('created_at', 'pk')
+    for dependency_id, successor_id, name, status, dependency_type, lag_days in details.values_list(
+        'pk', 'successor_id', 'predecessor__name', 'predecessor__status', 'dependency_type', 'lag_days'
+    ):
+        statuses[successor_id]['dependencies'].append({
+            'id': dependency_id,
+            'predecessor_name': name,
+            'predecessor_status': STATUS_LABELS.get(status, status),
+            'predecessor_completed': status == 'completed',
+            'dependency_type': DEPENDENCY_TYPE_LABELS.get(dependency_type, dependency_type),
+            'lag_days': lag_days,
+        })
+
+    for entry in statuses.values():
+        entry['blocking_count'] = len(entry['blocking_tasks'])
+        entry['can_start'] = not entry['blocking_tasks']
+    return statuses
@@ -1,3 +1,531 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from core.querycount import NPlusOneError, NPlusOneMiddleware, NPlusOneTestMixin, fingerprint_sql
+from core.testing import create_project_fixture
+from drawings.models import Drawing
+from projects.models import ChangeLog, Project, WorkSite
+from .graph import DependencyGraph, add_dependencies, topological_levels, transitive_reduction
+from .models import Task, TaskAnnotation, TaskDependency
+from .services import dependency_statuses
+
+
+class NPlusOneDetectionTest(NPlusOneTestMixin, TestCase):
+    """N+1检测器测试"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, cls.worksite = create_project_fixture()
+        today = date.today()
+        parent = Task.objects.create(
+            worksite=cls.worksite, name='主任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+        for i in range(6):
+            Task.objects.create(
+                worksite=cls.worksite, parent_task=parent, name=f'子任务{i}', responsible_person='李四',
+                start_date=today, end_date=today + timedelta(days=5)
+            )
+
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            fingerprint_sql("SELECT *  FROM t WHERE id IN (%s) AND name = 'y' LIMIT 1"),
+        )
+
+    def test_str_without_select_related_is_flagged(self):
+        with self.assertRaises(NPlusOneError) as ctx:
+            with self.assertNoNPlusOne():
+                [str(task) for task in Task.objects.filter(parent_task__isnull=False)]
+        self.assertIn('tasks/models.py', str(ctx.exception))
+
+    def test_str_with_select_related_passes(self):
+        with self.assertNoNPlusOne() as fingerprinter:
+            [str(task) for task in Task.objects.filter(parent_task__isnull=False).select_related('parent_task')]
+        self.assertEqual(fingerprinter.total_queries, 1)
+
+    def test_call_site_only_resolved_past_threshold(self):
+        with mock.patch('core.querycount.find_call_site', return_value='here') as find_call_site:
+            with self.assertNoNPlusOne(threshold=3):
+                for _ in range(2):
+                    Task.objects.filter(pk=1).exists()
+            find_call_site.assert_not_called()
+
+            with self.assertRaises(NPlusOneError):
+                with self.assertNoNPlusOne(threshold=3):
+                    for _ in range(4):
+                        Task.objects.filter(pk=1).exists()
+            self.assertEqual(find_call_site.call_count, 2)
+
+    def test_middleware_chain_is_not_adapted_under_asgi(self):
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_async_middleware_detects_queries_from_sync_thread(self):
+        async def view(request):
+            await sync_to_async(lambda: [Task.objects.filter(pk=pk).exists() for pk in range(6)])()
+            return HttpResponse()
+
+        middleware = NPlusOneMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertRaises(NPlusOneError):
+            await middleware(RequestFactory().get('/tasks/'))
+
+    def test_explicit_zero_threshold_is_honoured(self):
+        with self.assertRaises(NPlusOneError):
+            with self.assertNoNPlusOne(threshold=0):
+                Task.objects.exists()
+
+
+class TaskQuerySetTest(TestCase):
+    """数据库端进度/逾期计算与Python属性一致性测试"""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        _, _, worksite = create_project_fixture(start=today - timedelta(days=100), days=200, worksite_days=200)
+        # (-29, 70)：已过29天、共100天，浮点计算 29 / 100 * 100 会截断为28
+        ranges = [(-90, -30), (-20, 20), (-5, 0), (10, 40), (0, 0), (-29, 70)]
+        for i, (start, end) in enumerate(ranges):
+            for status in ('open', 'in_progress', 'completed'):
+                Task.objects.create(
+                    worksite=worksite, name=f'任务{i}-{status}', responsible_person='张三', status=status,
+                    start_date=today + timedelta(days=start), end_date=today + timedelta(days=end)
+                )
+
+    def test_time_progress_matches_property(self):
+        for task in Task.objects.with_time_progress():
+            self.assertEqual(task.time_progress, task.time_progress_percentage, task.name)
+
+    def test_overdue_sorted_by_lateness(self):
+        overdue = list(Task.objects.overdue().with_lateness().order_by('-days_overdue'))
+        self.assertEqual([task.name for task in overdue], ['任务0-open', '任务0-in_progress'])
+        self.assertEqual(overdue[0].days_overdue, 30)
+
+
+class AnnotationEndpointTest(TestCase):
+    """异步标注接口：创建、更新、删除"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, worksite = create_project_fixture()
+        today = date.today()
+        cls.task = Task.objects.create(
+            worksite=worksite, name='任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=10)
+        )
+        cls.drawing = Drawing.objects.create(worksite=worksite, name='平面图', file='drawings/plan.pdf', file_size=1)
+
+    def post(self, url, data):
+        return self.client.post(url, data, content_type='application/json').json()
+
+    def test_annotation_lifecycle(self):
+        result = self.post(reverse('tasks:create_annotation'), {
+            'task_id': self.task.pk, 'annotation_type': 'point', 'x_coordinate': 10, 'y_coordinate': 20,
+        })
+        self.assertTrue(result['success'], result)
+        annotation = TaskAnnotation.objects.get(pk=result['annotation_id'])
+        self.assertEqual(annotation.drawing_id, self.drawing.pk)
+
+        result = self.post(reverse('tasks:update_annotation', args=[annotation.pk]), {'content': '裂缝'})
+        self.assertTrue(result['success'], result)
+        annotation.refresh_from_db()
+        self.assertEqual(annotation.content, '裂缝')
+
+        result = self.post(reverse('tasks:delete_annotation', args=[annotation.pk]), {})
+        self.assertTrue(result['success'], result)
+        self.assertFalse(TaskAnnotation.objects.exists())
+
+    def test_foreign_drawing_rejected(self):
+        other_worksite = WorkSite.objects.create(
+            project=self.task.worksite.project, name='工地2',
+            start_date=self.task.start_date, end_date=self.task.end_date
+        )
+        other = Drawing.objects.create(worksite=other_worksite, name='立面图', file='drawings/b.pdf', file_size=1)
+        result = self.post(reverse('tasks:create_annotation'), {
+            'task_id': self.task.pk, 'drawing_id': other.pk, 'annotation_type': 'point',
+            'x_coordinate': 1, 'y_coordinate': 1,
+        })
+        self.assertFalse(result['success'])
+
+
+class TaskDetailFragmentTest(TestCase):
+    """任务详情信息片段缓存：任务更新、项目数据版本与日期变化都会重新渲染"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.project, worksite = create_project_fixture()
+        today = date.today()
+        cls.task = Task.objects.create(
+            worksite=worksite, name='任务', responsible_person='张三',
+            start_date=today, end_date=today + timedelta(days=1), deadline=today + timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+        self.url = reverse('tasks:task_detail', kwargs={'pk': self.task.pk})
+
+    def test_overdue_badge_follows_today(self):
+        overdue_badge = '<span class="badge bg-danger ms-2">已逾期</span>'
+        self.assertNotContains(self.client.get(self.url), overdue_badge)
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=1)
+
+        with mock.patch('tasks.views.date', Tomorrow):
+            self.assertContains(self.client.get(self.url), '<span class="badge bg-warning ms-2">今日截止</span>')
+
+        class DayAfter(date):
+            @classmethod
+            def today(cls):
+                return date.today() + timedelta(days=2)
+
+        with mock.patch('tasks.views.date', DayAfter):
+            self.assertContains(self.client.get(self.url), overdue_badge)
+
+    def test_task_save_and_project_version_invalidate(self):
+        self.assertContains(self.client.get(self.url), '张三')
+
+        self.task.responsible_person = '李四'
+        self.task.save()
+        self.assertContains(self.client.get(self.url), '李四')
+
+        # 不经 save() 的写入只递增项目数据版本
+        Task.objects.filter(pk=self.task.pk).update(responsible_person='王五', updated_at=self.task.updated_at)
+        self.assertContains(self.client.get(self.url), '李四')
+        Project.objects.filter(pk=self.project.pk).touch()
+        self.assertContains(self.client.get(self.url), '王五')
+
+
+class RescheduleTest(TestCase):
+    """批量平移/伸缩任务日期：集合式校验与单条UPDATE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.base = date(2025, 1, 1)
+        cls.owner, cls.project, cls.worksite = create_project_fixture(start=cls.base, days=100, worksite_days=60)
+        cls.parent = cls.create_task('主体', 10, 20)
+        cls.child = cls.create_task('钢筋', 12, 18, parent_task=cls.parent)
+        cls.other = cls.create_task('装修', 30, 40, deadline=cls.day(45))
+
+    @classmethod
+    def day(cls, offset):
+        return cls.base + timedelta(days=offset)
+
+    @classmethod
+    def create_task(cls, name, start, end, **extra):
+        return Task.objects.create(
+            worksite=cls.worksite, name=name, responsible_person='张三',
+            start_date=cls.day(start), end_date=cls.day(end), **extra
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def reschedule(self, scope, object_id, **data):
+        return self.client.post(
+            reverse('tasks:task_reschedule'), {'scope': scope, 'id': object_id, **data},
+            content_type='application/json'
+        )
+
+    def dates(self, task):
+        task.refresh_from_db()
+        return task.start_date, task.end_date
+
+    def test_shift_worksite(self):
+        version = self.project.data_version
+        logged = ChangeLog.objects.filter(model='task').count()
+        response = self.reschedule('worksite', self.worksite.pk, shift_days=5)
+        self.assertEqual(response.json(), {'success': True, 'updated': 3})
+        self.assertEqual(self.dates(self.parent), (self.day(15), self.day(25)))
+        self.assertEqual(self.dates(self.child), (self.day(17), self.day(23)))
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.deadline, self.day(50))
+
+        self.assertEqual(ChangeLog.objects.filter(model='task').count(), logged + 3)
+        self.project.refresh_from_db()
+        self.assertGreater(self.project.data_version, version)
+
+    def test_scale_durations(self):
+        response = self.reschedule('project', self.project.pk, scale=1.5)
+        self.assertEqual(response.json()['updated'], 3)
+        # 以最早开始日期（第10天）为基准伸缩
+        self.assertEqual(self.dates(self.parent), (self.day(10), self.day(25)))
+        self.assertEqual(self.dates(self.child), (self.day(13), self.day(22)))
+        self.assertEqual(self.dates(self.other), (self.day(40), self.day(55)))
+
+    def test_non_finite_scale_rejected(self):
+        for scale in (float('nan'), float('inf'), '-inf'):
+            response = self.reschedule('project', self.project.pk, scale=scale)
+            self.assertEqual(response.status_code, 400, scale)
+            self.assertEqual(response.json()['errors'], ['伸缩比例必须是有限的数值'])
+        self.assertEqual(self.dates(self.parent), (self.day(10), self.day(20)))
+
+    def test_subtree_bounded_by_parent(self):
+        response = self.reschedule('task', self.child.pk, shift_days=5)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('钢筋', response.json()['errors'][0])
+        self.assertEqual(self.dates(self.child), (self.day(12), self.day(18)))
+
+        response = self.reschedule('task', self.parent.pk, shift_days=-3)
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(self.dates(self.child), (self.day(9), self.day(15)))
+        self.assertEqual(self.dates(self.other), (self.day(30), self.day(40)))
+
+    def test_worksite_bounds(self):
+        response = self.reschedule('worksite', self.worksite.pk, shift_days=25)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('装修', response.json()['errors'][0])
+        self.assertEqual(self.dates(self.parent), (self.day(10), self.day(20)))
+
+    def test_other_owner_forbidden(self):
+        intruder = get_user_model().objects.create_user('intruder', password='pass')
+        self.client.force_login(intruder)
+        response = self.reschedule('worksite', self.worksite.pk, shift_days=1)
+        self.assertEqual(response.status_code, 404)
+
+
+class TaskImportTest(TestCase):
+    """表格批量导入：批量校验、循环检测、逐行错误报告"""
+
+    HEADER = '编号,任务名称,任务类型,负责人,开始日期,结束日期,工地,父任务,前置任务,依赖类型,滞后天数\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user('owner', password='pass')
+        cls.project = Project.objects.create(
+            owner=cls.owner, name='项目', start_date=date(2025, 1, 1), end_date=date(2025, 12, 31)
+        )
+        cls.worksite = WorkSite.objects.create(
+            project=cls.project, name='1号楼', start_date=date(2025, 1, 1), end_date=date(2025, 6, 30)
+        )
+        cls.existing = Task.objects.create(
+            worksite=cls.worksite, name='场地平整', responsible_person='张三',
+            start_date=date(2025, 1, 1), end_date=date(2025, 1, 10)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def upload(self, rows, name='tasks.csv', encoding='utf-8-sig'):
+        content = (self.HEADER + rows).encode(encoding)
+        return self.client.post(
+            reverse('tasks:task_import', args=[self.project.pk]),
+            {'file': SimpleUploadedFile(name, content)},
+        )
+
+    def test_import(self):
+        response = self.upload(
+            f'1,主体结构,新建施工,李四,2025-02-01,2025-04-30,1号楼,,#{self.existing.pk},,\n'
+            '2,钢筋绑扎,,王五,2025/02/05,2025-03-01,1号楼,1,,,\n'
+            '3,混凝土浇筑,整改修复,王五,2025-03-02,2025-03-20,,1,2,完成-开始,2\n'
+        )
+        self.assertEqual(response.json(), {'success': True, 'created': 3, 'dependencies': 2, 'errors': []})
+
+        pour = Task.objects.get(name='混凝土浇筑')
+        self.assertEqual(pour.worksite, self.worksite)
+        self.assertEqual(pour.task_type, 'repair')
+        self.assertEqual(pour.deadline, date(2025, 3, 20))
+        self.assertEqual(pour.parent_task.name, '主体结构')
+        dependency = TaskDependency.objects.get(successor=pour)
+        self.assertEqual((dependency.predecessor.name, dependency.lag_days), ('钢筋绑扎', 2))
+        self.assertTrue(TaskDependency.objects.filter(predecessor=self.existing, successor__name='主体结构').exists())
+
+        self.worksite.refresh_from_db()
+        self.assertEqual(self.worksite.task_count, 4)
+        self.assertEqual(ChangeLog.objects.filter(model='task', object_id=pour.pk).count(), 1)
+
+    def test_row_errors_import_nothing(self):
+        response = self.upload(
+            '1,主体结构,,李四,2025-02-01,2025-04-30,1号楼,,3,,\n'
+            '2,钢筋绑扎,,王五,2025-01-20,2025-03-01,1号楼,1,,,\n'
+            '3,模板,,王五,2025-02-01,2025-03-01,1号楼,,1,,\n'
+            '4,装修,,王五,2025-05-01,2025-07-01,1号楼,,3,,\n'
+            '5,验收,,,2025-05-01,2025-04-01,2号楼,9,,,\n'
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = {error['row']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(errors[2], ['前置任务关系存在循环依赖'])
+        self.assertEqual(errors[3], ['子任务开始日期不能早于父任务开始日期'])
+        self.assertEqual(errors[4], ['前置任务关系存在循环依赖'])
+        # 依赖环下游的任务本身不在环上
+        self.assertEqual(errors[5], ['任务结束日期不能晚于工地结束日期'])
+        self.assertEqual(len(errors[6]), 4)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_header_only(self):
+        response = self.upload('')
+        self.assertEqual(response.json(), {'success': True, 'created': 0, 'dependencies': 0, 'errors': []})
+
+    def test_gbk_csv(self):
+        response = self.upload('1,主体结构,新建施工,李四,2025-02-01,2025-04-30,1号楼,,,,\n', encoding='gbk')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertTrue(Task.objects.filter(name='主体结构', responsible_person='李四').exists())
+
+    def test_invalid_lag_days(self):
+        response = self.upload(
+            '1,主体结构,,李四,2025-02-01,2025-04-30,1号楼,,,,\n'
+            '2,钢筋绑扎,,王五,2025-02-05,2025-03-01,1号楼,,1,,inf\n'
+            '3,模板,,王五,2025-02-05,2025-03-01,1号楼,,1,,1e30\n'
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = {error['row']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(errors, {3: ['无效的滞后天数: inf'], 4: ['滞后天数超出范围: 1e30']})
+
+    def test_missing_column(self):
+        response = self.client.post(
+            reverse('tasks:task_import', args=[self.project.pk]),
+            {'file': SimpleUploadedFile('tasks.csv', '任务名称,负责人\n主体,李四\n'.encode())},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('开始日期', response.json()['error'])
+
+    def test_topological_levels(self):
+        levels, cyclic = topological_levels('abcde', {'b': {'a'}, 'c': {'b', 'd'}, 'd': {'c'}, 'e': {'c'}})
+        self.assertEqual(levels, [['a'], ['b']])
+        self.assertEqual(cyclic, {'c', 'd'})
+
+
+class DependencyGraphTest(TestCase):
+    """依赖图索引：可达性检查与批量添加的循环校验"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, worksite = create_project_fixture(worksite_days=60)
+        today = date.today()
+        cls.a, cls.b, cls.c, cls.d = (
+            Task.objects.create(
+                worksite=worksite, name=name, responsible_person='张三',
+                start_date=today, end_date=today + timedelta(days=10)
+            )
+            for name in 'ABCD'
+        )
+        TaskDependency.objects.create(predecessor=cls.a, successor=cls.b)
+        TaskDependency.objects.create(predecessor=cls.b, successor=cls.c)
+
+    def test_diamond_chain(self):
+        # 30层菱形：逐路径搜索需要 2^30 步，索引中每个节点只访问一次
+        edges = []
+        for level in range(30):
+            top, left, right, bottom = 3 * level, 3 * level + 1, 3 * level + 2, 3 * level + 3
+            edges += [(top, left), (top, right), (left, bottom), (right, bottom)]
+        graph = DependencyGraph(edges)
+        self.assertTrue(graph.would_create_cycle(90, 0))
+        self.assertFalse(graph.would_create_cycle(0, 90))
+        self.assertFalse(graph.would_create_cycle(1, 2))
+
+    def test_cyclic_edges(self):
+        graph = DependencyGraph([(1, 2), (2, 3)])
+        self.assertEqual(graph.cyclic_edges([(3, 4), (4, 1), (3, 5)]), [(3, 4), (4, 1)])
+        self.assertEqual(graph.cyclic_edges([(1, 3), (4, 4)]), [(4, 4)])
+        self.assertEqual(graph.cyclic_edges([(3, 4), (4, 5)]), [])
+
+    def test_model_cycle_checks(self):
+        with self.assertRaisesMessage(ValidationError, '循环依赖'):
+            TaskDependency.objects.create(predecessor=self.c, successor=self.a)
+
+        self.b.dependencies.add(self.a)
+        self.assertTrue(self.a.has_circular_dependency(self.b))
+        self.assertFalse(self.c.has_circular_dependency(self.b))
+
+    def test_add_dependencies(self):
+        with self.assertRaisesMessage(ValidationError, '“C”'):
+            add_dependencies(self.a, [self.d, self.c])
+        self.assertFalse(TaskDependency.objects.filter(successor=self.a).exists())
+
+        # 查询数与添加的依赖数无关
+        with self.assertNumQueries(10):
+            created = add_dependencies(self.c, [self.a, self.b, self.d])
+        self.assertEqual(len(created), 2)
+        self.assertEqual(set(self.c.predecessor_dependencies.values_list('predecessor__name', flat=True)),
+                         {'A', 'B', 'D'})
+
+    def test_transitive_reduction(self):
+        edges = [(1, 'a', 'b'), (2, 'b', 'c'), (3, 'a', 'c'), (4, 'c', 'd'), (5, 'a', 'd'), (6, 'x', 'y')]
+        self.assertEqual(transitive_reduction(edges), [(3, 'a', 'c', 'b'), (5, 'a', 'd', 'b')])
+
+    def test_redundant_dependencies_endpoint(self):
+        redundant = TaskDependency.objects.create(predecessor=self.a, successor=self.c)
+        # 有滞后或非完成-开始的依赖不被隐含
+        TaskDependency.objects.create(predecessor=self.a, successor=self.d, dependency_type='start_to_start')
+        TaskDependency.objects.create(predecessor=self.b, successor=self.d, lag_days=2)
+        self.client.force_login(self.a.worksite.project.owner)
+        url = reverse('tasks:redundant_dependencies', args=[self.a.worksite.project_id])
+
+        self.assertEqual(self.client.get(url).json(), {'count': 1, 'dependencies': [{
+            'id': redundant.pk, 'predecessor_id': self.a.pk, 'successor_id': self.c.pk, 'via_id': self.b.pk,
+        }]})
+        self.assertEqual(self.client.post(url).json(), {'success': True, 'removed': 1})
+        self.assertFalse(TaskDependency.objects.filter(pk=redundant.pk).exists())
+        self.assertTrue(ChangeLog.objects.filter(
+            model='dependency', object_id=redundant.pk, action=ChangeLog.ACTION_DELETE
+        ).exists())
+        self.assertEqual(self.client.get(url).json()['count'], 0)
+
+
+class DependencyStatusTest(TestCase):
+    """批量依赖状态：与单任务接口一致，查询数固定"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, _, cls.worksite = create_project_fixture(worksite_days=60)
+        today = date.today()
+        cls.tasks = [
+            Task.objects.create(
+                worksite=cls.worksite, name=f'任务{i}', responsible_person='张三', status=status,
+                start_date=today, end_date=today + timedelta(days=10)
+            )
+            for i, status in enumerate(['completed', 'in_progress', 'open', 'open'])
+        ]
+        done, running, waiting, free = cls.tasks
+        waiting.dependencies.add(done, running)
+        TaskDependency.objects.create(predecessor=done, successor=waiting, lag_days=1)
+        TaskDependency.objects.create(predecessor=running, successor=waiting, dependency_type='start_to_start')
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def test_two_queries(self):
+        with self.assertNumQueries(2):
+            statuses = dependency_statuses(Task.objects.filter(worksite=self.worksite))
+        waiting, free = statuses[self.tasks[2].pk], statuses[self.tasks[3].pk]
+        self.assertFalse(waiting['can_start'])
+        self.assertEqual(waiting['blocking_tasks'], [{'name': '任务1', 'status': '进行中'}])
+        self.assertEqual(
+            [(dep['predecessor_name'], dep['dependency_type'], dep['lag_days']) for dep in waiting['dependencies']],
+            [('任务0', '完成-开始', 1), ('任务1', '开始-开始', 0)],
+        )
+        self.assertEqual(free, {'can_start': True, 'dependencies': [], 'blocking_count': 0, 'blocking_tasks': []})
+
+    def test_batch_matches_single(self):
+        waiting = self.tasks[2]
+        single = self.client.get(reverse('tasks:task_dependency_status', args=[waiting.pk])).json()
+        batch = self.client.get(
+            reverse('tasks:task_dependency_status_batch'), {'ids': f'{waiting.pk},{self.tasks[3].pk}'}
+        ).json()['tasks']
+        self.assertEqual(batch[str(waiting.pk)], single)
+        self.assertEqual(single['blocking_count'], 1)
+
+        by_worksite = self.client.get(reverse('tasks:task_dependency_status_batch'), {'worksite': self.worksite.pk})
+        self.assertEqual(len(by_worksite.json()['tasks']), 4)
+
+    def test_other_owner(self):
+        self.client.force_login(get_user_model().objects.create_user('intruder', password='pass'))
+        response = self.client.get(reverse('tasks:task_dependency_status_batch'), {'ids': str(self.tasks[2].pk)})
+        self.assertEqual(response.json(), {'tasks': {}})
+        self.assertEqual(
+            self.client.get(reverse('tasks:task_dependency_status_batch'), {'ids': 'x'}).status_code, 400
+        )
@@ -25,4 +25,10 @@ urlpatterns = [
     path('<int:task_id>/dependency/add/', views.task_add_dependency, name='task_add_dependency'),
     path('dependency/<int:dependency_id>/remove/', views.task_remove_dependency, name='task_remove_dependency'),
     path('<int:task_id>/dependency/status/', views.task_dependency_status, name='task_dependency_status'),
+    path('import/project/<int:project_id>/', views.task_import, name='task_import'),
+    path('reschedule/', views.task_reschedule, name='task_reschedule'),
+    path('api/dependency-status/', views.task_dependency_status_batch, name='task_dependency_status_batch'),
+    path('api/project/<int:project_id>/feed/', views.task_feed, name='task_feed'),
+    path('api/project/<int:project_id>/redundant-dependencies/', views.redundant_dependencies_view,
+         name='redundant_dependencies'),
 ]
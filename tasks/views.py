@@ -1,20 +1,43 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
+import math
 from datetime import date, timedelta
 from .models import Task, TaskAnnotation, TaskDependency
+from .graph import add_dependencies, redundant_dependencies, remove_redundant_dependencies
+from .importing import TaskImportError, import_tasks
+from .scheduling import reschedule_tasks, scope_tasks
+from .services import dependency_statuses
 from .forms import TaskCreateForm, TaskDrawingSelectForm, ProjectTaskCreateForm, SubtaskCreateForm, SubtaskUpdateForm, TaskDependencyForm
 from drawings.models import Drawing
 from projects.models import Project, WorkSite
+from projects.services import get_project_version
+from core.async_views import aget_object_or_404, async_csrf_exempt
+from core.conditional import versioned_condition
+from gantt.services import changed_tasks, serialize_task, task_queryset
+from projects.changelog import CursorExpired, current_cursor
+
+
+def task_project_version(request, *args, **kwargs):
+    """任务所属项目的数据版本（条件请求）"""
+    task_id = kwargs.get('pk', kwargs.get('task_id'))
+    return get_project_version(worksites__tasks=task_id)
+
+
+def owned_project_version(request, project_id, **kwargs):
+    """当前用户项目的数据版本（条件请求）"""
+    return get_project_version(pk=project_id, owner=request.user)
 
 
 def task_list(request):
     """任务列表页面"""
     # 只显示当前用户拥有的项目下的任务
     if request.user.is_authenticated:
-        tasks = Task.objects.filter(
+        tasks = Task.objects.live().filter(
             worksite__project__owner=request.user
         ).select_related(
             'worksite', 
@@ -132,10 +155,11 @@ def task_create_step2(request):
     })
 
 
+@versioned_condition(task_project_version)
 def task_detail(request, pk):
     """任务详情页面"""
     task = get_object_or_404(
-        Task.objects.select_related(
+        Task.objects.live().select_related(
             'worksite', 
             'worksite__project',
             'parent_task'
@@ -154,18 +178,23 @@ def task_detail(request, pk):
         return render(request, 'tasks/subtask_detail.html', {
             'task': task,
             'parent_task': task.parent_task,
-            'worksite': task.worksite
+            'worksite': task.worksite,
+            'today': date.today(),
         })
     else:
         # 主任务使用完整的模板，包含图纸预览和子任务管理
         worksite_drawings = []
         if task.worksite:
             worksite_drawings = task.worksite.drawings.all().select_related()
+            # 先取出结果：模板多次调用 count/exists/first 时都读结果缓存，不再逐次查询
+            len(worksite_drawings)
 
+        # 逾期/今日截止标记相对于今天，today 同时是信息片段的缓存键之一
         return render(request, 'tasks/task_detail.html', {
             'task': task,
             'worksite_drawings': worksite_drawings,
-            'worksite': task.worksite
+            'worksite': task.worksite,
+            'today': date.today(),
         })
 
 
@@ -287,12 +316,12 @@ def save_annotations(request):
     return JsonResponse({'success': False, 'error': '仅支持POST请求'})
 
 
-@csrf_exempt
-def update_annotation(request, annotation_id):
-    """更新标注"""
+@async_csrf_exempt
+async def update_annotation(request, annotation_id):
+    """更新标注（异步视图）"""
     if request.method == 'POST':
         try:
-            annotation = get_object_or_404(TaskAnnotation, id=annotation_id)
+            annotation = await aget_object_or_404(TaskAnnotation.objects.select_related('task'), id=annotation_id)
             data = json.loads(request.body)
 
             # 更新标注属性
@@ -309,7 +338,7 @@ def update_annotation(request, annotation_id):
             if 'end_y' in data:
                 annotation.end_y = float(data['end_y'])
 
-            annotation.save()
+            await annotation.asave()
 
             return JsonResponse({
                 'success': True,
@@ -325,13 +354,13 @@ def update_annotation(request, annotation_id):
     return JsonResponse({'success': False, 'error': '仅支持POST请求'})
 
 
-@csrf_exempt
-def delete_annotation(request, annotation_id):
-    """删除标注"""
+@async_csrf_exempt
+async def delete_annotation(request, annotation_id):
+    """删除标注（异步视图）"""
     if request.method == 'POST':
         try:
-            annotation = get_object_or_404(TaskAnnotation, id=annotation_id)
-            annotation.delete()
+            annotation = await aget_object_or_404(TaskAnnotation.objects, id=annotation_id)
+            await annotation.adelete()
 
             return JsonResponse({
                 'success': True,
@@ -347,42 +376,33 @@ def delete_annotation(request, annotation_id):
     return JsonResponse({'success': False, 'error': '仅支持POST请求'})
 
 
-@csrf_exempt
-def create_annotation(request):
-    """创建新标注"""
+@async_csrf_exempt
+async def create_annotation(request):
+    """创建新标注（异步视图）"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
 
             # 获取任务
             task_id = data.get('task_id')
-            task = get_object_or_404(Task, id=task_id)
+            task = await aget_object_or_404(Task.objects, id=task_id)
 
             # 获取关联的图纸（从任务所属工地获取）
             drawing_id = data.get('drawing_id')
-            drawing = None
-
-            # 获取任务所属工地的图纸
-            worksite_drawings = []
-            if task.worksite:
-                worksite_drawings = task.worksite.drawings.all()
+            worksite_drawings = Drawing.objects.filter(worksite_id=task.worksite_id)
 
             if drawing_id:
-                try:
-                    # 确保图纸属于任务的工地
-                    drawing = worksite_drawings.filter(pk=drawing_id).first()
-                    if not drawing:
-                        drawing = Drawing.objects.get(pk=drawing_id)
-                        # 验证图纸是否属于任务的工地
-                        if drawing.worksite != task.worksite:
-                            return JsonResponse({
-                                'success': False,
-                                'error': '图纸不属于任务所在的工地'
-                            })
-                except Drawing.DoesNotExist:
-                    drawing = worksite_drawings.first() if worksite_drawings else None
+                # 确保图纸属于任务的工地
+                drawing = await worksite_drawings.filter(pk=drawing_id).afirst()
+                if not drawing:
+                    if await Drawing.objects.filter(pk=drawing_id).aexists():
+                        return JsonResponse({
+                            'success': False,
+                            'error': '图纸不属于任务所在的工地'
+                        })
+                    drawing = await worksite_drawings.afirst()
             else:
-                drawing = worksite_drawings.first() if worksite_drawings else None
+                drawing = await worksite_drawings.afirst()
 
             if not drawing:
                 return JsonResponse({
@@ -391,7 +411,7 @@ def create_annotation(request):
                 })
 
             # 创建标注
-            annotation = TaskAnnotation.objects.create(
+            annotation = await TaskAnnotation.objects.acreate(
                 task=task,
                 drawing=drawing,
                 annotation_type=data.get('annotation_type'),
@@ -591,6 +611,21 @@ def task_add_dependency(request, task_id):
             dependency_type = data.get('dependency_type', 'finish_to_start')
             lag_days = int(data.get('lag_days', 0))
 
+            # 批量添加：predecessor_ids 列表，一次拓扑排序校验
+            if 'predecessor_ids' in data:
+                predecessors = Task.objects.filter(
+                    pk__in=data['predecessor_ids'], worksite__project_id=task.worksite.project_id
+                )
+                try:
+                    created = add_dependencies(task, predecessors, dependency_type, lag_days)
+                except ValidationError as e:
+                    return JsonResponse({'success': False, 'error': e.messages[0]})
+                return JsonResponse({
+                    'success': True,
+                    'message': f'成功添加{len(created)}个依赖任务',
+                    'created': len(created),
+                })
+
             predecessor = get_object_or_404(Task, pk=predecessor_id)
 
             # 检查循环依赖
@@ -658,26 +693,170 @@ def task_remove_dependency(request, dependency_id):
     return JsonResponse({'success': False, 'error': '无效的请求方法'})
 
 
+@versioned_condition(task_project_version)
 def task_dependency_status(request, task_id):
     """获取任务依赖状态"""
-    task = get_object_or_404(Task, pk=task_id)
+    status = dependency_statuses(Task.objects.filter(pk=task_id)).get(task_id)
+    if status is None:
+        raise Http404('任务不存在')
+    return JsonResponse(status)
+
+
+# 批量依赖状态接口每次最多的任务数
+DEPENDENCY_STATUS_MAX_TASKS = 1000
+
+
+@login_required
+def task_dependency_status_batch(request):
+    """
+    批量获取任务依赖状态（两条查询）：?ids=1,2,3 指定任务，或 ?worksite=5 取工地的全部任务。
+    返回 {"tasks": {任务ID: 与 task_dependency_status 相同的内容}}，只包含当前用户项目中的任务
+    """
+    tasks = Task.objects.filter(worksite__project__owner=request.user).live()
+    if request.GET.get('worksite'):
+        try:
+            tasks = tasks.filter(worksite_id=int(request.GET['worksite']))
+        except ValueError:
+            return JsonResponse({'error': '无效的工地ID'}, status=400)
+    else:
+        try:
+            ids = {int(value) for value in request.GET.get('ids', '').split(',') if value.strip()}
+        except ValueError:
+            return JsonResponse({'error': '无效的任务ID'}, status=400)
+        if not ids or len(ids) > DEPENDENCY_STATUS_MAX_TASKS:
+            return JsonResponse({'error': f'请指定1到{DEPENDENCY_STATUS_MAX_TASKS}个任务ID'}, status=400)
+        tasks = tasks.filter(pk__in=ids)
+
+    return JsonResponse({'tasks': dependency_statuses(tasks)})
+
+
+@login_required
+def task_reschedule(request):
+    """
+    批量调整任务日期（POST JSON）：
+    {"scope": "project"|"worksite"|"task", "id": 范围对象ID, "shift_days": 平移天数, "scale": 工期伸缩比例}
+    scope 为 task 时调整该任务及其全部子任务；校验失败时不做任何修改
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '无效的请求方法'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        scope = data.get('scope')
+        object_id = int(data.get('id'))
+        shift_days = int(data.get('shift_days', 0))
+        scale = data.get('scale')
+        scale = float(scale) if scale is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': '无效的请求数据'}, status=400)
+    # json.loads 接受 NaN/Infinity，float() 也接受 "inf" 之类的字符串
+    if scale is not None and not math.isfinite(scale):
+        return JsonResponse({'success': False, 'errors': ['伸缩比例必须是有限的数值']}, status=400)
+
+    if scope == 'project':
+        tasks = scope_tasks(project=get_object_or_404(Project, pk=object_id, owner=request.user))
+    elif scope == 'worksite':
+        tasks = scope_tasks(worksite=get_object_or_404(WorkSite, pk=object_id, project__owner=request.user))
+    elif scope == 'task':
+        tasks = scope_tasks(root=get_object_or_404(Task, pk=object_id, worksite__project__owner=request.user))
+    else:
+        return JsonResponse({'success': False, 'error': '无效的调整范围'}, status=400)
+
+    try:
+        updated = reschedule_tasks(tasks, shift_days=shift_days, scale=scale)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'errors': e.messages}, status=400)
+
+    return JsonResponse({'success': True, 'updated': updated})
+
+
+@login_required
+def task_import(request, project_id):
+    """
+    从CSV/Excel表格批量导入任务（POST multipart：file、可选 worksite 默认工地ID、dry_run）
+    任何一行有错误时不导入，返回逐行错误报告
+    """
+    project = get_object_or_404(Project, pk=project_id, owner=request.user)
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': '无效的请求方法'}, status=405)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'error': '请选择要导入的文件'}, status=400)
+    worksite = None
+    if request.POST.get('worksite'):
+        worksite = get_object_or_404(WorkSite, pk=request.POST['worksite'], project=project)
+
+    try:
+        report = import_tasks(upload, upload.name, project, worksite, dry_run=bool(request.POST.get('dry_run')))
+    except TaskImportError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': not report['errors'], **report}, status=400 if report['errors'] else 200)
+
+
+@login_required
+@versioned_condition(owned_project_version)
+def redundant_dependencies_view(request, project_id):
+    """
+    冗余依赖（已被其他零滞后完成-开始依赖路径隐含的同类依赖）：
+    GET 返回冗余依赖列表（via_id 为隐含路径上的第一个中间任务），POST 批量删除
+    """
+    project = get_object_or_404(Project, pk=project_id, owner=request.user)
+    if request.method == 'POST':
+        return JsonResponse({'success': True, 'removed': remove_redundant_dependencies(project)})
+
+    redundant = redundant_dependencies(project)
+    return JsonResponse({
+        'count': len(redundant),
+        'dependencies': [
+            {'id': edge_id, 'predecessor_id': predecessor_id, 'successor_id': successor_id, 'via_id': via_id}
+            for edge_id, predecessor_id, successor_id, via_id in redundant
+        ],
+    })
+
 
-    dependencies = []
-    for dep in task.predecessor_dependencies.all():
-        dependencies.append({
-            'id': dep.id,
-            'predecessor_name': dep.predecessor.name,
-            'predecessor_status': dep.predecessor.get_status_display(),
-            'predecessor_completed': dep.predecessor.status == 'completed',
-            'dependency_type': dep.get_dependency_type_display(),
-            'lag_days': dep.lag_days
+# 任务增量接口每批最大条数
+TASK_FEED_DEFAULT_LIMIT = 500
+TASK_FEED_MAX_LIMIT = 2000
+
+
+@login_required
+@versioned_condition(owned_project_version)
+def task_feed(request, project_id):
+    """
+    任务增量接口：
+    不带 since 时返回全部任务和当前游标；带 since=<游标> 时按变更日志分批返回
+    游标之后新增/更新的任务和删除的任务ID，has_more 为真时用返回的游标继续拉取
+    """
+    project = get_object_or_404(Project, pk=project_id, owner=request.user)
+
+    since = request.GET.get('since')
+    if not since:
+        return JsonResponse({
+            'cursor': current_cursor(),
+            'full': True,
+            'has_more': False,
+            'tasks': [serialize_task(task) for task in task_queryset(project)],
+            'deleted': [],
         })
 
-    blocking_deps = task.get_blocking_dependencies()
+    try:
+        since = int(since)
+        limit = min(int(request.GET.get('limit', TASK_FEED_DEFAULT_LIMIT)), TASK_FEED_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': '无效的游标或条数'}, status=400)
+    if limit <= 0:
+        return JsonResponse({'error': '无效的游标或条数'}, status=400)
+
+    try:
+        cursor, has_more, tasks, deleted = changed_tasks(project, since, limit=limit)
+    except CursorExpired:
+        return JsonResponse({'error': '游标已过期，请不带 since 重新全量拉取'}, status=410)
 
     return JsonResponse({
-        'can_start': task.can_start(),
-        'dependencies': dependencies,
-        'blocking_count': blocking_deps.count(),
-        'blocking_tasks': [{'name': dep.name, 'status': dep.get_status_display()} for dep in blocking_deps]
+        'cursor': cursor,
+        'full': False,
+        'has_more': has_more,
+        'tasks': tasks,
+        'deleted': deleted,
     })
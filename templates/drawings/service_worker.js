@@ -0,0 +1,100 @@
+// 建筑项目管理系统 - 图纸离线缓存 Service Worker
+// 图纸与缩略图URL带内容哈希参数（?v=），缓存命中即可直接使用；内容变化时清单给出新URL，旧URL被删除。
+
+const CACHE_NAME = 'drawings-v2';
+const DRAWINGS_URL = '{{ drawings_url|escapejs }}';
+const PRECACHE_CONCURRENCY = 4;
+
+self.addEventListener('install', event => {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    // 清理旧版本的缓存
+    event.waitUntil(
+        caches.keys().then(names => Promise.all(
+            names.filter(name => name.startsWith('drawings-') && name !== CACHE_NAME)
+                 .map(name => caches.delete(name))
+        )).then(() => self.clients.claim())
+    );
+});
+
+// 只拦截带哈希参数的图纸文件/缩略图：缓存优先，未缓存时走网络
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin || !url.pathname.startsWith(DRAWINGS_URL) || !url.searchParams.has('v')) {
+        return;
+    }
+    event.respondWith(
+        caches.open(CACHE_NAME)
+            .then(cache => cache.match(url.href))
+            .then(cached => cached || fetch(request))
+    );
+});
+
+// 页面请求预缓存某个工地的图纸
+self.addEventListener('message', event => {
+    const data = event.data || {};
+    if (data.type !== 'precache-worksite') {
+        return;
+    }
+    const reply = message => {
+        if (event.source) {
+            event.source.postMessage(message);
+        }
+    };
+    event.waitUntil(
+        precacheWorksite(data.manifestUrl)
+            .then(result => reply(Object.assign({type: 'precache-done'}, result)))
+            .catch(error => reply({type: 'precache-failed', message: String(error)}))
+    );
+});
+
+async function precacheWorksite(manifestUrl) {
+    const cache = await caches.open(CACHE_NAME);
+    const response = await fetch(manifestUrl, {credentials: 'same-origin', cache: 'no-cache'});
+    if (!response.ok) {
+        throw new Error(`清单请求失败: ${response.status}`);
+    }
+    const manifest = await response.clone().json();
+    const urls = manifest.urls.map(url => new URL(url, self.location.origin).href);
+
+    // 下载尚未缓存的文件（限制并发，避免占满带宽）
+    const missing = [];
+    for (const url of urls) {
+        if (!(await cache.match(url))) {
+            missing.push(url);
+        }
+    }
+    let fetched = 0;
+    for (let i = 0; i < missing.length; i += PRECACHE_CONCURRENCY) {
+        await Promise.all(missing.slice(i, i + PRECACHE_CONCURRENCY).map(async url => {
+            const fileResponse = await fetch(url, {credentials: 'same-origin'});
+            if (fileResponse.ok) {
+                await cache.put(url, fileResponse);
+                fetched += 1;
+            }
+        }));
+    }
+
+    // 删除上一份清单中已不存在（哈希变化或图纸删除）的文件
+    let removed = 0;
+    const previous = await cache.match(manifestUrl);
+    if (previous) {
+        const previousManifest = await previous.json();
+        const current = new Set(urls);
+        for (const url of previousManifest.urls) {
+            const href = new URL(url, self.location.origin).href;
+            if (!current.has(href) && await cache.delete(href)) {
+                removed += 1;
+            }
+        }
+    }
+    await cache.put(manifestUrl, response);
+
+    return {worksiteId: manifest.worksite_id, total: urls.length, fetched: fetched, removed: removed};
+}